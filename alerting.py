@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from scan_results import to_records, top_k
+from utils import format_number
+
+load_dotenv()
+
+ALERT_TYPE = 'Unusual Options Activity'
+ALERTS_PER_SCAN = 3             # Only the top activities of a scan become alerts
+ALERT_COOLDOWN_SECONDS = 3600   # Don't repeat a contract's alert within this window
+ALERT_COOLDOWN_MAX_ENTRIES = int(os.getenv("ALERT_COOLDOWN_MAX_ENTRIES", "100000"))
+COOLDOWN_PRUNE_INTERVAL = 3600
+
+class CooldownIndex:
+    """Bounded in-memory map of (user_id, contract_symbol, alert_type) -> cooldown expiry"""
+    def __init__(self, cooldown_seconds=ALERT_COOLDOWN_SECONDS, max_entries=ALERT_COOLDOWN_MAX_ENTRIES):
+        self.cooldown_seconds = cooldown_seconds
+        self.max_entries = max_entries
+        self._expiry = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def active(self, key, now=None):
+        """Whether a key is within its cooldown"""
+        now = now or time.time()
+        with self._lock:
+            expiry = self._expiry.get(key)
+            if expiry is None:
+                return False
+            if expiry <= now:
+                del self._expiry[key]
+                return False
+            return True
+
+    def mark(self, key, alerted_at):
+        """Record an alert, evicting the entries closest to expiry beyond max_entries"""
+        with self._lock:
+            self._expiry[key] = alerted_at + self.cooldown_seconds
+            self._expiry.move_to_end(key)
+            # Evicted keys are still in the database table, which decides every alert
+            while len(self._expiry) > self.max_entries:
+                self._expiry.popitem(last=False)
+
+    def load(self, rows):
+        """Mark (user_id, contract_symbol, alert_type, alerted_at) rows, oldest first"""
+        for user_id, contract_symbol, alert_type, alerted_at in rows:
+            self.mark((user_id, contract_symbol, alert_type), alerted_at)
+
+class AlertManager:
+    def __init__(self, db, email_manager, cooldowns=None):
+        self.db = db
+        self.email_manager = email_manager
+        self.cooldowns = cooldowns or CooldownIndex()
+        self.last_pruned = 0
+        self.warm_start()
+
+    def warm_start(self):
+        """Load the cooldowns still running from the database"""
+        since = time.time() - self.cooldowns.cooldown_seconds
+        self.db.prune_alert_cooldowns(since)
+        self.cooldowns.load(self.db.get_alert_cooldowns(since))
+        self.last_pruned = time.time()
+
+    def build_alert(self, activity):
+        """Build the alert payload for one unusual activity"""
+        return {
+            'symbol': activity['symbol'],
+            'alert_type': ALERT_TYPE,
+            'message': f"{activity['symbol']}: {activity['volume']:,} {activity['option_type']}s @ ${activity['strike']} - {format_number(activity['premium'])} premium",
+            'details': activity,
+            'current_price': activity.get('current_price', 0)
+        }
+
+    def should_alert(self, user_id, contract_symbol, alert_type=ALERT_TYPE):
+        """O(1) check against the in-memory cooldowns; the database claim at save time is authoritative"""
+        return not self.cooldowns.active((user_id, contract_symbol, alert_type))
+
+    def process_activities(self, user_id, user_email, activities, top_n=ALERTS_PER_SCAN):
+        """Save and email alerts for the top activities of a scan table, returns what was alerted"""
+        candidates = {}
+        for activity in to_records(top_k(activities, top_n, 'premium')):
+            key = (user_id, activity.get('contract_symbol') or activity['symbol'], ALERT_TYPE)
+            if key not in candidates and self.should_alert(*key):
+                candidates[key] = activity
+
+        if not candidates:
+            return []
+
+        # Claim cooldowns in the shared table so processes sharing the database alert each contract once
+        now = time.time()
+        claimed, alerted_at = self.db.claim_alert_cooldowns(list(candidates), now, self.cooldowns.cooldown_seconds)
+        pending = []
+        for key, activity in candidates.items():
+            self.cooldowns.mark(key, alerted_at[key])
+            if key in claimed:
+                pending.append((activity, self.build_alert(activity)))
+
+        if now - self.last_pruned > COOLDOWN_PRUNE_INTERVAL:
+            self.db.prune_alert_cooldowns(now - self.cooldowns.cooldown_seconds)
+            self.last_pruned = now
+
+        if not pending:
+            return []
+
+        alert_ids = self.db.save_alerts([
+            (user_id, activity['symbol'], ALERT_TYPE, alert_data['message'], activity,
+             activity.get('current_price') or 0, False)
+            for activity, alert_data in pending
+        ])
+
+        alerted = []
+        for alert_id, (activity, alert_data) in zip(alert_ids, pending):
+            # Send email if configured
+            email_sent = False
+            if user_email:
+                email_sent = self.email_manager.send_alert_email(user_email, alert_data)
+
+            alerted.append({'alert_id': alert_id, 'symbol': activity['symbol'], 'email_sent': email_sent})
+
+        return alerted
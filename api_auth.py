@@ -0,0 +1,45 @@
+import hashlib
+import hmac
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# API access configuration - override in .env file
+API_TOKEN = os.getenv("API_TOKEN", "")    # Service token: reads everything and signs per-user tokens
+
+LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost')
+
+# token_scope() result for the service token, or for any client while no API_TOKEN is set
+ALL_USERS = 'all'
+
+def user_token(user_id, secret=API_TOKEN):
+    """Token scoped to one user's alert history, performance and stream; None without a service token"""
+    if not secret:
+        return None
+    signature = hmac.new(secret.encode(), f"user:{int(user_id)}".encode(), hashlib.sha256).hexdigest()
+    return f"{int(user_id)}.{signature}"
+
+def token_scope(token, secret=API_TOKEN):
+    """ALL_USERS for the service token, the user id a per-user token is scoped to, None if invalid"""
+    if not secret:
+        return ALL_USERS
+    token = token or ''
+    if hmac.compare_digest(token.encode(), secret.encode()):
+        return ALL_USERS
+
+    user_id, _, signature = token.partition('.')
+    if not user_id.isdigit() or not signature:
+        return None
+    if hmac.compare_digest(token.encode(), user_token(user_id, secret).encode()):
+        return int(user_id)
+    return None
+
+def can_read_user(scope, user_id):
+    """Whether a token scope may read this user's alerts"""
+    return scope == ALL_USERS or scope == user_id
+
+def check_exposure(host, secret=API_TOKEN):
+    """Refuse to serve user data to the network without a token"""
+    if not secret and host not in LOOPBACK_HOSTS:
+        raise ValueError(f"API_TOKEN must be set to serve on {host}; without it only loopback hosts are allowed")
@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from dotenv import load_dotenv
+from api_auth import API_TOKEN, can_read_user, check_exposure, token_scope
+from archive import AlertArchive
+from metrics import metrics
+from scanner import CACHE_FLOW, CACHE_GAMMA, CACHE_SENTIMENT, CACHE_SUMMARY, CACHE_UNUSUAL
+from storage import open_database
+
+load_dotenv()
+
+# API configuration - override in .env file
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8600"))
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_UNUSUAL_LIMIT = 1000
+
+USER_ROUTE = re.compile(r'^/api/users/(\d+)/(alerts|performance)$')
+
+def int_param(params, name, default, low, high):
+    """An integer query parameter in [low, high]; anything else is a 400"""
+    if name not in params:
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+class APIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, db, token=API_TOKEN):
+        check_exposure(address[0], token)
+        super().__init__(address, APIHandler)
+        self.db = db
+        self.alert_archive = AlertArchive(db)
+        self.token = token
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def cached_entry(self, key):
+        """Parsed payload and version of a cache key, re-read only when the scanner republishes"""
+        version = self.db.get_cache_version(key)
+        if version is None:
+            return None, None
+
+        with self._lock:
+            entry = self._bodies.get(key)
+        if entry and entry[0] == version:
+            metrics.record_cache('api_payload', True)
+            return entry[1], version
+
+        metrics.record_cache('api_payload', False)
+        payload, version = self.db.get_cache(key)
+        parsed = json.loads(payload)
+        with self._lock:
+            self._bodies[key] = (version, parsed)
+        return parsed, version
+
+class APIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SmartMoneyAPI/1.0'
+    # Headers and body go out as separate writes on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, etag=None):
+        """Send a JSON response, or 304 if the client already has this version"""
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, default=str).encode()
+        etag = etag or f'"{hashlib.md5(body).hexdigest()}"'
+
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_not_modified_or(self, etag, build):
+        """Skip building the body entirely when the client's ETag is current"""
+        if self.headers.get('If-None-Match') == etag:
+            self.send_json(b'', etag=etag)
+        else:
+            self.send_json(build(), etag=etag)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        try:
+            scope = token_scope(self.headers.get('Authorization', '').removeprefix('Bearer '), self.server.token)
+            if scope is None:
+                self.send_json({'error': 'unauthorized'}, status=401)
+                return
+
+            if url.path == '/api/unusual':
+                self.get_unusual(params)
+            elif url.path == '/api/sentiment':
+                self.get_cached(CACHE_SENTIMENT)
+            elif url.path == '/api/summary':
+                self.get_cached(CACHE_SUMMARY)
+            elif url.path == '/api/flow':
+                self.get_cached(CACHE_FLOW)
+            elif url.path == '/api/gamma':
+                self.get_cached(CACHE_GAMMA)
+            elif url.path == '/health':
+                self.send_json({'status': 'ok'})
+            elif url.path == '/metrics':
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                match = USER_ROUTE.match(url.path)
+                if not match:
+                    self.send_json({'error': 'not found'}, status=404)
+                elif not can_read_user(scope, int(match.group(1))):
+                    self.send_json({'error': 'forbidden'}, status=403)
+                elif match.group(2) == 'alerts':
+                    self.get_user_alerts(int(match.group(1)), params)
+                else:
+                    self.send_json(self.server.alert_archive.get_performance_stats(int(match.group(1))))
+        except ValueError as e:
+            self.send_json({'error': str(e)}, status=400)
+        except Exception as e:
+            print(f"Error serving {self.path}: {str(e)}")
+            metrics.record_error('api_request')
+            self.send_json({'error': 'internal error'}, status=500)
+        finally:
+            metrics.observe('api_request', time.perf_counter() - start)
+
+    def get_cached(self, key):
+        """Serve a scanner output straight from the shared cache"""
+        payload, version = self.server.cached_entry(key)
+        if payload is None:
+            self.send_json({'error': 'no scan published yet'}, status=503)
+            return
+        self.send_not_modified_or(f'"{key}-{version}"', lambda: {'updated_at': version, 'data': payload})
+
+    def get_unusual(self, params):
+        """Latest unusual activity, optionally filtered by symbol and option type"""
+        activities, version = self.server.cached_entry(CACHE_UNUSUAL)
+        if activities is None:
+            self.send_json({'error': 'no scan published yet'}, status=503)
+            return
+
+        symbol = params.get('symbol', '').upper()
+        option_type = params.get('option_type', '').upper()
+        limit = int_param(params, 'limit', None, 0, MAX_UNUSUAL_LIMIT)
+
+        def build():
+            selected = [a for a in activities
+                        if (not symbol or a['symbol'] == symbol)
+                        and (not option_type or a['option_type'] == option_type)]
+            return {'updated_at': version, 'count': len(selected[:limit]), 'data': selected[:limit]}
+
+        etag = f'"{CACHE_UNUSUAL}-{version}-{symbol}-{option_type}-{limit}"'
+        self.send_not_modified_or(etag, build)
+
+    def get_user_alerts(self, user_id, params):
+        """One page of a user's alert history, newest first"""
+        page = max(1, int(params.get('page', 1)))
+        per_page = min(MAX_PAGE_SIZE, max(1, int(params.get('per_page', DEFAULT_PAGE_SIZE))))
+
+        # A cheap version read first, so a current client costs no page query or encoding
+        history = self.server.alert_archive
+        total, newest_id, filled = history.get_user_alerts_version(user_id)
+        etag = f'"alerts-{user_id}-{page}-{per_page}-{total}-{newest_id}-{filled}"'
+
+        def build():
+            alerts_df = history.get_user_alerts(user_id, limit=per_page, offset=(page - 1) * per_page)
+            alerts = json.loads(alerts_df.to_json(orient='records'))
+            for alert in alerts:
+                if alert.get('details'):
+                    alert['details'] = json.loads(alert['details'])
+            return {
+                'user_id': user_id,
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': (total + per_page - 1) // per_page,
+                'data': alerts
+            }
+
+        self.send_not_modified_or(etag, build)
+
+def create_server(db=None, host=API_HOST, port=API_PORT, token=API_TOKEN):
+    return APIServer((host, port), db or open_database(), token)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve scan results and alerts as a JSON API")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+
+    try:
+        server = create_server(host=args.host, port=args.port)
+    except ValueError as e:
+        print(f"Error starting API: {str(e)}")
+        return 1
+    print(f"Serving API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,13 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta
+from datetime import datetime
+import threading
 import time
 from auth import AuthManager
-from database import Database
-from email_config import EmailManager
-from utils import StockDataFetcher, format_number
-import numpy as np
+from metrics import metrics
+from profiling import profiler, PROFILE_ADMINS
+from storage import open_database
+
+render_start = time.perf_counter()
 
 # Page configuration
 st.set_page_config(
@@ -54,343 +53,477 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Initialize managers
-auth_manager = AuthManager()
-db = Database()
-email_manager = EmailManager()
-data_fetcher = StockDataFetcher()
+# Shared managers, created once per process rather than on every rerun.
+# The loaders only run on a cache miss, and flag it here for load_resource.
+resource_built = threading.local()
+
+def load_resource(cache, loader, *args):
+    """Call an st.cache_resource loader, counting the lookup as a cache hit or miss"""
+    resource_built.value = False
+    resource = loader(*args)
+    metrics.record_cache(cache, not resource_built.value)
+    return resource
+
+@st.cache_resource
+def get_auth_manager():
+    """Database and auth shared by all sessions; schema setup runs here once"""
+    resource_built.value = True
+    metrics.start_http_server()
+    return AuthManager(open_database())
+
+@st.cache_resource
+def get_services(_db):
+    """Scanning and alerting services shared by all sessions, built on first login"""
+    resource_built.value = True
+    from email_config import EmailManager
+    from utils import StockDataFetcher
+    from rollups import FlowRollup
+    from alerting import AlertManager
+    from scanner import ScanService
+    
+    data_fetcher = StockDataFetcher()
+    scan_service = ScanService(data_fetcher, _db, FlowRollup(_db))
+    alert_manager = AlertManager(_db, EmailManager())
+    return data_fetcher, scan_service, alert_manager
+
+auth_manager = load_resource('streamlit_auth', get_auth_manager)
+db = auth_manager.db
 
 # Check authentication
 if not auth_manager.check_authentication():
     auth_manager.show_login_page()
 else:
-    # Main application
-    st.markdown('<h1 class="main-header">🚀 Smart Money Flow Tracker</h1>', unsafe_allow_html=True)
+    # Profiled from here, so login pages never open a render profile
+    with profiler.profile('render'):
+        # The analytics stack is only loaded once a user has logged in
+        import pandas as pd
+        import plotly.graph_objects as go
+        import plotly.express as px
+        from utils import format_number
+        from rollups import HEATMAP_METRICS
+        from charts import chain_contracts, prepare_scatter, prepare_timeseries, render_mode
+        from api_auth import user_token
     
-    # Header with user info
-    col1, col2, col3 = st.columns([6, 2, 1])
-    with col2:
-        st.write(f"👤 Welcome, **{st.session_state.username}**")
-    with col3:
-        if st.button("Logout"):
-            auth_manager.logout()
+        data_fetcher, scan_service, alert_manager = load_resource('streamlit_services', get_services, db)
+        flow_rollup = scan_service.flow_rollup
     
-    # Create tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Live Monitoring", "🚨 Alerts", "📈 Performance", "🎨 Visualizations"])
+        # Main application
+        st.markdown('<h1 class="main-header">🚀 Smart Money Flow Tracker</h1>', unsafe_allow_html=True)
     
-    # Tab 1: Live Monitoring
-    with tab1:
-        # Refresh button
-        col1, col2, col3 = st.columns([1, 1, 4])
-        with col1:
-            if st.button("🔄 Refresh Data"):
-                st.cache_data.clear()
-                st.rerun()
-        
+        # Header with user info
+        col1, col2, col3 = st.columns([6, 2, 1])
         with col2:
-            auto_refresh = st.checkbox("Auto-refresh")
+            st.write(f"👤 Welcome, **{st.session_state.username}**")
+        with col3:
+            if st.button("Logout"):
+                auth_manager.logout()
+    
+        # Token for this user's alerts on the JSON API and the alert stream
+        api_token = user_token(st.session_state.user_id)
+        if api_token:
+            with st.sidebar.expander("🔑 API Access"):
+                st.code(api_token, language=None)
+                st.caption("Send as `Authorization: Bearer <token>`; it only reads your own alerts.")
+    
+        # Profiling controls for admins
+        if st.session_state.username in PROFILE_ADMINS:
+            with st.sidebar.expander("🧪 Profiling"):
+                profile_target = st.selectbox("Target", ['scan', 'render'])
+                profile_mode = st.selectbox("Profiler", ['cprofile', 'sample'])
+                profile_cycles = st.number_input("Cycles", min_value=1, max_value=50, value=3)
+                if st.button("Start Profiling"):
+                    profiler.enable(int(profile_cycles), mode=profile_mode, target=profile_target)
+                st.caption(f"Cycles remaining: {profiler.remaining}")
+                if profiler.last_artifact:
+                    st.caption(f"Last profile: {profiler.last_artifact}")
+                    st.dataframe(pd.DataFrame(profiler.last_summary), hide_index=True)
+    
+        # Create tabs
+        tab1, tab2, tab3, tab4 = st.tabs(["📊 Live Monitoring", "🚨 Alerts", "📈 Performance", "🎨 Visualizations"])
+    
+        # Tab 1: Live Monitoring
+        with tab1:
+            # Refresh button
+            col1, col2, col3 = st.columns([1, 1, 4])
+            with col1:
+                if st.button("🔄 Refresh Data"):
+                    st.cache_data.clear()
+                    scan_service.scheduler.expedite()
+                    st.rerun()
         
-        # Market Sentiment
-        st.subheader("📊 Market Sentiment")
-        sentiment_data = data_fetcher.get_market_sentiment()
+            with col2:
+                auto_refresh = st.checkbox("Auto-refresh")
         
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Put/Call Ratio", f"{sentiment_data['put_call_ratio']:.2f}")
-        with col2:
-            st.metric("Sentiment Score", f"{sentiment_data['sentiment_score']}/100")
-        with col3:
-            st.metric("Market Mood", sentiment_data['sentiment_text'])
-        with col4:
-            st.metric("Total Options Volume", 
-                     f"{sentiment_data['total_call_volume'] + sentiment_data['total_put_volume']:,}")
+            # Market Sentiment, filled in once the scan finishes so it comes from the same cycle as the table
+            st.subheader("📊 Market Sentiment")
+            sentiment_area = st.container()
         
-        # Sentiment Gauge
-        fig_gauge = go.Figure(go.Indicator(
-            mode = "gauge+number+delta",
-            value = sentiment_data['sentiment_score'],
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Market Sentiment Gauge"},
-            delta = {'reference': 50},
-            gauge = {
-                'axis': {'range': [None, 100]},
-                'bar': {'color': "darkblue"},
-                'steps': [
-                    {'range': [0, 25], 'color': "darkred"},
-                    {'range': [25, 50], 'color': "red"},
-                    {'range': [50, 75], 'color': "yellow"},
-                    {'range': [75, 100], 'color': "green"}
-                ],
-                'threshold': {
-                    'line': {'color': "red", 'width': 4},
-                    'thickness': 0.75,
-                    'value': 90
-                }
-            }
-        ))
-        fig_gauge.update_layout(height=300)
-        st.plotly_chart(fig_gauge, use_container_width=True)
+            # Unusual Options Activity
+            st.subheader("🔥 Live Unusual Options Activity")
         
-        # Unusual Options Activity
-        st.subheader("🔥 Live Unusual Options Activity")
+            def activity_table(activities):
+                display = activities.assign(
+                    Premium=activities['premium'].map(format_number),
+                    Volume=activities['volume'].map(lambda x: f"{x:,}")
+                )
+                return display[['symbol', 'option_type', 'strike', 'Volume', 'volume_ratio', 'Premium']]
         
-        with st.spinner("Scanning for unusual options activity..."):
-            unusual_activities = data_fetcher.scan_all_watchlist()
+            # The table fills in as each symbol finishes, largest premiums first
+            scan_status = st.empty()
+            activity_placeholder = st.empty()
+            scan_status.caption("Scanning for unusual options activity...")
+            # Sessions share the fetcher and aggregates, so scan one at a time; only
+            # the symbols the scheduler says are due are refetched
+            with scan_service.lock:
+                with profiler.profile('scan'):
+                    for top_activities in scan_service.iter_scan_due():
+                        if not top_activities.empty:
+                            activity_placeholder.dataframe(activity_table(top_activities), use_container_width=True, hide_index=True)
         
-        if unusual_activities:
-            # Create alerts for top activities
-            for activity in unusual_activities[:3]:  # Top 3 only
-                alert_data = {
-                    'symbol': activity['symbol'],
-                    'alert_type': 'Unusual Options Activity',
-                    'message': f"{activity['symbol']}: {activity['volume']:,} {activity['option_type']}s @ ${activity['strike']} - {format_number(activity['premium'])} premium",
-                    'details': activity,
-                    'current_price': activity.get('current_price', 0)
-                }
-                
-                # Check if we should send email
-                existing_alerts = db.get_user_alerts(st.session_state.user_id, limit=10)
-                should_send = True
-                
-                if not existing_alerts.empty:
-                    # Don't send if similar alert sent in last hour
-                    recent_alerts = existing_alerts[existing_alerts['symbol'] == activity['symbol']]
-                    if len(recent_alerts) > 0:
-                        last_alert_time = pd.to_datetime(recent_alerts.iloc[0]['timestamp'])
-                        if (datetime.now() - last_alert_time).total_seconds() < 3600:
-                            should_send = False
-                
-                if should_send:
-                    # Save alert
-                    alert_id = db.save_alert(
-                        st.session_state.user_id,
-                        activity['symbol'],
-                        'Unusual Options Activity',
-                        alert_data['message'],
-                        activity,
-                        activity.get('current_price', 0),
-                        False
-                    )
-                    
-                    # Send email if configured
-                    if st.session_state.user_email:
-                        email_sent = email_manager.send_alert_email(
-                            st.session_state.user_email,
-                            alert_data
-                        )
-                        if email_sent:
-                            st.success(f"✉️ Alert email sent for {activity['symbol']}!")
+            # Every panel below reads the latest published cycle
+            snapshot = scan_service.snapshot
+            unusual_activities = snapshot.activities
+            coverage = snapshot.coverage
+            scan_status.empty()
+        
+            with sentiment_area:
+                sentiment_data = scan_service.cycle_sentiment(snapshot)
             
-            # Display in table
-            df_unusual = pd.DataFrame(unusual_activities)
-            df_unusual['Premium'] = df_unusual['premium'].apply(format_number)
-            df_unusual['Volume'] = df_unusual['volume'].apply(lambda x: f"{x:,}")
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Put/Call Ratio", f"{sentiment_data['put_call_ratio']:.2f}")
+                with col2:
+                    st.metric("Sentiment Score", f"{sentiment_data['sentiment_score']}/100")
+                with col3:
+                    st.metric("Market Mood", sentiment_data['sentiment_text'])
+                with col4:
+                    st.metric("Total Options Volume", 
+                             f"{sentiment_data['total_call_volume'] + sentiment_data['total_put_volume']:,}")
             
-            display_cols = ['symbol', 'option_type', 'strike', 'Volume', 'volume_ratio', 'Premium']
-            st.dataframe(
-                df_unusual[display_cols],
-                use_container_width=True,
-                hide_index=True
-            )
-        else:
-            st.info("No unusual options activity detected at the moment.")
+                # Sentiment Gauge
+                fig_gauge = go.Figure(go.Indicator(
+                    mode = "gauge+number+delta",
+                    value = sentiment_data['sentiment_score'],
+                    domain = {'x': [0, 1], 'y': [0, 1]},
+                    title = {'text': "Market Sentiment Gauge"},
+                    delta = {'reference': 50},
+                    gauge = {
+                        'axis': {'range': [None, 100]},
+                        'bar': {'color': "darkblue"},
+                        'steps': [
+                            {'range': [0, 25], 'color': "darkred"},
+                            {'range': [25, 50], 'color': "red"},
+                            {'range': [50, 75], 'color': "yellow"},
+                            {'range': [75, 100], 'color': "green"}
+                        ],
+                        'threshold': {
+                            'line': {'color': "red", 'width': 4},
+                            'thickness': 0.75,
+                            'value': 90
+                        }
+                    }
+                ))
+                fig_gauge.update_layout(height=300)
+                st.plotly_chart(fig_gauge, use_container_width=True)
+        
+            # Symbols the data source couldn't serve this cycle
+            if coverage['skipped']:
+                st.warning("Skipped (no data): " + ", ".join(f"{s} ({reason})" for s, reason in coverage['skipped'].items()))
+            if coverage['stale']:
+                st.caption("Using earlier data for: " + ", ".join(f"{s} ({age // 60}m old)" for s, age in coverage['stale'].items()))
+        
+            if not unusual_activities.empty:
+                # Create alerts for top activities
+                alerted = alert_manager.process_activities(
+                    st.session_state.user_id,
+                    st.session_state.user_email,
+                    unusual_activities
+                )
+                for alert in alerted:
+                    if alert['email_sent']:
+                        st.success(f"✉️ Alert email sent for {alert['symbol']}!")
+            
+                # Replace the streamed top rows with the full table
+                activity_placeholder.dataframe(
+                    activity_table(unusual_activities),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                activity_placeholder.info("No unusual options activity detected at the moment.")
     
-    # Tab 2: Alerts
-    with tab2:
-        st.subheader("🚨 Alert Management")
+        # Tab 2: Alerts
+        with tab2:
+            st.subheader("🚨 Alert Management")
         
-        # Email configuration
-        with st.expander("📧 Email Configuration"):
-            current_email = st.session_state.user_email
-            st.write(f"Current email: **{current_email}**")
+            # Email configuration
+            with st.expander("📧 Email Configuration"):
+                current_email = st.session_state.user_email
+                st.write(f"Current email: **{current_email}**")
             
-            new_email = st.text_input("Update email address", value=current_email)
-            if st.button("Update Email"):
-                # Here you would update the email in database
-                st.success("Email updated successfully!")
+                new_email = st.text_input("Update email address", value=current_email)
+                if st.button("Update Email"):
+                    # Here you would update the email in database
+                    st.success("Email updated successfully!")
         
-        # Alert History
-        st.subheader("📋 Alert History")
+            # Alert History
+            st.subheader("📋 Alert History")
         
-        alerts_df = db.get_user_alerts(st.session_state.user_id, limit=100)
+            alerts_df = scan_service.alert_archive.get_user_alerts(st.session_state.user_id, limit=100)
         
-        if not alerts_df.empty:
-            # Add filters
-            col1, col2 = st.columns(2)
-            with col1:
-                symbol_filter = st.selectbox(
-                    "Filter by Symbol",
-                    ["All"] + list(alerts_df['symbol'].unique())
-                )
+            if not alerts_df.empty:
+                # Add filters
+                col1, col2 = st.columns(2)
+                with col1:
+                    symbol_filter = st.selectbox(
+                        "Filter by Symbol",
+                        ["All"] + list(alerts_df['symbol'].unique())
+                    )
             
-            with col2:
-                date_filter = st.date_input(
-                    "Filter by Date",
-                    value=datetime.now().date()
-                )
+                with col2:
+                    date_filter = st.date_input(
+                        "Filter by Date",
+                        value=datetime.now().date()
+                    )
             
-            # Apply filters
-            if symbol_filter != "All":
-                alerts_df = alerts_df[alerts_df['symbol'] == symbol_filter]
+                # Apply filters
+                if symbol_filter != "All":
+                    alerts_df = alerts_df[alerts_df['symbol'] == symbol_filter]
             
-            # Format timestamp
-            alerts_df['timestamp'] = pd.to_datetime(alerts_df['timestamp'])
-            alerts_df['Date'] = alerts_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+                # Format timestamp
+                alerts_df['timestamp'] = pd.to_datetime(alerts_df['timestamp'])
+                alerts_df['Date'] = alerts_df['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
             
-            # Display
-            display_cols = ['Date', 'symbol', 'alert_type', 'message', 'email_sent']
-            st.dataframe(
-                alerts_df[display_cols],
-                use_container_width=True,
-                hide_index=True
-            )
-        else:
-            st.info("No alerts yet. Unusual activities will appear here.")
+                # Display
+                display_cols = ['Date', 'symbol', 'alert_type', 'message', 'email_sent']
+                st.dataframe(
+                    alerts_df[display_cols],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("No alerts yet. Unusual activities will appear here.")
     
-    # Tab 3: Performance
-    with tab3:
-        st.subheader("📈 Performance Analytics")
+        # Tab 3: Performance
+        with tab3:
+            st.subheader("📈 Performance Analytics")
         
-        # Get performance stats
-        perf_stats = db.get_performance_stats(st.session_state.user_id)
+            # Get performance stats
+            perf_stats = scan_service.alert_archive.get_performance_stats(st.session_state.user_id)
         
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Alerts", perf_stats['total_alerts'])
-        with col2:
-            st.metric("Successful Alerts", perf_stats['successful_alerts'])
-        with col3:
-            st.metric("Success Rate", f"{perf_stats['success_rate']:.1f}%")
-        with col4:
-            avg_return = perf_stats['avg_return_1w'] * 100
-            st.metric("Avg Weekly Return", f"{avg_return:.2f}%")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Alerts", perf_stats['total_alerts'])
+            with col2:
+                st.metric("Successful Alerts", perf_stats['successful_alerts'])
+            with col3:
+                st.metric("Success Rate", f"{perf_stats['success_rate']:.1f}%")
+            with col4:
+                avg_return = perf_stats['avg_return_1w'] * 100
+                st.metric("Avg Weekly Return", f"{avg_return:.2f}%")
         
-        # Performance chart
-        alerts_with_perf = db.get_user_alerts(st.session_state.user_id, limit=50)
+            # Performance chart
+            alerts_with_perf = db.get_user_alerts(st.session_state.user_id, limit=50)
         
-        if not alerts_with_perf.empty and 'return_1w' in alerts_with_perf.columns:
-            # Filter alerts with performance data
-            perf_data = alerts_with_perf[alerts_with_perf['return_1w'].notna()]
+            if not alerts_with_perf.empty and 'return_1w' in alerts_with_perf.columns:
+                # Filter alerts with performance data
+                perf_data = alerts_with_perf[alerts_with_perf['return_1w'].notna()]
             
-            if not perf_data.empty:
-                # Create performance chart
-                fig_perf = go.Figure()
+                if not perf_data.empty:
+                    # Create performance chart
+                    fig_perf = go.Figure()
                 
-                fig_perf.add_trace(go.Bar(
-                    x=perf_data['symbol'],
-                    y=perf_data['return_1w'] * 100,
-                    marker_color=['green' if x > 0 else 'red' for x in perf_data['return_1w']],
-                    text=[f"{x:.1f}%" for x in perf_data['return_1w'] * 100],
-                    textposition='auto'
-                ))
+                    fig_perf.add_trace(go.Bar(
+                        x=perf_data['symbol'],
+                        y=perf_data['return_1w'] * 100,
+                        marker_color=['green' if x > 0 else 'red' for x in perf_data['return_1w']],
+                        text=[f"{x:.1f}%" for x in perf_data['return_1w'] * 100],
+                        textposition='auto'
+                    ))
                 
-                fig_perf.update_layout(
-                    title="Alert Performance (Weekly Returns %)",
-                    xaxis_title="Stock Symbol",
-                    yaxis_title="Return %",
-                    showlegend=False
-                )
+                    fig_perf.update_layout(
+                        title="Alert Performance (Weekly Returns %)",
+                        xaxis_title="Stock Symbol",
+                        yaxis_title="Return %",
+                        showlegend=False
+                    )
                 
-                st.plotly_chart(fig_perf, use_container_width=True)
+                    st.plotly_chart(fig_perf, use_container_width=True)
         
-        # Win/Loss pie chart
-        if perf_stats['total_alerts'] > 0:
-            fig_pie = go.Figure(data=[go.Pie(
-                labels=['Winning Trades', 'Losing Trades'],
-                values=[perf_stats['successful_alerts'], 
-                       perf_stats['total_alerts'] - perf_stats['successful_alerts']],
-                hole=.3,
-                marker_colors=['green', 'red']
-            )])
+            # Win/Loss pie chart
+            if perf_stats['total_alerts'] > 0:
+                fig_pie = go.Figure(data=[go.Pie(
+                    labels=['Winning Trades', 'Losing Trades'],
+                    values=[perf_stats['successful_alerts'], 
+                           perf_stats['total_alerts'] - perf_stats['successful_alerts']],
+                    hole=.3,
+                    marker_colors=['green', 'red']
+                )])
             
-            fig_pie.update_layout(title="Win/Loss Distribution")
-            st.plotly_chart(fig_pie, use_container_width=True)
+                fig_pie.update_layout(title="Win/Loss Distribution")
+                st.plotly_chart(fig_pie, use_container_width=True)
     
-    # Tab 4: Visualizations
-    with tab4:
-        st.subheader("🎨 Advanced Visualizations")
+        # Tab 4: Visualizations
+        with tab4:
+            st.subheader("🎨 Advanced Visualizations")
+            st.caption(f"Scan cycle of {datetime.fromtimestamp(snapshot.timestamp):%H:%M:%S}, shared with the Live Monitoring tab")
         
-        # Options Flow Heatmap
-        st.write("### 🔥 Options Flow Heatmap")
+            # Options Flow Heatmap
+            st.write("### 🔥 Options Flow Heatmap")
         
-        # Create sample data for heatmap
-        hours = list(range(9, 17))  # Market hours
-        symbols = data_fetcher.watchlist[:8]
+            heatmap_metric = st.selectbox(
+                "Heatmap Metric",
+                list(HEATMAP_METRICS.keys()),
+                format_func=lambda m: HEATMAP_METRICS[m]
+            )
+            symbols = data_fetcher.watchlist
+            heatmap_df = flow_rollup.get_heatmap(symbols, metric=heatmap_metric)
         
-        # Generate heatmap data
-        heatmap_data = []
-        for symbol in symbols:
-            row_data = []
-            for hour in hours:
-                # Simulate activity intensity
-                intensity = np.random.random() * 100
-                row_data.append(intensity)
-            heatmap_data.append(row_data)
+            fig_heatmap = px.imshow(
+                heatmap_df.values,
+                labels=dict(x="Time", y="Symbol", color=HEATMAP_METRICS[heatmap_metric]),
+                x=[b.strftime('%m-%d %H:%M') for b in heatmap_df.columns],
+                y=symbols,
+                color_continuous_scale="RdYlGn"
+            )
         
-        fig_heatmap = px.imshow(
-            heatmap_data,
-            labels=dict(x="Hour", y="Symbol", color="Activity Level"),
-            x=[f"{h}:00" for h in hours],
-            y=symbols,
-            color_continuous_scale="RdYlGn"
-        )
+            fig_heatmap.update_layout(
+                title=f"Options Flow Heatmap (last {flow_rollup.lookback_hours}h, {flow_rollup.bucket_minutes}-minute buckets)",
+                height=400
+            )
         
-        fig_heatmap.update_layout(
-            title="Options Activity Heatmap (Today)",
-            height=400
-        )
+            st.plotly_chart(fig_heatmap, use_container_width=True)
         
-        st.plotly_chart(fig_heatmap, use_container_width=True)
+            # Flow by sector and symbol
+            st.write("### 🧭 Options Flow by Sector")
         
-        # 3D Scatter Plot
-        st.write("### 📊 3D Options Analysis")
+            sector_flow = scan_service.flow_aggregator.by_sector()
+            if not sector_flow.empty:
+                fig_sector = go.Figure(go.Bar(
+                    x=sector_flow.index,
+                    y=sector_flow['net_premium'],
+                    marker_color=['green' if x > 0 else 'red' for x in sector_flow['net_premium']],
+                    text=[format_number(abs(x)) for x in sector_flow['net_premium']],
+                    textposition='auto'
+                ))
+                fig_sector.update_layout(
+                    title="Net Call - Put Premium by Sector",
+                    xaxis_title="Sector",
+                    yaxis_title="Net Premium ($)",
+                    showlegend=False
+                )
+                st.plotly_chart(fig_sector, use_container_width=True)
+            
+                symbol_flow = scan_service.flow_aggregator.by_symbol().reset_index()
+                symbol_flow['Net Premium'] = symbol_flow['net_premium'].apply(lambda x: ('-' if x < 0 else '') + format_number(abs(x)))
+                symbol_flow['Sentiment'] = symbol_flow['sentiment'].map(lambda x: f"{x:+.2f}")
+                symbol_flow['Flow Share'] = symbol_flow['flow_share'].map(lambda x: f"{x:.1%}")
+                st.dataframe(
+                    symbol_flow[['symbol', 'sector', 'Net Premium', 'Sentiment', 'Flow Share']],
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+            # Dealer gamma exposure
+            st.write("### 🧲 Dealer Gamma Exposure")
+
+            gamma_totals = scan_service.gamma_exposure.totals()
+            if not gamma_totals.empty:
+                gamma_symbol = st.selectbox("Symbol", list(gamma_totals.index), key="gamma_symbol")
+                strike_gamma = scan_service.gamma_exposure.by_strike(gamma_symbol)
+                spot = gamma_totals.loc[gamma_symbol, 'spot']
+
+                fig_gamma = go.Figure(go.Bar(
+                    x=strike_gamma.index,
+                    y=strike_gamma.values,
+                    marker_color=['green' if x > 0 else 'red' for x in strike_gamma.values]
+                ))
+                fig_gamma.add_vline(x=spot, line_dash="dash", annotation_text=f"Spot ${spot:,.2f}")
+                fig_gamma.update_layout(
+                    title=f"{gamma_symbol} Net Gamma Exposure by Strike ($ per 1% move)",
+                    xaxis_title="Strike",
+                    yaxis_title="Gamma Exposure ($)",
+                    showlegend=False
+                )
+                st.plotly_chart(fig_gamma, use_container_width=True)
+
+                st.metric(
+                    "Net Gamma Exposure",
+                    ('-' if gamma_totals.loc[gamma_symbol, 'total_gamma'] < 0 else '') + format_number(abs(gamma_totals.loc[gamma_symbol, 'total_gamma']))
+                )
+
+            # 3D Scatter Plot
+            st.write("### 📊 3D Options Analysis")
         
-        if unusual_activities:
-            # Prepare 3D data
-            df_3d = pd.DataFrame(unusual_activities[:20])  # Top 20
+            # Every contract on the cycle's chains; sharded scans keep chains on their workers,
+            # so those cycles fall back to the unusual contracts
+            contracts_3d = chain_contracts(snapshot.chains)
+            if contracts_3d.empty:
+                contracts_3d = unusual_activities
+
+            if not contracts_3d.empty:
+                # Prepare 3D data, binned down to the point budget
+                df_3d, dropped_3d = prepare_scatter(
+                    contracts_3d,
+                    ['strike', 'volume', 'premium'],
+                    priority='premium',
+                    log_columns=('volume', 'premium')
+                )
             
-            fig_3d = px.scatter_3d(
-                df_3d,
-                x='strike',
-                y='volume',
-                z='premium',
-                color='option_type',
-                size='volume_ratio',
-                hover_data=['symbol'],
-                title="3D Options Flow Visualization",
-                labels={
-                    'strike': 'Strike Price',
-                    'volume': 'Volume',
-                    'premium': 'Premium ($)'
-                }
-            )
+                fig_3d = px.scatter_3d(
+                    df_3d,
+                    x='strike',
+                    y='volume',
+                    z='premium',
+                    color='option_type',
+                    size='volume_ratio',
+                    hover_data=['symbol'],
+                    title="3D Options Flow Visualization",
+                    labels={
+                        'strike': 'Strike Price',
+                        'volume': 'Volume',
+                        'premium': 'Premium ($)'
+                    }
+                )
             
-            fig_3d.update_layout(height=600)
-            st.plotly_chart(fig_3d, use_container_width=True)
+                fig_3d.update_layout(height=600)
+                st.plotly_chart(fig_3d, use_container_width=True)
+                if dropped_3d:
+                    st.caption(f"Showing {len(df_3d):,} of {len(df_3d) + dropped_3d:,} contracts ({dropped_3d:,} dropped by downsampling)")
         
-        # Animated Timeline
-        st.write("### ⏰ Alert Timeline")
+            # Animated Timeline
+            st.write("### ⏰ Alert Timeline")
         
-        timeline_alerts = db.get_user_alerts(st.session_state.user_id, limit=20)
+            timeline_alerts = scan_service.alert_archive.get_user_alerts(st.session_state.user_id, limit=5000)
         
-        if not timeline_alerts.empty:
-            timeline_alerts['timestamp'] = pd.to_datetime(timeline_alerts['timestamp'])
-            timeline_alerts['hour'] = timeline_alerts['timestamp'].dt.hour
+            if not timeline_alerts.empty:
+                timeline_alerts['timestamp'] = pd.to_datetime(timeline_alerts['timestamp'])
+                timeline_alerts, dropped_timeline = prepare_timeseries(
+                    timeline_alerts, 'timestamp', 'alert_price', group='symbol'
+                )
             
-            fig_timeline = px.scatter(
-                timeline_alerts,
-                x='timestamp',
-                y='symbol',
-                size='alert_price',
-                color='alert_type',
-                title="Alert Timeline",
-                hover_data=['message']
-            )
+                fig_timeline = px.scatter(
+                    timeline_alerts,
+                    x='timestamp',
+                    y='symbol',
+                    size='alert_price',
+                    color='alert_type',
+                    title="Alert Timeline",
+                    hover_data=['message'],
+                    render_mode=render_mode(len(timeline_alerts))
+                )
             
-            fig_timeline.update_layout(height=400)
-            st.plotly_chart(fig_timeline, use_container_width=True)
+                fig_timeline.update_layout(height=400)
+                st.plotly_chart(fig_timeline, use_container_width=True)
+                if dropped_timeline:
+                    st.caption(f"Showing {len(timeline_alerts):,} of {len(timeline_alerts) + dropped_timeline:,} alerts ({dropped_timeline:,} dropped by downsampling)")
+    
+    metrics.observe('page_render', time.perf_counter() - render_start)
+    metrics.write_textfile()
     
     # Auto-refresh logic
     if auto_refresh:
-        time.sleep(60)  # Refresh every 60 seconds
+        # Rerun when the next symbol is due, at most once a minute
+        next_due = scan_service.scheduler.next_due_in()
+        time.sleep(60 if next_due is None else min(60, max(5, next_due)))
         st.rerun()
\ No newline at end of file
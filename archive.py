@@ -0,0 +1,183 @@
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+import pandas as pd
+from dotenv import load_dotenv
+from metrics import metrics, timed
+from storage import open_database
+
+load_dotenv()
+
+# Retention configuration - override in .env file
+ALERT_RETENTION_DAYS = int(os.getenv("ALERT_RETENTION_DAYS", "90"))
+ALERT_ARCHIVE_DIR = os.getenv("ALERT_ARCHIVE_DIR", "alert_archive")
+ARCHIVE_INTERVAL_SECONDS = 6 * 3600
+
+# Performance is tracked up to a week after an alert, so never archive before then
+MIN_RETENTION_DAYS = 8
+ARCHIVE_BATCH_SIZE = 50000
+PARTITION_CACHE_SIZE = 4        # Parsed partitions kept in memory for paging
+
+class AlertArchive:
+    """Moves old alerts into monthly gzip partitions and reads across live and archived alerts"""
+    def __init__(self, db=None, archive_dir=ALERT_ARCHIVE_DIR, retention_days=ALERT_RETENTION_DAYS):
+        self.db = db or open_database()
+        self.archive_dir = archive_dir
+        self.retention_days = max(retention_days, MIN_RETENTION_DAYS)
+        self.last_run = 0
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def _partition_dir(self, partition):
+        return os.path.join(self.archive_dir, f"alerts-{partition}")
+
+    def archive(self):
+        """Move every alert older than the retention window to the archive, returns the count moved"""
+        moved = 0
+        while True:
+            alerts = self.db.get_alerts_before(self.retention_days, ARCHIVE_BATCH_SIZE)
+            if alerts.empty:
+                break
+
+            with timed('archive_write'):
+                alerts['partition'] = alerts['timestamp'].str[:7]
+                for partition, rows in alerts.groupby('partition'):
+                    self._write_segment(partition, rows.drop(columns='partition'))
+
+            partition_counts = [
+                (partition, int(user_id), int(count))
+                for (partition, user_id), count in alerts.groupby(['partition', 'user_id']).size().items()
+            ]
+            moved += self.db.archive_alerts(alerts['id'].tolist(), partition_counts, self._user_stats(alerts))
+
+            if len(alerts) < ARCHIVE_BATCH_SIZE:
+                break
+
+        if moved:
+            self.db.reclaim_space()
+            metrics.inc('alerts_archived_total', value=moved)
+        self.last_run = time.time()
+        return moved
+
+    def maybe_archive(self, interval=ARCHIVE_INTERVAL_SECONDS):
+        """Run archive() if it hasn't run within the interval"""
+        if time.time() - self.last_run < interval or not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            return self.archive()
+        except Exception as e:
+            print(f"Error archiving alerts: {str(e)}")
+            metrics.record_error('archive_write')
+            self.last_run = time.time()
+            return 0
+        finally:
+            self._lock.release()
+
+    def _write_segment(self, partition, rows):
+        # Segments are append-only and written before the delete commits. A crash in
+        # between leaves rows that are still live, which readers skip (_drop_live) until
+        # a later run archives them again; readers drop the repeated ids by id.
+        directory = self._partition_dir(partition)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{rows['id'].min()}-{rows['id'].max()}.csv.gz")
+        tmp_path = path + '.tmp'
+        rows.to_csv(tmp_path, index=False, compression='gzip')
+        os.replace(tmp_path, path)
+        self._partitions.pop(partition, None)
+
+    def _user_stats(self, alerts):
+        known = alerts['return_1w'].notna()
+        stats = pd.DataFrame({
+            'user_id': alerts['user_id'],
+            'total_alerts': 1,
+            'successful_alerts': (alerts['is_successful'] == 1).astype(int),
+            'sum_return_1h': alerts['return_1h'].where(known).fillna(0),
+            'count_return_1h': (alerts['return_1h'].notna() & known).astype(int),
+            'sum_return_1d': alerts['return_1d'].where(known).fillna(0),
+            'count_return_1d': (alerts['return_1d'].notna() & known).astype(int),
+            'sum_return_1w': alerts['return_1w'].fillna(0),
+            'count_return_1w': known.astype(int)
+        }).groupby('user_id').sum()
+        return [(int(user_id),) + tuple(row) for user_id, row in zip(stats.index, stats.itertuples(index=False))]
+
+    def _read_partition(self, partition):
+        segments = sorted(glob.glob(os.path.join(self._partition_dir(partition), 'part-*.csv.gz')))
+        cached = self._partitions.get(partition)
+        if cached is not None and cached[0] == segments:
+            return cached[1]
+
+        with timed('archive_read'):
+            frames = [pd.read_csv(path) for path in segments]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            if not df.empty:
+                df = df.drop_duplicates('id').sort_values(['timestamp', 'id'], ascending=False, ignore_index=True)
+
+        if len(self._partitions) >= PARTITION_CACHE_SIZE:
+            self._partitions.pop(next(iter(self._partitions)))
+        self._partitions[partition] = (segments, df)
+        return self._drop_live(df)
+
+    def _drop_live(self, df):
+        """Archived rows whose delete committed; rows still in the live table aren't archived yet"""
+        if df.empty:
+            return df
+        live = self.db.get_alert_ids_between(int(df['id'].min()), int(df['id'].max()))
+        return df[~df['id'].isin(live)].reset_index(drop=True) if live else df
+
+    def get_user_alerts(self, user_id, limit=50, offset=0):
+        """Get alerts for a user newest first, continuing into the archive past the live table"""
+        alerts = self.db.get_user_alerts(user_id, limit=limit, offset=offset)
+        if len(alerts) == limit:
+            return alerts
+
+        # Offset into the archive, skipping whole partitions by their recorded counts
+        remaining = limit - len(alerts)
+        skip = max(0, offset - self.db.count_user_alerts(user_id)) if alerts.empty else 0
+        frames = [alerts] if not alerts.empty else []
+        for partition, count in self.db.get_archive_partitions(user_id):
+            if skip >= count:
+                skip -= count
+                continue
+            archived = self._read_partition(partition)
+            archived = archived[archived['user_id'] == user_id].iloc[skip:skip + remaining]
+            frames.append(archived)
+            remaining -= len(archived)
+            skip = 0
+            if remaining <= 0:
+                break
+
+        if len(frames) <= 1:
+            return frames[0] if frames else alerts
+        return pd.concat(frames, ignore_index=True)
+
+    def count_user_alerts(self, user_id):
+        """Count a user's live and archived alerts"""
+        return self.db.count_user_alerts(user_id) + sum(count for _, count in self.db.get_archive_partitions(user_id))
+
+    def get_user_alerts_version(self, user_id):
+        """(total alerts, newest id, filled-in prices) over live and archived alerts, for ETags"""
+        count, newest_id, filled = self.db.get_user_alerts_version(user_id)
+        archived = sum(count for _, count in self.db.get_archive_partitions(user_id))
+        return count + archived, newest_id, filled
+
+    def get_performance_stats(self, user_id):
+        """Performance statistics over a user's live and archived alerts"""
+        live = self.db.get_performance_totals(user_id)
+        archived = self.db.get_performance_totals(user_id, archived=True)
+        return self.db.get_performance_stats(user_id, {name: live[name] + archived[name] for name in live})
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move alerts older than the retention window into the archive")
+    parser.add_argument('--days', type=int, default=ALERT_RETENTION_DAYS)
+    parser.add_argument('--archive-dir', default=ALERT_ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    moved = AlertArchive(archive_dir=args.archive_dir, retention_days=args.days).archive()
+    print(f"Archived {moved} alerts to {args.archive_dir}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
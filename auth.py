@@ -1,9 +1,9 @@
 import streamlit as st
-from database import Database
+from storage import open_database
 
 class AuthManager:
-    def __init__(self):
-        self.db = Database()
+    def __init__(self, db=None):
+        self.db = db or open_database()
         
     def show_login_page(self):
         """Display login/signup page"""
@@ -0,0 +1,245 @@
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import numpy as np
+import pandas as pd
+from data_sources import ReplaySource, record_snapshot
+from database import SUCCESS_RETURN_THRESHOLD
+from utils import (StockDataFetcher, PREMIUM_THRESHOLD, VOLUME_RATIO_THRESHOLD, VOLUME_THRESHOLD,
+                   unusual_volume_mask, volume_oi_ratio)
+from alerting import ALERTS_PER_SCAN
+
+# Forward-return horizons in archived trading days
+HORIZONS = {'1d': 1, '1w': 5}
+
+# Default sweep: the production thresholds and a step either side
+VOLUME_RATIO_GRID = [0.25, VOLUME_RATIO_THRESHOLD, 1.0, 2.0]
+VOLUME_GRID = [500, VOLUME_THRESHOLD, 2500, 5000]
+PREMIUM_GRID = [25000, PREMIUM_THRESHOLD, 100000, 250000]
+SUCCESS_GRID = [0.01, SUCCESS_RETURN_THRESHOLD, 0.05]
+
+CONFIG_COLUMNS = ['volume_ratio_threshold', 'volume_threshold', 'premium_threshold', 'success_threshold']
+
+def archive_dates(archive_dir):
+    """Snapshot days in an archive, oldest first (one record_snapshot directory per YYYY-MM-DD)"""
+    days = []
+    for name in os.listdir(archive_dir):
+        try:
+            days.append(date.fromisoformat(name))
+        except ValueError:
+            continue
+    return sorted(days)
+
+def record_archive_day(archive_dir, symbols=None, source=None, day=None):
+    """Snapshot today's nearest chains into the archive, meant to run once a day after the close"""
+    day = day or date.today()
+    fetcher = StockDataFetcher(source=source)
+    return record_snapshot(fetcher.source, symbols or fetcher.watchlist, os.path.join(archive_dir, day.isoformat()))
+
+def load_day(args):
+    """Contracts of one snapshot day passing the loosest thresholds, plus each symbol's price"""
+    day_dir, day_index, loosest = args
+    source = ReplaySource(day_dir)
+    frames = []
+    prices = {}
+
+    for symbol in source.symbols():
+        try:
+            info = source.get_info(symbol)
+            price = info.get('currentPrice', 0) or info.get('regularMarketPrice', 0)
+            options = source.get_options(symbol)
+            if not price or not options:
+                continue
+            prices[symbol] = price
+            chain = source.get_option_chain(symbol, options[0])
+        except Exception as e:
+            print(f"Error loading {symbol} from {day_dir}: {str(e)}")
+            continue
+
+        for df in (chain.calls, chain.puts):
+            if df.empty:
+                continue
+            volume = df['volume'].to_numpy(dtype='float64')
+            open_interest = np.nan_to_num(df['openInterest'].to_numpy(dtype='float64'))
+            ratio = volume_oi_ratio(volume, open_interest)
+            premium = volume * df['lastPrice'].to_numpy(dtype='float64') * 100
+
+            mask = unusual_volume_mask(volume, ratio, premium, *loosest)
+            if mask.any():
+                frames.append(pd.DataFrame({
+                    'day': day_index,
+                    'symbol': symbol,
+                    'volume': volume[mask],
+                    'volume_ratio': ratio[mask],
+                    'premium': premium[mask]
+                }))
+
+    candidates = pd.concat(frames, ignore_index=True) if frames else None
+    return candidates, prices
+
+def loosest_thresholds(volume_ratio_grid, volume_grid, premium_grid):
+    """The detector mask only grows as thresholds drop, so the loosest config flags a superset"""
+    return (min(volume_ratio_grid), min(volume_grid), min(premium_grid))
+
+class Backtester:
+    def __init__(self, archive_dir, workers=None, alerts_per_day=ALERTS_PER_SCAN):
+        self.archive_dir = archive_dir
+        self.workers = workers or os.cpu_count()
+        self.alerts_per_day = alerts_per_day
+        self.days = archive_dates(archive_dir)
+        self.candidates = None
+        self.returns = None
+        # Loosest (volume ratio, volume, premium) thresholds the cached candidates were filtered with
+        self.loaded_thresholds = None
+
+    def load(self, volume_ratio_grid, volume_grid, premium_grid):
+        """Read every snapshot once in parallel, keeping contracts any configuration could flag"""
+        loosest = loosest_thresholds(volume_ratio_grid, volume_grid, premium_grid)
+        tasks = [(os.path.join(self.archive_dir, day.isoformat()), i, loosest) for i, day in enumerate(self.days)]
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            loaded = list(pool.map(load_day, tasks, chunksize=max(1, len(tasks) // (self.workers * 4))))
+
+        frames = [candidates for candidates, _ in loaded if candidates is not None]
+        if not frames:
+            raise ValueError(f"No candidate contracts found in {self.archive_dir}")
+        candidates = pd.concat(frames, ignore_index=True)
+        candidates['symbol'] = candidates['symbol'].astype('category')
+
+        prices = pd.DataFrame([p for _, p in loaded], index=range(len(self.days)))
+        prices = prices.reindex(columns=candidates['symbol'].cat.categories).to_numpy(dtype='float64')
+
+        # One signal per (day, symbol); contracts of the same underlying share its return
+        candidates['pair'] = candidates['day'].to_numpy() * len(prices[0]) + candidates['symbol'].cat.codes.to_numpy()
+        self.candidates = candidates.sort_values('pair', kind='stable', ignore_index=True)
+
+        # Vectorized forward-return lookup for every distinct (day, symbol)
+        pairs = np.unique(self.candidates['pair'].to_numpy())
+        day_idx, symbol_idx = np.divmod(pairs, len(prices[0]))
+        entry = prices[day_idx, symbol_idx]
+        self.returns = {'day': day_idx}
+        for name, offset in HORIZONS.items():
+            later = day_idx + offset
+            valid = later < len(prices)
+            exit_price = np.full(len(pairs), np.nan)
+            exit_price[valid] = prices[later[valid], symbol_idx[valid]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.returns[name] = exit_price / entry - 1
+        self.loaded_thresholds = loosest
+        return self.candidates
+
+    def covers(self, volume_ratio_grid, volume_grid, premium_grid):
+        """Whether the cached candidates include every contract these grids could flag"""
+        if self.loaded_thresholds is None:
+            return False
+        loosest = loosest_thresholds(volume_ratio_grid, volume_grid, premium_grid)
+        return all(loaded <= needed for loaded, needed in zip(self.loaded_thresholds, loosest))
+
+    def sweep(self, volume_ratio_grid=VOLUME_RATIO_GRID, volume_grid=VOLUME_GRID,
+              premium_grid=PREMIUM_GRID, success_grid=SUCCESS_GRID):
+        """Hit rate and average forward returns for every threshold combination"""
+        if not self.covers(volume_ratio_grid, volume_grid, premium_grid):
+            self.load(volume_ratio_grid, volume_grid, premium_grid)
+
+        detector_grid = list(itertools.product(volume_ratio_grid, volume_grid, premium_grid))
+        chunks = [detector_grid[i::self.workers] for i in range(self.workers) if detector_grid[i::self.workers]]
+
+        with ProcessPoolExecutor(len(chunks), initializer=_init_worker,
+                                 initargs=(self.candidates, self.returns, self.alerts_per_day)) as pool:
+            results = pool.map(_evaluate_chunk, chunks, itertools.repeat(success_grid))
+            rows = [row for chunk in results for row in chunk]
+
+        report = pd.DataFrame(rows)
+        return report.sort_values(['hit_rate', 'alerts'], ascending=False, ignore_index=True)
+
+_worker_state = {}
+
+def _init_worker(candidates, returns, alerts_per_day):
+    _worker_state.update(candidates=candidates, returns=returns, alerts_per_day=alerts_per_day)
+
+def _evaluate_chunk(detector_configs, success_grid):
+    candidates = _worker_state['candidates']
+    returns = _worker_state['returns']
+    volume = candidates['volume'].to_numpy()
+    ratio = candidates['volume_ratio'].to_numpy()
+    premium = candidates['premium'].to_numpy()
+
+    # Candidates are sorted by pair, so each pair is one contiguous run
+    pair_ids = candidates['pair'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, pair_ids[1:] != pair_ids[:-1]])
+
+    rows = []
+    for volume_ratio_threshold, volume_threshold, premium_threshold in detector_configs:
+        mask = unusual_volume_mask(volume, ratio, premium, volume_ratio_threshold, volume_threshold, premium_threshold)
+        # Largest flagged premium per (day, symbol), -inf when nothing was flagged
+        pair_premium = np.maximum.reduceat(np.where(mask, premium, -np.inf), starts)
+        selected = select_alerts(returns['day'], pair_premium, _worker_state['alerts_per_day'])
+
+        for success_threshold in success_grid:
+            rows.append(evaluate(selected, returns, {
+                'volume_ratio_threshold': volume_ratio_threshold,
+                'volume_threshold': volume_threshold,
+                'premium_threshold': premium_threshold,
+                'success_threshold': success_threshold
+            }))
+    return rows
+
+def select_alerts(days, pair_premium, alerts_per_day):
+    """Flagged (day, symbol) pairs, limited to the top alerts_per_day by premium as in the dashboard"""
+    flagged = np.flatnonzero(np.isfinite(pair_premium))
+    if not alerts_per_day or len(flagged) == 0:
+        return flagged
+    order = flagged[np.lexsort((-pair_premium[flagged], days[flagged]))]
+    ordered_days = days[order]
+    first_of_day = np.r_[0, np.flatnonzero(ordered_days[1:] != ordered_days[:-1]) + 1]
+    rank = np.arange(len(order)) - np.repeat(first_of_day, np.diff(np.r_[first_of_day, len(order)]))
+    return np.sort(order[rank < alerts_per_day])
+
+def evaluate(selected, returns, config):
+    """Alert count, hit rate (same rule as update_alert_performance) and mean returns for one configuration"""
+    row = dict(config, alerts=len(selected))
+    # NaN returns (no later snapshot yet) never count as a hit, like NULL in SQL
+    hit = np.zeros(len(selected), dtype=bool)
+    for name in HORIZONS:
+        horizon_returns = returns[name][selected]
+        hit |= np.nan_to_num(horizon_returns, nan=-np.inf) > config['success_threshold']
+        row[f'avg_return_{name}'] = float(np.nanmean(horizon_returns)) if np.isfinite(horizon_returns).any() else None
+    row['hit_rate'] = float(hit.mean()) if len(selected) else None
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay archived chain snapshots through the detector over a threshold grid")
+    parser.add_argument('archive', help="directory of YYYY-MM-DD snapshot directories")
+    parser.add_argument('--record', action='store_true', help="snapshot today's watchlist chains into the archive and exit")
+    parser.add_argument('--volume-ratio', type=float, nargs='+', default=VOLUME_RATIO_GRID)
+    parser.add_argument('--volume', type=float, nargs='+', default=VOLUME_GRID)
+    parser.add_argument('--premium', type=float, nargs='+', default=PREMIUM_GRID)
+    parser.add_argument('--success', type=float, nargs='+', default=SUCCESS_GRID)
+    parser.add_argument('--alerts-per-day', type=int, default=ALERTS_PER_SCAN, help="0 to evaluate every flagged symbol")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--output', help="write the full report to this CSV file")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        recorded = record_archive_day(args.archive)
+        print(f"Recorded {len(recorded)} symbols")
+        return 0
+
+    backtester = Backtester(args.archive, args.workers, args.alerts_per_day)
+    if len(backtester.days) < 2:
+        print(f"Need at least two snapshot days in {args.archive}, found {len(backtester.days)}")
+        return 1
+
+    report = backtester.sweep(args.volume_ratio, args.volume, args.premium, args.success)
+    if args.output:
+        report.to_csv(args.output, index=False)
+
+    print(f"{len(backtester.days)} days, {len(backtester.candidates):,} candidate contracts, {len(report)} configurations\n")
+    print(report.head(20).to_string(index=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
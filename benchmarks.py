@@ -0,0 +1,419 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+import numpy as np
+import pandas as pd
+from data_sources import OptionChain
+from database import Database
+from email_config import EmailManager
+from greeks import black_scholes_greeks_scalar, chain_greeks, parse_expiries, years_to_expiry
+from storage import open_database
+from utils import StockDataFetcher
+
+BENCH_RESULTS_FILE = os.getenv("BENCH_RESULTS_FILE", "bench_results.jsonl")
+REGRESSION_THRESHOLD = 0.20
+
+CHAIN_SIZES = [100, 1000, 10000, 50000]
+GREEKS_SIZES = [10000, 100000]
+BACKTEST_DAYS = 252
+QUICK_BACKTEST_DAYS = 20
+UNIVERSE_SIZE = 2000
+QUICK_UNIVERSE_SIZE = 200
+GREEKS_TOLERANCE = 1e-6
+DB_SIZES = [10000, 100000, 1000000]
+QUICK_CHAIN_SIZES = [100, 1000, 10000]
+QUICK_DB_SIZES = [10000, 100000]
+
+def make_synthetic_chain(num_contracts, symbol='SYN', spot=100.0, seed=0):
+    """Build a calls/puts chain with yfinance columns and realistic gaps"""
+    rng = np.random.default_rng(seed)
+    chain = {}
+
+    for option_type, side in (('calls', 'C'), ('puts', 'P')):
+        n = num_contracts // 2 if side == 'C' else num_contracts - num_contracts // 2
+        strikes = np.round(spot * rng.uniform(0.5, 1.5, n), 1)
+        moneyness = (spot - strikes) if side == 'C' else (strikes - spot)
+        last_price = np.round(np.maximum(moneyness, 0) + rng.gamma(1.5, spot * 0.01, n), 2)
+
+        # Heavy-tailed volume with the NaN/zero mix seen on real chains
+        volume = np.floor(rng.lognormal(4.0, 2.0, n))
+        volume[rng.random(n) < 0.20] = 0
+        volume[rng.random(n) < 0.15] = np.nan
+        open_interest = np.floor(rng.lognormal(5.5, 2.0, n))
+        open_interest[rng.random(n) < 0.10] = 0
+        open_interest[rng.random(n) < 0.02] = np.nan
+        last_price[rng.random(n) < 0.05] = 0
+        implied_vol = rng.uniform(0.1, 1.5, n)
+        implied_vol[rng.random(n) < 0.03] = np.nan
+
+        chain[option_type] = pd.DataFrame({
+            'contractSymbol': [f"{symbol}261218{side}{int(k * 1000):08d}" for k in strikes],
+            'lastTradeDate': pd.Timestamp('2026-10-16 15:59', tz='UTC'),
+            'strike': strikes,
+            'lastPrice': last_price,
+            'bid': np.round(last_price * 0.97, 2),
+            'ask': np.round(last_price * 1.03, 2),
+            'change': 0.0,
+            'percentChange': 0.0,
+            'volume': volume,
+            'openInterest': open_interest,
+            'impliedVolatility': implied_vol,
+            'inTheMoney': moneyness > 0,
+            'contractSize': 'REGULAR',
+            'currency': 'USD'
+        })
+
+    return OptionChain(chain['calls'], chain['puts'])
+
+class SyntheticSource:
+    """Data source serving pre-built synthetic chains instead of Yahoo Finance"""
+    def __init__(self, contracts_per_symbol=1000, seed=0):
+        self.contracts_per_symbol = contracts_per_symbol
+        self.seed = seed
+        self._chains = {}
+
+    def get_info(self, symbol):
+        return {'currentPrice': 100.0, 'regularMarketPrice': 100.0, 'longName': f"{symbol} Synthetic Inc."}
+
+    def get_options(self, symbol):
+        return ('2026-12-18',)
+
+    def get_option_chain(self, symbol, expiry):
+        chain = self._chains.get(symbol)
+        if chain is None:
+            seed = self.seed + sum(map(ord, symbol))
+            chain = self._chains[symbol] = make_synthetic_chain(self.contracts_per_symbol, symbol, seed=seed)
+        return chain
+
+    def get_history(self, symbol, start, end):
+        dates = pd.bdate_range(start, end)
+        rng = np.random.default_rng(self.seed)
+        close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        return pd.DataFrame({'Close': close}, index=dates)
+
+def make_alert_database(db, num_alerts, num_users=10, seed=0):
+    """Fill a database with num_alerts rows spread over users and a year"""
+    rng = np.random.default_rng(seed)
+    symbols = np.array(StockDataFetcher(source=SyntheticSource()).watchlist)
+    start = datetime.now() - timedelta(days=365)
+    details = json.dumps({'option_type': 'CALL', 'strike': 100.0, 'volume': 5000, 'premium': 250000.0})
+
+    for i in range(num_users):
+        db.create_user(f"bench{i}", 'bench', f"bench{i}@example.com")
+    users = np.array([db.verify_user(f"bench{i}", 'bench')[1] for i in range(num_users)])
+
+    batch = 100000
+    for offset in range(0, num_alerts, batch):
+        n = min(batch, num_alerts - offset)
+        user_ids = users[rng.integers(0, num_users, n)]
+        chosen = symbols[rng.integers(0, len(symbols), n)]
+        seconds = np.sort(rng.integers(0, 365 * 86400, n)) if offset == 0 else rng.integers(0, 365 * 86400, n)
+        returns = rng.normal(0.005, 0.04, n)
+        has_return = rng.random(n) < 0.6
+        # Rows in ALERT_IMPORT_COLUMNS order
+        rows = [
+            (int(user_ids[i]), (start + timedelta(seconds=int(seconds[i]))).strftime('%Y-%m-%d %H:%M:%S'),
+             chosen[i], 'Unusual Options Activity', f"{chosen[i]}: synthetic alert", details, False, 100.0, None,
+             float(returns[i]) if has_return[i] else None,
+             float(returns[i]) if has_return[i] else None,
+             int(returns[i] > 0.02) if has_return[i] else None)
+            for i in range(n)
+        ]
+        db.bulk_insert_alerts(rows)
+
+def make_backtest_archive(path, days, symbols, contracts_per_symbol=500, seed=0):
+    """Write days of snapshot directories with random-walk prices for the backtester"""
+    rng = np.random.default_rng(seed)
+    prices = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.015, (days, len(symbols))), axis=0))
+    for day_index, day in enumerate(pd.bdate_range(end=datetime.now().date(), periods=days)):
+        for symbol_index, symbol in enumerate(symbols):
+            symbol_dir = os.path.join(path, day.date().isoformat(), symbol)
+            os.makedirs(symbol_dir, exist_ok=True)
+            spot = float(prices[day_index, symbol_index])
+            chain = make_synthetic_chain(contracts_per_symbol, symbol, spot=spot, seed=seed + day_index * len(symbols) + symbol_index)
+            with open(os.path.join(symbol_dir, 'info.json'), 'w') as f:
+                json.dump({'currentPrice': spot, 'longName': f"{symbol} Synthetic Inc."}, f)
+            with open(os.path.join(symbol_dir, 'options.json'), 'w') as f:
+                json.dump(['2026-12-18'], f)
+            chain.calls.to_csv(os.path.join(symbol_dir, '2026-12-18_calls.csv.gz'), index=False)
+            chain.puts.to_csv(os.path.join(symbol_dir, '2026-12-18_puts.csv.gz'), index=False)
+
+def measure(func, repeat=5, number=1):
+    """Run func repeat x number times, returns timing stats in seconds per call"""
+    func()  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {'best': min(timings), 'median': float(np.median(timings)), 'repeat': repeat, 'number': number}
+
+def bench_detect(sizes):
+    """_find_unusual_volume and detect_unusual_options_activity over chain sizes"""
+    results = {}
+    for size in sizes:
+        fetcher = StockDataFetcher(source=SyntheticSource(size))
+        chain = fetcher.source.get_option_chain('SYN', None)
+        repeat = 5 if size <= 10000 else 3
+        results[f"find_unusual_volume[{size}]"] = measure(lambda: fetcher._find_unusual_volume(chain.calls, 'CALL'), repeat)
+        results[f"detect_unusual_options_activity[{size}]"] = measure(lambda: fetcher.detect_unusual_options_activity('SYN'), repeat)
+    return results
+
+def check_greeks(chain, spot, greeks, sample=2000):
+    """Max abs difference between chain_greeks and the scalar reference over a sample of contracts"""
+    contracts = pd.concat([chain.calls, chain.puts], ignore_index=True)
+    years = years_to_expiry(parse_expiries(contracts['contractSymbol'].to_numpy()))
+    is_call = greeks['option_type'].to_numpy() == 'CALL'
+
+    worst = 0.0
+    for i in np.linspace(0, len(contracts) - 1, min(sample, len(contracts))).astype(int):
+        expected = black_scholes_greeks_scalar(spot, contracts['strike'].iloc[i], years[i], contracts['impliedVolatility'].iloc[i], is_call[i])
+        actual = (greeks['delta'].iloc[i], greeks['gamma'].iloc[i], greeks['vega'].iloc[i])
+        worst = max(worst, max(abs(a - e) for a, e in zip(actual, expected)))
+    return worst
+
+def bench_greeks(sizes):
+    """chain_greeks over chain sizes, validated against the scalar reference"""
+    results = {}
+    for size in sizes:
+        chain = make_synthetic_chain(size)
+        greeks = chain_greeks(chain, 100.0)
+        error = check_greeks(chain, 100.0, greeks)
+        if error > GREEKS_TOLERANCE:
+            raise AssertionError(f"chain_greeks[{size}] differs from the scalar reference by {error:.2e}")
+        results[f"chain_greeks[{size}]"] = measure(lambda: chain_greeks(chain, 100.0), 5 if size <= 10000 else 3)
+    return results
+
+def bench_backtest(workdir, days, symbols=50):
+    """Snapshot loading and a full threshold-grid sweep over a synthetic archive"""
+    from backtest import Backtester, VOLUME_RATIO_GRID, VOLUME_GRID, PREMIUM_GRID
+
+    path = os.path.join(workdir, f"backtest_{days}x{symbols}")
+    if not os.path.exists(path):
+        make_backtest_archive(path, days, [f"S{i:02d}" for i in range(symbols)])
+
+    backtester = Backtester(path)
+    load = measure(lambda: backtester.load(VOLUME_RATIO_GRID, VOLUME_GRID, PREMIUM_GRID), 1)
+    sweep = measure(backtester.sweep, 3)
+    return {f"backtest_load[{days}x{symbols}]": load, f"backtest_sweep[{days}x{symbols}]": sweep}
+
+def bench_scan(sizes):
+    """scan_all_watchlist over a stubbed source"""
+    results = {}
+    for size in sizes:
+        fetcher = StockDataFetcher(source=SyntheticSource(size))
+        repeat = 3 if size <= 10000 else 1
+        results[f"scan_all_watchlist[{len(fetcher.watchlist)}x{size}]"] = measure(fetcher.scan_all_watchlist, repeat)
+    return results
+
+def bench_sharded_scan(workdir, symbols):
+    """Sharded scan of a replayed universe at doubling worker counts, up to one per core"""
+    from sharded_scan import ShardedScanner, replay_source
+
+    path = os.path.join(workdir, f"universe_{symbols}")
+    if not os.path.exists(path):
+        make_backtest_archive(path, 1, [f"U{i:04d}" for i in range(symbols)])
+    snapshot_dir = os.path.join(path, os.listdir(path)[0])
+    universe = sorted(os.listdir(snapshot_dir))
+
+    results = {}
+    workers = 1
+    while True:
+        scanner = ShardedScanner(partial(replay_source, snapshot_dir), workers)
+        try:
+            # The warm-up run starts the pool, so worker startup isn't timed
+            results[f"sharded_scan[{symbols}x{workers}w]"] = measure(lambda: scanner.scan(universe), 2)
+        finally:
+            scanner.close()
+        if workers >= os.cpu_count():
+            return results
+        workers = min(workers * 2, os.cpu_count())
+
+def bench_database(sizes, workdir, database_url=None):
+    """save_alert, get_user_alerts and get_performance_stats over database sizes, on SQLite or a database URL"""
+    results = {}
+    details = {'option_type': 'CALL', 'strike': 100.0, 'volume': 5000, 'premium': 250000.0}
+    for size in sizes:
+        if database_url:
+            # One server database is refilled per size; names are tagged so runs compare per backend
+            db = open_database(url=database_url)
+            db.reset_alerts()
+            make_alert_database(db, size)
+            label = f"{size}, {type(db).__name__}"
+        else:
+            path = os.path.join(workdir, f"bench_{size}.db")
+            if not os.path.exists(path):
+                make_alert_database(Database(path), size)
+            db = Database(path)
+            label = size
+        user_id = db.verify_user('bench0', 'bench')[1]
+        results[f"save_alert[{label}]"] = measure(
+            lambda: db.save_alert(user_id, 'AAPL', 'Unusual Options Activity', 'bench', details, 100.0), 5, 20)
+        results[f"get_user_alerts[{label}]"] = measure(lambda: db.get_user_alerts(user_id, limit=100), 5, 5)
+        results[f"get_performance_stats[{label}]"] = measure(lambda: db.get_performance_stats(user_id), 5, 5)
+    return results
+
+def bench_email():
+    """create_html_email for a typical alert"""
+    manager = EmailManager()
+    alert = {
+        'symbol': 'AAPL',
+        'alert_type': 'Unusual Options Activity',
+        'message': 'AAPL: 12,345 CALLs @ $200 - $1.2M premium',
+        'current_price': 198.5,
+        'details': {'volume': 12345, 'volume_ratio': 4.2, 'option_type': 'CALL', 'strike': 200.0, 'premium': 1234500.0}
+    }
+    return {'create_html_email': measure(lambda: manager.create_html_email(alert), 5, 200)}
+
+def bench_api(workdir, clients=8, duration=3.0, database_url=None):
+    """Requests per second of the JSON API, with and without conditional requests"""
+    from api_server import create_server
+    from scanner import ScanService
+
+    db = open_database(url=database_url or os.path.join(workdir, 'bench_api.db'))
+    fetcher = StockDataFetcher(source=SyntheticSource(1000))
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            ScanService(fetcher, db).run_cycle()
+        finally:
+            sys.stdout = stdout
+
+    server = create_server(db, host='127.0.0.1', port=0, token='')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    results = {}
+    for name, path, conditional in (('api_unusual', '/api/unusual', False),
+                                    ('api_unusual_304', '/api/unusual', True),
+                                    ('api_sentiment', '/api/sentiment', False),
+                                    ('api_user_alerts', '/api/users/1/alerts?per_page=50', False),
+                                    ('api_user_alerts_304', '/api/users/1/alerts?per_page=50', True)):
+        counts = [0] * clients
+        stop = time.perf_counter() + duration
+
+        def client(index):
+            conn = http.client.HTTPConnection('127.0.0.1', port)
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            headers = {'If-None-Match': response.getheader('ETag')} if conditional else {}
+            while time.perf_counter() < stop:
+                conn.request('GET', path, headers=headers)
+                conn.getresponse().read()
+                counts[index] += 1
+            conn.close()
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        rps = sum(counts) / duration
+        results[f"{name}[{clients} clients]"] = {'best': 1 / rps, 'median': 1 / rps, 'rps': rps, 'repeat': 1, 'number': sum(counts)}
+
+    server.shutdown()
+    server.server_close()
+    return results
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def load_previous_run(path, commit):
+    """Latest stored run from a different commit"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            run = json.loads(line)
+            if run['commit'] != commit:
+                previous = run
+    return previous
+
+def compare_runs(current, previous, threshold=REGRESSION_THRESHOLD):
+    """Benchmarks whose best time got slower than threshold since the previous run"""
+    regressions = []
+    for name, stats in current['results'].items():
+        before = previous['results'].get(name)
+        if before and stats['best'] > before['best'] * (1 + threshold):
+            regressions.append((name, before['best'], stats['best']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark detection and storage hot paths")
+    parser.add_argument('--quick', action='store_true', help="smaller chain and database sizes")
+    parser.add_argument('--only', choices=['detect', 'greeks', 'scan', 'sharded', 'database', 'email', 'api', 'backtest'], action='append')
+    parser.add_argument('--chain-sizes', type=int, nargs='+')
+    parser.add_argument('--db-sizes', type=int, nargs='+')
+    parser.add_argument('--database-url', help="run the database and api suites against this database "
+                                               "(e.g. postgresql://localhost/smt_bench) instead of SQLite files")
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'smt_bench'))
+    parser.add_argument('--results', default=BENCH_RESULTS_FILE)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    chain_sizes = args.chain_sizes or (QUICK_CHAIN_SIZES if args.quick else CHAIN_SIZES)
+    db_sizes = args.db_sizes or (QUICK_DB_SIZES if args.quick else DB_SIZES)
+    suites = args.only or ['detect', 'greeks', 'scan', 'sharded', 'database', 'email', 'api', 'backtest']
+    os.makedirs(args.workdir, exist_ok=True)
+
+    results = {}
+    if 'detect' in suites:
+        results.update(bench_detect(chain_sizes))
+    if 'greeks' in suites:
+        results.update(bench_greeks(GREEKS_SIZES))
+    if 'scan' in suites:
+        results.update(bench_scan(chain_sizes))
+    if 'sharded' in suites:
+        results.update(bench_sharded_scan(args.workdir, QUICK_UNIVERSE_SIZE if args.quick else UNIVERSE_SIZE))
+    if 'database' in suites:
+        results.update(bench_database(db_sizes, args.workdir, args.database_url))
+    if 'email' in suites:
+        results.update(bench_email())
+    if 'api' in suites:
+        results.update(bench_api(args.workdir, database_url=args.database_url))
+    if 'backtest' in suites:
+        results.update(bench_backtest(args.workdir, QUICK_BACKTEST_DAYS if args.quick else BACKTEST_DAYS))
+
+    run = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results
+    }
+
+    print(f"\n{'benchmark':<50} {'best (ms)':>12} {'median (ms)':>12}")
+    for name, stats in results.items():
+        print(f"{name:<50} {stats['best'] * 1000:>12.3f} {stats['median'] * 1000:>12.3f}")
+
+    previous = load_previous_run(args.results, run['commit'])
+    with open(args.results, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+    if previous:
+        regressions = compare_runs(run, previous)
+        print(f"\nCompared with {previous['commit']} ({previous['timestamp']}): {len(regressions)} regression(s)")
+        for name, before, after in regressions:
+            print(f"  {name}: {before * 1000:.3f} ms -> {after * 1000:.3f} ms")
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Chart configuration - override in .env file
+CHART_POINT_BUDGET = int(os.getenv("CHART_POINT_BUDGET", "2000"))
+CHART_WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "1000"))
+
+def render_mode(num_points):
+    """Pick the Plotly render mode for a 2D scatter of this size"""
+    return 'webgl' if num_points > CHART_WEBGL_THRESHOLD else 'svg'
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets downsampling, returns the indices to keep"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int(np.floor((i + 1) * every)) + 1
+        avg_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[avg_start:avg_end].mean()
+        avg_y = y[avg_start:avg_end].mean()
+
+        # Keep the point in this bucket that forms the largest triangle
+        range_start = int(np.floor(i * every)) + 1
+        range_end = int(np.floor((i + 1) * every)) + 1
+        area = np.abs(
+            (x[a] - avg_x) * (y[range_start:range_end] - y[a])
+            - (x[a] - x[range_start:range_end]) * (avg_y - y[a])
+        )
+        a = range_start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+def prepare_timeseries(df, x, y, budget=None, group=None):
+    """Downsample a time series with LTTB, returns (DataFrame, points dropped)"""
+    budget = budget or CHART_POINT_BUDGET
+    total = len(df)
+    if total <= budget:
+        return df, 0
+
+    df = df.sort_values(x)
+    groups = [df] if group is None else [g for _, g in df.groupby(group, observed=True, sort=False)]
+
+    kept = []
+    for frame in groups:
+        # Split the budget across series in proportion to their size
+        share = max(3, int(budget * len(frame) / total))
+        x_values = pd.to_numeric(frame[x]) if np.issubdtype(frame[x].dtype, np.datetime64) else frame[x]
+        y_values = frame[y].fillna(0)
+        kept.append(frame.iloc[lttb_indices(x_values.to_numpy(), y_values.to_numpy(), share)])
+
+    sampled = pd.concat(kept)
+    return sampled, total - len(sampled)
+
+def chain_contracts(chains):
+    """Flatten full option chains ({symbol: OptionChain}) into one row per contract for scatters"""
+    from utils import volume_oi_ratio
+
+    frames = []
+    for symbol, chain in chains.items():
+        for option_type, df in (('CALL', chain.calls), ('PUT', chain.puts)):
+            if df is None or df.empty:
+                continue
+            volume = np.nan_to_num(df['volume'].to_numpy(dtype=np.float64))
+            open_interest = np.nan_to_num(df['openInterest'].to_numpy(dtype=np.float64)) if 'openInterest' in df else np.zeros(len(df))
+            frames.append(pd.DataFrame({
+                'symbol': symbol,
+                'option_type': option_type,
+                'strike': df['strike'].to_numpy(dtype=np.float64),
+                'volume': volume,
+                'volume_ratio': np.round(volume_oi_ratio(volume, open_interest), 2),
+                'premium': volume * np.nan_to_num(df['lastPrice'].to_numpy(dtype=np.float64)) * 100
+            }))
+    if not frames:
+        return pd.DataFrame(columns=['symbol', 'option_type', 'strike', 'volume', 'volume_ratio', 'premium'])
+    return pd.concat(frames, ignore_index=True)
+
+def prepare_scatter(df, columns, budget=None, priority=None, log_columns=()):
+    """Downsample a scatter by grid binning, keeping the highest-priority point per bin
+
+    log_columns are binned on a log scale, so heavy-tailed volume and premium axes
+    don't crowd most points into the lowest bin.
+    """
+    budget = budget or CHART_POINT_BUDGET
+    total = len(df)
+    if total <= budget:
+        return df, 0
+
+    bins_per_axis = max(1, int(budget ** (1 / len(columns))))
+    bin_id = np.zeros(total, dtype=np.int64)
+
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        if column in log_columns:
+            values = np.log1p(np.clip(values, 0, None))
+        low, high = np.nanmin(values), np.nanmax(values)
+        values = np.nan_to_num(values, nan=low)
+        span = (high - low) or 1.0
+        axis_bin = np.clip(((values - low) / span * bins_per_axis).astype(np.int64), 0, bins_per_axis - 1)
+        bin_id = bin_id * bins_per_axis + axis_bin
+
+    if priority is None:
+        keep = pd.Series(np.arange(total)).groupby(bin_id).first().to_numpy()
+    else:
+        order = df[priority].to_numpy()
+        keep = pd.Series(order).groupby(bin_id).idxmax().to_numpy()
+
+    sampled = df.iloc[np.sort(keep)]
+    return sampled, total - len(sampled)
@@ -0,0 +1,39 @@
+import os
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Test database configuration - override in .env file
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")    # PostgreSQL the storage tests also run against; emptied per test
+
+def reset_postgres(url):
+    """Empty every table except schema_version, restarting the id sequences"""
+    import psycopg2
+    conn = psycopg2.connect(url)
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute('''
+                SELECT tablename FROM pg_tables
+                WHERE schemaname = current_schema() AND tablename <> 'schema_version'
+            ''')
+            tables = [row[0] for row in cursor.fetchall()]
+            if tables:
+                cursor.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+    finally:
+        conn.close()
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def database_url(request, tmp_path):
+    """URL of an empty database on each storage backend; PostgreSQL is skipped without TEST_DATABASE_URL"""
+    if request.param == 'sqlite':
+        return os.path.join(tmp_path, 'test.db')
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    reset_postgres(TEST_DATABASE_URL)
+    return TEST_DATABASE_URL
+
+@pytest.fixture
+def db(database_url):
+    from storage import open_database
+    return open_database(url=database_url)
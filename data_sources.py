@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from collections import namedtuple
+import pandas as pd
+import yfinance as yf
+
+# Calls and puts DataFrames for one expiry, same columns as yfinance
+OptionChain = namedtuple('OptionChain', ['calls', 'puts'])
+
+class YFinanceSource:
+    """Live market data from Yahoo Finance"""
+    def __init__(self):
+        # Reused within a scan cycle only: a Ticker memoizes .info and .options,
+        # so keeping it longer would serve stale prices and expired expiries
+        self._tickers = {}
+
+    def start_cycle(self):
+        """Drop the cycle's Ticker objects so the next fetches see fresh quotes and expiries"""
+        self._tickers = {}
+
+    def _ticker(self, symbol):
+        ticker = self._tickers.get(symbol)
+        if ticker is None:
+            ticker = self._tickers[symbol] = yf.Ticker(symbol)
+        return ticker
+
+    def get_info(self, symbol):
+        """Quote and company info dict"""
+        return self._ticker(symbol).info
+
+    def get_options(self, symbol):
+        """Available option expiry dates, nearest first"""
+        return self._ticker(symbol).options
+
+    def get_option_chain(self, symbol, expiry):
+        """Options chain for one expiry"""
+        chain = self._ticker(symbol).option_chain(expiry)
+        return OptionChain(chain.calls, chain.puts)
+
+    def get_history(self, symbol, start, end):
+        """Daily price history"""
+        return self._ticker(symbol).history(start=start, end=end)
+
+class ReplaySource:
+    """Market data replayed from a snapshot directory written by record_snapshot"""
+    def __init__(self, snapshot_dir, latency=0.0, cache=True):
+        self.snapshot_dir = snapshot_dir
+        self.latency = latency
+        self.cache = cache
+        self._cache = {}
+
+    def _load(self, key, loader):
+        # Simulated upstream latency is paid on every call, parsing only once when caching
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.cache:
+            return loader()
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = loader()
+        return value
+
+    def _path(self, symbol, name):
+        return os.path.join(self.snapshot_dir, symbol, name)
+
+    def symbols(self):
+        """Symbols available in the snapshot"""
+        return sorted(os.listdir(self.snapshot_dir))
+
+    def get_info(self, symbol):
+        def load():
+            with open(self._path(symbol, 'info.json')) as f:
+                return json.load(f)
+        return self._load((symbol, 'info'), load)
+
+    def get_options(self, symbol):
+        def load():
+            with open(self._path(symbol, 'options.json')) as f:
+                return tuple(json.load(f))
+        return self._load((symbol, 'options'), load)
+
+    def get_option_chain(self, symbol, expiry):
+        def load():
+            return OptionChain(
+                pd.read_csv(self._path(symbol, f"{expiry}_calls.csv.gz")),
+                pd.read_csv(self._path(symbol, f"{expiry}_puts.csv.gz"))
+            )
+        return self._load((symbol, expiry), load)
+
+    def get_history(self, symbol, start, end):
+        def load():
+            path = self._path(symbol, 'history.csv.gz')
+            if not os.path.exists(path):
+                return pd.DataFrame()
+            return pd.read_csv(path, index_col=0, parse_dates=True)
+        hist = self._load((symbol, 'history'), load)
+        if hist.empty:
+            return hist
+        return hist[(hist.index >= pd.Timestamp(start)) & (hist.index <= pd.Timestamp(end))]
+
+def record_snapshot(source, symbols, snapshot_dir, expiries=1):
+    """Save quotes and the nearest option chains of symbols for a ReplaySource"""
+    recorded = []
+    for symbol in symbols:
+        try:
+            info = source.get_info(symbol)
+            options = list(source.get_options(symbol))[:expiries]
+            if not options:
+                continue
+
+            symbol_dir = os.path.join(snapshot_dir, symbol)
+            os.makedirs(symbol_dir, exist_ok=True)
+            with open(os.path.join(symbol_dir, 'info.json'), 'w') as f:
+                json.dump({k: v for k, v in info.items() if isinstance(v, (str, int, float, bool))}, f)
+            with open(os.path.join(symbol_dir, 'options.json'), 'w') as f:
+                json.dump(options, f)
+
+            for expiry in options:
+                chain = source.get_option_chain(symbol, expiry)
+                chain.calls.to_csv(os.path.join(symbol_dir, f"{expiry}_calls.csv.gz"), index=False)
+                chain.puts.to_csv(os.path.join(symbol_dir, f"{expiry}_puts.csv.gz"), index=False)
+            recorded.append(symbol)
+        except Exception as e:
+            print(f"Error recording {symbol}: {str(e)}")
+    return recorded
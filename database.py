@@ -1,19 +1,112 @@
 import sqlite3
 import json
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 import hashlib
-import pandas as pd
+from metrics import metrics, timed
+
+# pandas is imported by the methods that return DataFrames, so the login page
+# (user lookups only) doesn't load it
+
+SUCCESS_RETURN_THRESHOLD = 0.02    # An alert succeeded if the price moved more than this in any timeframe
+
+# Schema migrations by version, applied in order after the base tables exist.
+# Version 1 is the base schema created by init_database.
+SCHEMA_VERSION = 4
+MIGRATIONS = {
+    2: [
+        # History pages and per-user counts, newest first
+        'CREATE INDEX IF NOT EXISTS idx_alerts_user_time ON alerts (user_id, timestamp, id)',
+        # Retention cutoff scans
+        'CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)'
+    ],
+    3: [
+        # Multi-node scan cycles, published once every batch is done
+        '''CREATE TABLE IF NOT EXISTS scan_cycles (
+            cycle_id INTEGER PRIMARY KEY,
+            batches INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            published_at REAL,
+            published_by TEXT
+        )''',
+        # One leasable symbol batch per row; results are stored by the lease holder on completion
+        '''CREATE TABLE IF NOT EXISTS scan_leases (
+            cycle_id INTEGER NOT NULL,
+            batch INTEGER NOT NULL,
+            symbols TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            completed_at REAL,
+            results TEXT,
+            PRIMARY KEY (cycle_id, batch)
+        ) WITHOUT ROWID'''
+    ],
+    4: [
+        # Last alert per (user, contract, alert type), shared by every process alerting on this database
+        '''CREATE TABLE IF NOT EXISTS alert_cooldowns (
+            user_id INTEGER NOT NULL,
+            contract_symbol TEXT NOT NULL,
+            alert_type TEXT NOT NULL,
+            alerted_at REAL NOT NULL,
+            PRIMARY KEY (user_id, contract_symbol, alert_type)
+        ) WITHOUT ROWID''',
+        'CREATE INDEX IF NOT EXISTS idx_alert_cooldowns_time ON alert_cooldowns (alerted_at)'
+    ]
+}
+# Upgrades to this version also seed the cooldown table from recent alerts (seed_alert_cooldowns)
+COOLDOWN_SEED_VERSION = 4
+
+# Column order of rows passed to bulk_insert_alerts (details as JSON text)
+ALERT_IMPORT_COLUMNS = ['user_id', 'timestamp', 'symbol', 'alert_type', 'message', 'details', 'email_sent',
+                        'alert_price', 'return_1h', 'return_1d', 'return_1w', 'is_successful']
+
+# Database files whose schema is already current in this process
+_schema_ready = set()
+_schema_lock = threading.Lock()
 
 class Database:
+    """SQLite storage backend; its public methods are the storage interface other backends implement"""
+    IntegrityError = sqlite3.IntegrityError
+    OperationalError = sqlite3.OperationalError
+    
     def __init__(self, db_path='smart_money_tracker.db'):
         self.db_path = db_path
-        self.init_database()
+        with _schema_lock:
+            if db_path not in _schema_ready:
+                self.init_database()
+                _schema_ready.add(db_path)
+    
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+    
+    def _begin_write(self, cursor):
+        # Take the write lock up front so check-then-write sequences can't interleave
+        cursor.execute('BEGIN IMMEDIATE')
+    
+    def _read_frame(self, query, params=()):
+        import pandas as pd
+        conn = self._connect()
+        df = pd.read_sql_query(query, conn, params=params)
+        conn.close()
+        return df
     
     def init_database(self):
-        """Initialize all database tables"""
+        """Initialize all database tables and apply pending migrations"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        cursor.execute('PRAGMA user_version')
+        version = cursor.fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            conn.close()
+            return
+        
+        # Let archival hand freed pages back to the OS (takes effect on new databases)
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -59,16 +152,101 @@ class Database:
             )
         ''')
         
+        # Options flow rollups, one row per (bucket size, bucket, symbol)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS flow_rollups (
+                bucket_minutes INTEGER NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                symbol TEXT NOT NULL,
+                premium REAL DEFAULT 0,
+                volume INTEGER DEFAULT 0,
+                call_premium REAL DEFAULT 0,
+                put_premium REAL DEFAULT 0,
+                call_volume INTEGER DEFAULT 0,
+                put_volume INTEGER DEFAULT 0,
+                contracts INTEGER DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (bucket_minutes, bucket_start, symbol)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_flow_rollups_bucket ON flow_rollups (bucket_start)')
+        
+        # Latest scan outputs shared between the scanner, dashboard and API
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_cache (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        
+        # Per-user alert counts of each monthly archive partition, for paging across partitions
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_archive_partitions (
+                partition TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                alerts INTEGER NOT NULL,
+                PRIMARY KEY (partition, user_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Per-user performance totals of archived alerts, so stats never read the archive
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_archive_stats (
+                user_id INTEGER PRIMARY KEY,
+                total_alerts INTEGER NOT NULL DEFAULT 0,
+                successful_alerts INTEGER NOT NULL DEFAULT 0,
+                sum_return_1h REAL NOT NULL DEFAULT 0,
+                count_return_1h INTEGER NOT NULL DEFAULT 0,
+                sum_return_1d REAL NOT NULL DEFAULT 0,
+                count_return_1d INTEGER NOT NULL DEFAULT 0,
+                sum_return_1w REAL NOT NULL DEFAULT 0,
+                count_return_1w INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        for migration in range(max(version, 1) + 1, SCHEMA_VERSION + 1):
+            for statement in MIGRATIONS.get(migration, []):
+                cursor.execute(statement)
+        if version < COOLDOWN_SEED_VERSION:
+            self.seed_alert_cooldowns(cursor)
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        
         conn.commit()
         conn.close()
     
+    def seed_alert_cooldowns(self, cursor, days=1):
+        """Start cooldowns from the last day of alerts, so they survive the upgrade that adds the table"""
+        # Plain SQL and JSON parsing in Python, so every backend seeds the same way
+        cutoff = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+        cursor.execute('SELECT user_id, details, alert_type, timestamp FROM alerts WHERE timestamp >= ?', (cutoff,))
+
+        latest = {}
+        for user_id, details, alert_type, timestamp in cursor.fetchall():
+            try:
+                contract_symbol = json.loads(details or '{}').get('contract_symbol')
+                alerted_at = datetime.strptime(str(timestamp), '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+            if not contract_symbol:
+                continue
+            key = (user_id, contract_symbol, alert_type)
+            latest[key] = max(alerted_at, latest.get(key, 0.0))
+
+        cursor.executemany('''
+            INSERT INTO alert_cooldowns (user_id, contract_symbol, alert_type, alerted_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, contract_symbol, alert_type) DO NOTHING
+        ''', [key + (alerted_at,) for key, alerted_at in latest.items()])
+        return len(latest)
+    
     def hash_password(self, password):
         """Hash password using SHA-256"""
         return hashlib.sha256(password.encode()).hexdigest()
     
+    @timed('db_write')
     def create_user(self, username, password, email):
         """Create a new user"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
@@ -79,14 +257,15 @@ class Database:
             ''', (username, password_hash, email))
             conn.commit()
             return True, "User created successfully"
-        except sqlite3.IntegrityError:
+        except self.IntegrityError:
             return False, "Username already exists"
         finally:
             conn.close()
     
+    @timed('db_read')
     def verify_user(self, username, password):
         """Verify user credentials"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         password_hash = self.hash_password(password)
@@ -102,9 +281,10 @@ class Database:
             return True, result[0], result[1]  # Success, user_id, email
         return False, None, None
     
+    @timed('db_write')
     def save_alert(self, user_id, symbol, alert_type, message, details, alert_price, email_sent=False):
         """Save a new alert"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -118,25 +298,132 @@ class Database:
         
         return alert_id
     
-    def get_user_alerts(self, user_id, limit=50):
-        """Get alerts for a specific user"""
-        conn = sqlite3.connect(self.db_path)
+    @timed('db_write')
+    def save_alerts(self, alerts):
+        """Save several alerts in one transaction, returns their ids"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        alert_ids = []
+        for user_id, symbol, alert_type, message, details, alert_price, email_sent in alerts:
+            cursor.execute('''
+                INSERT INTO alerts (user_id, symbol, alert_type, message, details, alert_price, email_sent)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, symbol, alert_type, message, json.dumps(details), alert_price, email_sent))
+            alert_ids.append(cursor.lastrowid)
         
-        query = '''
+        conn.commit()
+        conn.close()
+        
+        return alert_ids
+    
+    @timed('db_write')
+    def bulk_insert_alerts(self, rows):
+        """Load historical alerts (tuples in ALERT_IMPORT_COLUMNS order) without returning ids"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.executemany(f'''
+            INSERT INTO alerts ({', '.join(ALERT_IMPORT_COLUMNS)})
+            VALUES ({', '.join('?' * len(ALERT_IMPORT_COLUMNS))})
+        ''', rows)
+        
+        conn.commit()
+        conn.close()
+    
+    @timed('db_write')
+    def reset_alerts(self):
+        """Delete every live alert and alert cooldown, e.g. between load-test runs on a reused database"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM alerts')
+        cursor.execute('DELETE FROM alert_cooldowns')
+        
+        conn.commit()
+        conn.close()
+    
+    @timed('db_read')
+    def get_user_alerts(self, user_id, limit=50, offset=0):
+        """Get alerts for a specific user"""
+        return self._read_frame('''
             SELECT * FROM alerts 
             WHERE user_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        '''
+            ORDER BY timestamp DESC, id DESC 
+            LIMIT ? OFFSET ?
+        ''', (user_id, limit, offset))
+    
+    @timed('db_read')
+    def get_alerts_since(self, after_id, user_id=None, limit=500, also_ids=()):
+        """Get alerts with an id above after_id, or in also_ids, in id order, for all users or one"""
+        conn = self._connect()
+        cursor = conn.cursor()
         
-        df = pd.read_sql_query(query, conn, params=(user_id, limit))
+        # also_ids re-checks ids below the cursor whose inserts hadn't committed when it passed them
+        also_ids = list(also_ids)
+        id_filter = f"(id > ? OR id IN ({', '.join('?' * len(also_ids))}))" if also_ids else 'id > ?'
+        if user_id is None:
+            cursor.execute(f'''
+                SELECT id, user_id, timestamp, symbol, alert_type, message, details, alert_price
+                FROM alerts WHERE {id_filter} ORDER BY id LIMIT ?
+            ''', (after_id, *also_ids, limit))
+        else:
+            cursor.execute(f'''
+                SELECT id, user_id, timestamp, symbol, alert_type, message, details, alert_price
+                FROM alerts WHERE {id_filter} AND user_id = ? ORDER BY id LIMIT ?
+            ''', (after_id, *also_ids, user_id, limit))
+        
+        columns = [column[0] for column in cursor.description]
+        alerts = [dict(zip(columns, row)) for row in cursor.fetchall()]
         conn.close()
         
-        return df
+        for alert in alerts:
+            alert['details'] = json.loads(alert['details']) if alert['details'] else {}
+        return alerts
+    
+    @timed('db_read')
+    def get_max_alert_id(self):
+        """Get the newest alert id, 0 when there are none"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT MAX(id) FROM alerts')
+        max_id = cursor.fetchone()[0]
+        
+        conn.close()
+        return max_id or 0
+    
+    @timed('db_read')
+    def count_user_alerts(self, user_id):
+        """Count alerts for a specific user"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) FROM alerts WHERE user_id = ?', (user_id,))
+        count = cursor.fetchone()[0]
+        
+        conn.close()
+        return count
     
+    @timed('db_read')
+    def get_user_alerts_version(self, user_id):
+        """(count, newest id, filled-in prices) of a user's alerts, which changes whenever their history does"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(MAX(id), 0), COUNT(price_1h) + COUNT(price_1d) + COUNT(price_1w)
+            FROM alerts WHERE user_id = ?
+        ''', (user_id,))
+        version = tuple(cursor.fetchone())
+        
+        conn.close()
+        return version
+    
+    @timed('db_write')
     def update_alert_performance(self, alert_id, price_field, price_value, return_field, return_value):
         """Update alert performance data"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute(f'''
@@ -149,72 +436,478 @@ class Database:
         cursor.execute('''
             UPDATE alerts 
             SET is_successful = CASE 
-                WHEN return_1h > 0.02 OR return_1d > 0.02 OR return_1w > 0.02 
+                WHEN return_1h > ? OR return_1d > ? OR return_1w > ? 
                 THEN 1 ELSE 0 END
             WHERE id = ?
-        ''', (alert_id,))
+        ''', (SUCCESS_RETURN_THRESHOLD,) * 3 + (alert_id,))
         
         conn.commit()
         conn.close()
     
-    def get_performance_stats(self, user_id):
-        """Get performance statistics for a user"""
-        conn = sqlite3.connect(self.db_path)
+    @timed('db_read')
+    def get_performance_totals(self, user_id, archived=False):
+        """Get alert counts and return sums/counts for a user, from the live or archived alerts"""
+        conn = self._connect()
         cursor = conn.cursor()
         
-        # Total alerts
-        cursor.execute('SELECT COUNT(*) FROM alerts WHERE user_id = ?', (user_id,))
-        total_alerts = cursor.fetchone()[0]
-        
-        # Successful alerts
-        cursor.execute('SELECT COUNT(*) FROM alerts WHERE user_id = ? AND is_successful = 1', (user_id,))
-        successful_alerts = cursor.fetchone()[0]
-        
-        # Average returns
-        cursor.execute('''
-            SELECT 
-                AVG(return_1h) as avg_1h,
-                AVG(return_1d) as avg_1d,
-                AVG(return_1w) as avg_1w
-            FROM alerts 
-            WHERE user_id = ? AND return_1w IS NOT NULL
-        ''', (user_id,))
+        if archived:
+            cursor.execute('''
+                SELECT total_alerts, successful_alerts, sum_return_1h, count_return_1h,
+                       sum_return_1d, count_return_1d, sum_return_1w, count_return_1w
+                FROM alert_archive_stats WHERE user_id = ?
+            ''', (user_id,))
+        else:
+            # Returns only count once the 1w return is known, like the original averages
+            cursor.execute('''
+                SELECT 
+                    COUNT(*),
+                    COUNT(CASE WHEN is_successful = 1 THEN 1 END),
+                    SUM(CASE WHEN return_1w IS NOT NULL THEN return_1h END),
+                    COUNT(CASE WHEN return_1w IS NOT NULL THEN return_1h END),
+                    SUM(CASE WHEN return_1w IS NOT NULL THEN return_1d END),
+                    COUNT(CASE WHEN return_1w IS NOT NULL THEN return_1d END),
+                    SUM(return_1w),
+                    COUNT(return_1w)
+                FROM alerts 
+                WHERE user_id = ?
+            ''', (user_id,))
         
-        avg_returns = cursor.fetchone()
+        row = cursor.fetchone() or (0,) * 8
         conn.close()
         
+        names = ['total_alerts', 'successful_alerts', 'sum_return_1h', 'count_return_1h',
+                 'sum_return_1d', 'count_return_1d', 'sum_return_1w', 'count_return_1w']
+        return {name: value or 0 for name, value in zip(names, row)}
+    
+    def get_performance_stats(self, user_id, totals=None):
+        """Get performance statistics for a user"""
+        totals = totals or self.get_performance_totals(user_id)
+        total_alerts = totals['total_alerts']
+        successful_alerts = totals['successful_alerts']
+        
         success_rate = (successful_alerts / total_alerts * 100) if total_alerts > 0 else 0
         
+        def average(horizon):
+            count = totals[f'count_return_{horizon}']
+            return totals[f'sum_return_{horizon}'] / count if count else 0
+        
         return {
             'total_alerts': total_alerts,
             'successful_alerts': successful_alerts,
             'success_rate': success_rate,
-            'avg_return_1h': avg_returns[0] if avg_returns[0] else 0,
-            'avg_return_1d': avg_returns[1] if avg_returns[1] else 0,
-            'avg_return_1w': avg_returns[2] if avg_returns[2] else 0
+            'avg_return_1h': average('1h'),
+            'avg_return_1d': average('1d'),
+            'avg_return_1w': average('1w')
         }
     
+    @timed('db_write')
     def add_to_watchlist(self, user_id, symbol):
         """Add stock to user's watchlist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         try:
             cursor.execute('INSERT INTO watchlist (user_id, symbol) VALUES (?, ?)', (user_id, symbol))
             conn.commit()
             return True
-        except sqlite3.IntegrityError:
+        except self.IntegrityError:
             return False
         finally:
             conn.close()
     
+    @timed('db_read')
     def get_watchlist(self, user_id):
         """Get user's watchlist"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._connect()
         cursor = conn.cursor()
         
         cursor.execute('SELECT symbol FROM watchlist WHERE user_id = ?', (user_id,))
         symbols = [row[0] for row in cursor.fetchall()]
         
         conn.close()
-        return symbols
\ No newline at end of file
+        return symbols
+    
+    @timed('db_write')
+    def upsert_flow_rollups(self, bucket_minutes, rows):
+        """Insert or replace flow rollup cells for one bucket size"""
+        if not rows:
+            return
+        
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        # Option volumes are cumulative for the session, so the latest scan
+        # in a bucket replaces the cell instead of adding to it
+        cursor.executemany('''
+            INSERT INTO flow_rollups (bucket_minutes, bucket_start, symbol, premium, volume,
+                                      call_premium, put_premium, call_volume, put_volume, contracts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bucket_minutes, bucket_start, symbol) DO UPDATE SET
+                premium = excluded.premium,
+                volume = excluded.volume,
+                call_premium = excluded.call_premium,
+                put_premium = excluded.put_premium,
+                call_volume = excluded.call_volume,
+                put_volume = excluded.put_volume,
+                contracts = excluded.contracts,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(bucket_minutes,) + tuple(row) for row in rows])
+        
+        conn.commit()
+        conn.close()
+    
+    @timed('db_read')
+    def get_flow_rollups(self, bucket_minutes, since):
+        """Get flow rollup cells for one bucket size starting at a unix timestamp"""
+        return self._read_frame('''
+            SELECT bucket_start, symbol, premium, volume, call_premium, put_premium,
+                   call_volume, put_volume, contracts
+            FROM flow_rollups
+            WHERE bucket_minutes = ? AND bucket_start >= ?
+        ''', (bucket_minutes, since))
+    
+    @timed('db_write')
+    def prune_flow_rollups(self, before):
+        """Delete flow rollup cells older than a unix timestamp"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM flow_rollups WHERE bucket_start < ?', (before,))
+        deleted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        
+        return deleted
+    
+    @timed('db_read')
+    def get_alerts_before(self, max_age_days, limit):
+        """Get the oldest alerts older than max_age_days, in id order"""
+        # Timestamps are stored as UTC 'YYYY-MM-DD HH:MM:SS' text, which compares in time order
+        cutoff = (datetime.utcnow() - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        return self._read_frame('''
+            SELECT * FROM alerts 
+            WHERE timestamp < ? 
+            ORDER BY id 
+            LIMIT ?
+        ''', (cutoff, limit))
+    
+    @timed('db_read')
+    def get_alert_ids_between(self, first_id, last_id):
+        """Ids of the live alerts from first_id to last_id"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id FROM alerts WHERE id BETWEEN ? AND ?', (first_id, last_id))
+        ids = {row[0] for row in cursor.fetchall()}
+        
+        conn.close()
+        return ids
+    
+    @timed('db_write')
+    def archive_alerts(self, alert_ids, partition_counts, user_stats):
+        """Record archived alerts in the partition and stats tables and delete them, in one transaction"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        # Delete first: if another archiver already moved some of these rows, its
+        # totals are recorded and this batch must not count them again
+        self._begin_write(cursor)
+        deleted = self._delete_alerts(cursor, alert_ids)
+        if deleted != len(alert_ids):
+            conn.rollback()
+            conn.close()
+            return 0
+        
+        cursor.executemany('''
+            INSERT INTO alert_archive_partitions (partition, user_id, alerts) VALUES (?, ?, ?)
+            ON CONFLICT (partition, user_id) DO UPDATE SET alerts = alert_archive_partitions.alerts + excluded.alerts
+        ''', partition_counts)
+        
+        cursor.executemany('''
+            INSERT INTO alert_archive_stats (user_id, total_alerts, successful_alerts,
+                                             sum_return_1h, count_return_1h, sum_return_1d,
+                                             count_return_1d, sum_return_1w, count_return_1w)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_alerts = alert_archive_stats.total_alerts + excluded.total_alerts,
+                successful_alerts = alert_archive_stats.successful_alerts + excluded.successful_alerts,
+                sum_return_1h = alert_archive_stats.sum_return_1h + excluded.sum_return_1h,
+                count_return_1h = alert_archive_stats.count_return_1h + excluded.count_return_1h,
+                sum_return_1d = alert_archive_stats.sum_return_1d + excluded.sum_return_1d,
+                count_return_1d = alert_archive_stats.count_return_1d + excluded.count_return_1d,
+                sum_return_1w = alert_archive_stats.sum_return_1w + excluded.sum_return_1w,
+                count_return_1w = alert_archive_stats.count_return_1w + excluded.count_return_1w
+        ''', user_stats)
+        
+        conn.commit()
+        conn.close()
+        
+        return deleted
+    
+    def _delete_alerts(self, cursor, alert_ids):
+        cursor.executemany('DELETE FROM alerts WHERE id = ?', [(alert_id,) for alert_id in alert_ids])
+        return cursor.rowcount
+    
+    @timed('db_read')
+    def get_archive_partitions(self, user_id):
+        """Get (partition, alert count) of a user's archived alerts, newest partition first"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT partition, alerts FROM alert_archive_partitions 
+            WHERE user_id = ? AND alerts > 0 
+            ORDER BY partition DESC
+        ''', (user_id,))
+        partitions = cursor.fetchall()
+        
+        conn.close()
+        return partitions
+    
+    def reclaim_space(self):
+        """Return free pages to the filesystem, converting the file to incremental vacuum on first use"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != 2:
+            # Databases created before auto_vacuum was set need one full VACUUM to switch modes
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+        else:
+            # executescript runs the pragma to completion; execute() frees a single page
+            conn.executescript('PRAGMA incremental_vacuum;')
+        
+        conn.close()
+    
+    @timed('db_write')
+    def set_cache(self, key, payload):
+        """Publish a JSON-serializable scan output under a key"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        updated_at = time.time()
+        cursor.execute('''
+            INSERT INTO scan_cache (key, payload, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, updated_at = excluded.updated_at
+        ''', (key, json.dumps(payload, default=str), updated_at))
+        
+        conn.commit()
+        conn.close()
+        
+        return updated_at
+    
+    @timed('db_read')
+    def get_cache_version(self, key):
+        """Get when a cache key was last published, without reading its payload"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT updated_at FROM scan_cache WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return row[0] if row else None
+    
+    @timed('db_read')
+    def get_cache(self, key):
+        """Get a published scan output as (JSON text, updated_at)"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT payload, updated_at FROM scan_cache WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        metrics.record_cache('scan_cache', row is not None)
+        return (row[0], row[1]) if row else (None, None)
+    
+    @timed('db_write')
+    def create_scan_cycle(self, cycle_id, batches):
+        """Create a cycle's leasable batches (lists of symbols); a no-op if another node already did"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        self._begin_write(cursor)
+        cursor.execute('''
+            INSERT INTO scan_cycles (cycle_id, batches, created_at) VALUES (?, ?, ?)
+            ON CONFLICT (cycle_id) DO NOTHING
+        ''', (cycle_id, len(batches), time.time()))
+        created = cursor.rowcount == 1
+        if created:
+            cursor.executemany('INSERT INTO scan_leases (cycle_id, batch, symbols) VALUES (?, ?, ?)',
+                               [(cycle_id, i, json.dumps(symbols)) for i, symbols in enumerate(batches)])
+        
+        conn.commit()
+        conn.close()
+        
+        return created
+    
+    @timed('db_write')
+    def claim_scan_batch(self, cycle_id, owner, lease_seconds):
+        """Lease the next pending or expired batch of a cycle, returns (batch, symbols) or None"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        now = time.time()
+        self._begin_write(cursor)
+        while True:
+            cursor.execute('''
+                SELECT batch, symbols FROM scan_leases
+                WHERE cycle_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY batch LIMIT 1
+            ''', (cycle_id, now))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            # Re-check the claimable condition so a batch taken since the SELECT is skipped
+            cursor.execute('''
+                UPDATE scan_leases SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE cycle_id = ? AND batch = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+            ''', (owner, now + lease_seconds, cycle_id, row[0], now))
+            if cursor.rowcount == 1:
+                break
+        
+        conn.commit()
+        conn.close()
+        
+        return (row[0], json.loads(row[1])) if row else None
+    
+    @timed('db_write')
+    def renew_scan_lease(self, cycle_id, batch, owner, lease_seconds):
+        """Extend a held lease, returns False if it expired and another node took the batch"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE scan_leases SET lease_expires = ?
+            WHERE cycle_id = ? AND batch = ? AND owner = ? AND status = 'leased'
+        ''', (time.time() + lease_seconds, cycle_id, batch, owner))
+        renewed = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return renewed
+    
+    @timed('db_write')
+    def complete_scan_batch(self, cycle_id, batch, owner, results):
+        """Store a batch's results if the lease is still held, returns whether they were accepted"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE scan_leases SET status = 'done', completed_at = ?, results = ?
+            WHERE cycle_id = ? AND batch = ? AND owner = ? AND status = 'leased'
+        ''', (time.time(), json.dumps(results, default=str), cycle_id, batch, owner))
+        accepted = cursor.rowcount == 1
+        
+        conn.commit()
+        conn.close()
+        
+        return accepted
+    
+    @timed('db_read')
+    def get_scan_cycle_status(self, cycle_id):
+        """Count a cycle's batches by status"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT status, COUNT(*) FROM scan_leases WHERE cycle_id = ? GROUP BY status', (cycle_id,))
+        status = dict(cursor.fetchall())
+        
+        conn.close()
+        return status
+    
+    @timed('db_write')
+    def claim_scan_cycle_publication(self, cycle_id, owner):
+        """Let exactly one node publish a finished cycle, returns its batch results or None"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        self._begin_write(cursor)
+        cursor.execute("SELECT COUNT(*) FROM scan_leases WHERE cycle_id = ? AND status != 'done'", (cycle_id,))
+        unfinished = cursor.fetchone()[0]
+        results = None
+        if not unfinished:
+            cursor.execute('''
+                UPDATE scan_cycles SET published_at = ?, published_by = ?
+                WHERE cycle_id = ? AND published_at IS NULL
+            ''', (time.time(), owner, cycle_id))
+            if cursor.rowcount == 1:
+                cursor.execute('SELECT results FROM scan_leases WHERE cycle_id = ? ORDER BY batch', (cycle_id,))
+                results = [json.loads(row[0]) for row in cursor.fetchall()]
+        
+        conn.commit()
+        conn.close()
+        
+        return results
+    
+    def prune_scan_cycles(self, before_cycle_id):
+        """Delete leases and results of cycles older than the given one"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM scan_leases WHERE cycle_id < ?', (before_cycle_id,))
+        cursor.execute('DELETE FROM scan_cycles WHERE cycle_id < ?', (before_cycle_id,))
+        
+        conn.commit()
+        conn.close()
+    
+    @timed('db_write')
+    def claim_alert_cooldowns(self, keys, now, cooldown_seconds):
+        """Start cooldowns for (user_id, contract_symbol, alert_type) keys not already cooling down.
+        Returns (claimed, alerted_at): the set of keys this call claimed, and {key: alerted_at} for every key."""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        claimed = set()
+        alerted = {}
+        self._begin_write(cursor)
+        for key in keys:
+            # Only one process can move a key out of its cooldown, so each contract alerts once
+            cursor.execute('''
+                INSERT INTO alert_cooldowns (user_id, contract_symbol, alert_type, alerted_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id, contract_symbol, alert_type) DO UPDATE SET alerted_at = excluded.alerted_at
+                WHERE alert_cooldowns.alerted_at <= ?
+            ''', tuple(key) + (now, now - cooldown_seconds))
+            if cursor.rowcount == 1:
+                claimed.add(key)
+                alerted[key] = now
+            else:
+                cursor.execute('''
+                    SELECT alerted_at FROM alert_cooldowns
+                    WHERE user_id = ? AND contract_symbol = ? AND alert_type = ?
+                ''', tuple(key))
+                alerted[key] = cursor.fetchone()[0]
+        
+        conn.commit()
+        conn.close()
+        
+        return claimed, alerted
+    
+    @timed('db_read')
+    def get_alert_cooldowns(self, since):
+        """Get (user_id, contract_symbol, alert_type, alerted_at) of alerts since a unix time, oldest first"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT user_id, contract_symbol, alert_type, alerted_at FROM alert_cooldowns
+            WHERE alerted_at >= ? ORDER BY alerted_at
+        ''', (since,))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        return rows
+    
+    def prune_alert_cooldowns(self, before):
+        """Delete cooldowns that ended before a unix time"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM alert_cooldowns WHERE alerted_at < ?', (before,))
+        
+        conn.commit()
+        conn.close()
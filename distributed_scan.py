@@ -0,0 +1,161 @@
+import os
+import socket
+import threading
+import time
+import pandas as pd
+from dotenv import load_dotenv
+from flow_aggregation import FLOW_COLUMNS
+from market_snapshot import MarketSnapshot
+from metrics import metrics
+from scan_results import concat_results, from_columns, make_scan_result, to_records
+from sharded_scan import scan_batch
+
+load_dotenv()
+
+# Multi-node scan configuration - override in .env file
+SCAN_BATCH_SIZE = int(os.getenv("SCAN_BATCH_SIZE", "25"))          # Symbols per leased batch
+SCAN_CYCLE_SECONDS = float(os.getenv("SCAN_CYCLE_SECONDS", "60"))   # Nodes agree on cycles by wall-clock slot
+# Lease length, renewed every third of it; a small fraction of the cycle so a dead worker's batch
+# is reclaimed while the cycle is still running
+SCAN_LEASE_SECONDS = float(os.getenv("SCAN_LEASE_SECONDS", str(SCAN_CYCLE_SECONDS / 4)))
+SCAN_CYCLES_KEPT = 10
+LEASE_POLL_SECONDS = 1.0
+
+GAMMA_COLUMNS = ['spot', 'call_gamma', 'put_gamma', 'total_gamma', 'delta_notional', 'vega']
+
+def batch_payload(shard):
+    """JSON-serializable form of a scan_batch() result, stored with the completed lease"""
+    return {
+        'activities': to_records(from_columns(shard['columns'])),
+        'coverage': shard['coverage'],
+        'sentiment': shard['sentiment'],
+        'flow': shard['flow'].reset_index().to_dict(orient='records'),
+        'gamma': shard['gamma_totals'].reset_index().to_dict(orient='records'),
+        'strike_gamma': {symbol: [[float(k), float(v)] for k, v in series.items()]
+                         for symbol, series in shard['strike_gamma'].items()}
+    }
+
+def merge_payloads(payloads, flow_aggregator, gamma_exposure, snapshot):
+    """Combine completed batches into the cycle snapshot's scan table, coverage and sentiment, merging aggregates as it goes"""
+    frames = []
+    coverage = snapshot.coverage
+    for payload in payloads:
+        frames.append(make_scan_result(pd.DataFrame(payload['activities'])))
+        coverage['fresh'].extend(payload['coverage']['fresh'])
+        coverage['stale'].update(payload['coverage']['stale'])
+        coverage['skipped'].update(payload['coverage']['skipped'])
+        if payload.get('sentiment') is not None:
+            snapshot.sentiment = payload['sentiment']
+
+        flow = pd.DataFrame(payload['flow'], columns=['symbol'] + FLOW_COLUMNS).set_index('symbol')
+        flow_aggregator.merge(flow.astype('float64'))
+        totals = pd.DataFrame(payload['gamma'], columns=['symbol'] + GAMMA_COLUMNS).set_index('symbol')
+        strike_gamma = {
+            symbol: pd.Series([v for _, v in points], index=pd.Index([k for k, _ in points], name='strike'),
+                              name='gamma_exposure', dtype='float64')
+            for symbol, points in payload['strike_gamma'].items()
+        }
+        gamma_exposure.merge(totals.astype('float64'), strike_gamma)
+
+    activities = concat_results(frames)
+    snapshot.activities = activities.sort_values('premium', ascending=False, kind='stable', ignore_index=True)
+    return snapshot
+
+class LeaseHeartbeat:
+    """Renews a batch lease in the background while the batch is scanned"""
+    def __init__(self, db, cycle_id, batch, owner, lease_seconds):
+        self.db = db
+        self.cycle_id = cycle_id
+        self.batch = batch
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.db.renew_scan_lease(self.cycle_id, self.batch, self.owner, self.lease_seconds)
+            except Exception as e:
+                # Keep trying; the lease only lapses if renewals fail for its whole length
+                print(f"Error renewing lease on batch {self.batch}: {str(e)}")
+                continue
+            if not renewed:
+                self.lost.set()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+class DistributedScanWorker:
+    """Scans leased batches of shared scan cycles alongside workers on other nodes"""
+    def __init__(self, service, universe, batch_size=SCAN_BATCH_SIZE, lease_seconds=SCAN_LEASE_SECONDS,
+                 cycle_seconds=SCAN_CYCLE_SECONDS, node_id=None):
+        self.service = service
+        self.db = service.db
+        self.universe = list(universe)
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.cycle_seconds = cycle_seconds
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    def batches(self):
+        return [self.universe[i:i + self.batch_size] for i in range(0, len(self.universe), self.batch_size)]
+
+    def cycle_id(self, now=None):
+        """Current cycle, the same on every node with a synchronized clock"""
+        return int((now or time.time()) // self.cycle_seconds)
+
+    def scan_leased_batch(self, cycle_id, batch, symbols):
+        """Scan a claimed batch and hand in its results, returns False if the lease was lost"""
+        with LeaseHeartbeat(self.db, cycle_id, batch, self.node_id, self.lease_seconds) as heartbeat:
+            shard = scan_batch(self.service.data_fetcher, symbols)
+
+        # Another node reclaimed the batch; its results count, ours are dropped
+        if heartbeat.lost.is_set() or not self.db.complete_scan_batch(cycle_id, batch, self.node_id, batch_payload(shard)):
+            print(f"Lost lease on batch {batch} of cycle {cycle_id}, discarding its results")
+            metrics.inc('scan_leases_lost_total')
+            return False
+        metrics.inc('scan_batches_total')
+        return True
+
+    def run_cycle(self, cycle_id=None):
+        """Work a cycle until every batch is done; returns the summary if this node published it"""
+        cycle_id = self.cycle_id() if cycle_id is None else cycle_id
+        self.db.create_scan_cycle(cycle_id, self.batches())
+
+        while True:
+            claim = self.db.claim_scan_batch(cycle_id, self.node_id, self.lease_seconds)
+            if claim is not None:
+                self.scan_leased_batch(cycle_id, *claim)
+                continue
+            # Nothing to claim: wait on batches leased elsewhere, reclaiming them if their worker dies.
+            # This runs past the cycle's slot if it has to, so a dead worker never leaves it unpublished
+            if not self.db.get_scan_cycle_status(cycle_id).get('leased'):
+                break
+            time.sleep(LEASE_POLL_SECONDS)
+
+        payloads = self.db.claim_scan_cycle_publication(cycle_id, self.node_id)
+        if payloads is None:
+            return None
+        snapshot = merge_payloads(payloads, self.service.flow_aggregator, self.service.gamma_exposure,
+                                  MarketSnapshot(cycle_id * self.cycle_seconds, cycle_id))
+        return self.service.publish(snapshot, len(self.universe), aggregated=True)
+
+    def run_forever(self):
+        """Join every cycle as it starts until interrupted"""
+        while True:
+            cycle_id = self.cycle_id()
+            summary = self.run_cycle(cycle_id)
+            if summary:
+                self.service.alert_archive.maybe_archive()
+                print(f"Cycle {cycle_id}: published {summary['unusual_count']} unusual activities")
+            self.db.prune_scan_cycles(cycle_id - SCAN_CYCLES_KEPT)
+            metrics.write_textfile()
+            time.sleep(max(0, (cycle_id + 1) * self.cycle_seconds - time.time()))
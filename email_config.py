@@ -4,14 +4,16 @@ from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from metrics import metrics, timed
 
 load_dotenv()
 
 class EmailManager:
-    def __init__(self):
+    def __init__(self, smtp_server=None, smtp_port=None, use_tls=None):
         # Email configuration - You'll need to set these in .env file
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+        self.smtp_server = smtp_server or os.getenv("SMTP_SERVER", "smtp.gmail.com")
+        self.smtp_port = smtp_port or int(os.getenv("SMTP_PORT", "587"))
+        self.use_tls = use_tls if use_tls is not None else os.getenv("SMTP_USE_TLS", "1") != "0"
         self.sender_email = os.getenv("SENDER_EMAIL", "")
         self.sender_password = os.getenv("SENDER_PASSWORD", "")
         
@@ -33,13 +35,16 @@ class EmailManager:
             
             # Send email
             if self.sender_email and self.sender_password:
-                with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                    server.starttls()
-                    server.login(self.sender_email, self.sender_password)
-                    server.send_message(msg)
+                with timed('email_send'):
+                    with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+                        if self.use_tls:
+                            server.starttls()
+                        server.login(self.sender_email, self.sender_password)
+                        server.send_message(msg)
                 return True
             else:
                 print("Email credentials not configured")
+                metrics.inc('emails_skipped_total')
                 return False
                 
         except Exception as e:
@@ -0,0 +1,104 @@
+import os
+import numpy as np
+import pandas as pd
+
+SECTOR_MAP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sector_map.csv')
+UNKNOWN_SECTOR = 'Other'
+
+FLOW_COLUMNS = ['call_premium', 'put_premium', 'call_volume', 'put_volume', 'contracts']
+
+def load_sector_map(path=SECTOR_MAP_PATH):
+    """Load the static symbol -> sector table"""
+    try:
+        table = pd.read_csv(path)
+        return dict(zip(table['symbol'].str.upper(), table['sector']))
+    except FileNotFoundError:
+        print(f"Sector map not found at {path}, grouping all symbols as {UNKNOWN_SECTOR}")
+        return {}
+
+class FlowAggregator:
+    def __init__(self, sector_map=None):
+        self.sector_map = sector_map if sector_map is not None else load_sector_map()
+        # Latest per-symbol flow totals; rescanned symbols replace their row
+        self.symbol_flow = pd.DataFrame(columns=FLOW_COLUMNS, dtype='float64').rename_axis('symbol')
+
+    def update(self, chains):
+        """Fold one scan cycle's full chains ({symbol: OptionChain}) into the aggregates"""
+        if not chains:
+            return self.symbol_flow
+
+        frames = []
+        for symbol, chain in chains.items():
+            for side, df in (('call', chain.calls), ('put', chain.puts)):
+                if df is None or df.empty:
+                    continue
+                frames.append(pd.DataFrame({
+                    'symbol': symbol,
+                    'side': side,
+                    'volume': df['volume'].to_numpy(dtype='float64'),
+                    'last_price': df['lastPrice'].to_numpy(dtype='float64')
+                }))
+        if not frames:
+            return self.symbol_flow
+
+        combined = pd.concat(frames, ignore_index=True)
+        combined['symbol'] = combined['symbol'].astype('category')
+        combined['side'] = combined['side'].astype('category')
+        combined['volume'] = combined['volume'].fillna(0)
+        combined['premium'] = combined['volume'] * combined['last_price'].fillna(0) * 100
+
+        grouped = combined.groupby(['symbol', 'side'], observed=True).agg(
+            premium=('premium', 'sum'),
+            volume=('volume', 'sum'),
+            contracts=('volume', 'size')
+        ).unstack('side', fill_value=0)
+
+        cycle_flow = pd.DataFrame({
+            'call_premium': grouped[('premium', 'call')] if ('premium', 'call') in grouped else 0.0,
+            'put_premium': grouped[('premium', 'put')] if ('premium', 'put') in grouped else 0.0,
+            'call_volume': grouped[('volume', 'call')] if ('volume', 'call') in grouped else 0.0,
+            'put_volume': grouped[('volume', 'put')] if ('volume', 'put') in grouped else 0.0,
+            'contracts': grouped['contracts'].sum(axis=1)
+        }, index=grouped.index.astype(str)).astype('float64')
+        return self.merge(cycle_flow)
+
+    def merge(self, cycle_flow):
+        """Replace the rows of symbols in cycle_flow, e.g. per-symbol totals computed by a scan worker"""
+        if cycle_flow.empty:
+            return self.symbol_flow
+        # Option volumes are cumulative for the session, so a rescan replaces the symbol
+        untouched = self.symbol_flow.drop(index=cycle_flow.index, errors='ignore')
+        self.symbol_flow = pd.concat([untouched, cycle_flow]).rename_axis('symbol')
+        return self.symbol_flow
+
+    def _derive(self, flow):
+        total_premium = flow['call_premium'] + flow['put_premium']
+        total_volume = flow['call_volume'] + flow['put_volume']
+        all_premium = total_premium.sum()
+
+        derived = flow.copy()
+        derived['total_premium'] = total_premium
+        derived['net_premium'] = flow['call_premium'] - flow['put_premium']
+        # -1 (all puts) to +1 (all calls), weighted by contracts traded
+        derived['sentiment'] = np.where(total_volume > 0, (flow['call_volume'] - flow['put_volume']) / total_volume.where(total_volume > 0, 1), 0.0)
+        derived['flow_share'] = total_premium / all_premium if all_premium > 0 else 0.0
+        return derived.sort_values('total_premium', ascending=False)
+
+    def by_symbol(self):
+        """Net premium, sentiment and share of total flow per symbol"""
+        flow = self.symbol_flow.copy()
+        flow.insert(0, 'sector', [self.sector_map.get(s, UNKNOWN_SECTOR) for s in flow.index])
+        return self._derive(flow)
+
+    def by_sector(self):
+        """Net premium, sentiment and share of total flow per sector"""
+        sectors = self.symbol_flow.index.map(lambda s: self.sector_map.get(s, UNKNOWN_SECTOR))
+        flow = self.symbol_flow.groupby(sectors).sum().rename_axis('sector')
+        return self._derive(flow)
+
+    def to_dict(self):
+        """JSON-serializable snapshot of both aggregation levels"""
+        return {
+            'by_symbol': self.by_symbol().reset_index().to_dict(orient='records'),
+            'by_sector': self.by_sector().reset_index().to_dict(orient='records')
+        }
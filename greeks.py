@@ -0,0 +1,185 @@
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from market_hours import MARKET_TZ, REGULAR_CLOSE
+
+load_dotenv()
+
+# Greeks configuration - override in .env file
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.045"))
+
+CONTRACT_MULTIPLIER = 100
+SECONDS_PER_YEAR = 365 * 24 * 3600
+EXPIRY_CLOSE_HOUR = REGULAR_CLOSE.hour   # Options stop trading at the New York close on expiry day
+MIN_TIME_TO_EXPIRY = 1 / (365 * 24) # An hour, so contracts on expiry day keep finite greeks
+MIN_VOLATILITY = 0.01
+
+GREEK_COLUMNS = ['delta', 'gamma', 'vega', 'delta_notional', 'gamma_exposure']
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+def norm_cdf(x):
+    """Standard normal CDF, Abramowitz & Stegun 7.1.26 erf (abs error < 1.5e-7)"""
+    z = np.abs(x) / math.sqrt(2)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.copysign(erf, x))
+
+def black_scholes_greeks(spot, strike, years, iv, is_call, rate=RISK_FREE_RATE):
+    """Delta, gamma and vega (per vol point) for arrays of European contracts"""
+    spot = np.asarray(spot, dtype='float64')
+    strike = np.asarray(strike, dtype='float64')
+    years = np.maximum(np.asarray(years, dtype='float64'), MIN_TIME_TO_EXPIRY)
+    iv = np.maximum(np.nan_to_num(np.asarray(iv, dtype='float64')), MIN_VOLATILITY)
+
+    sqrt_t = np.sqrt(years)
+    vol_sqrt_t = iv * sqrt_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(spot / strike) + (rate + 0.5 * iv * iv) * years) / vol_sqrt_t
+    d1 = np.nan_to_num(d1)
+
+    pdf = norm_pdf(d1)
+    call_delta = norm_cdf(d1)
+    delta = np.where(is_call, call_delta, call_delta - 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.nan_to_num(pdf / (spot * vol_sqrt_t))
+    vega = spot * pdf * sqrt_t / 100
+    return delta, gamma, vega
+
+def black_scholes_greeks_scalar(spot, strike, years, iv, is_call, rate=RISK_FREE_RATE):
+    """Reference implementation of black_scholes_greeks for one contract"""
+    years = max(years, MIN_TIME_TO_EXPIRY)
+    iv = max(0.0 if math.isnan(iv) else iv, MIN_VOLATILITY)
+
+    sqrt_t = math.sqrt(years)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * iv * iv) * years) / (iv * sqrt_t)
+    pdf = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    call_delta = 0.5 * (1.0 + math.erf(d1 / math.sqrt(2)))
+
+    delta = call_delta if is_call else call_delta - 1.0
+    gamma = pdf / (spot * iv * sqrt_t)
+    vega = spot * pdf * sqrt_t / 100
+    return delta, gamma, vega
+
+def parse_expiries(contract_symbols):
+    """Expiry dates from OCC contract symbols (e.g. AAPL261218C00150000)"""
+    # The date is the 6 digits before the C/P flag and 8-digit strike; a chain has
+    # only a handful of distinct expiries, so parse each once
+    codes, dates = pd.factorize(pd.Series(contract_symbols, dtype='object').str.slice(-15, -9))
+    parsed = pd.to_datetime(pd.Series(dates, dtype='object'), format='%y%m%d', errors='coerce').to_numpy()
+    return np.where(codes >= 0, parsed[codes], np.datetime64('NaT'))
+
+def years_to_expiry(expiries, now=None):
+    """Time to the 4pm New York close on expiry day in years, floored at MIN_TIME_TO_EXPIRY"""
+    now = pd.Timestamp(now or time.time(), unit='s', tz='UTC')
+    # Localized per date, so the close lands at the right UTC hour on either side of a DST change
+    expiry_dates = pd.DatetimeIndex(np.asarray(expiries, dtype='datetime64[ns]'))
+    close = (expiry_dates + pd.Timedelta(hours=EXPIRY_CLOSE_HOUR)).tz_localize(MARKET_TZ)
+    seconds = (close - now).total_seconds().to_numpy()
+    return np.maximum(np.nan_to_num(seconds, nan=0.0) / SECONDS_PER_YEAR, MIN_TIME_TO_EXPIRY)
+
+def chain_greeks(chain, spot, expiry=None, now=None):
+    """Greeks and exposures for every contract of an OptionChain, in one pass"""
+    sides = [(df, is_call) for df, is_call in ((chain.calls, True), (chain.puts, False)) if df is not None and not df.empty]
+    if not sides or not spot:
+        return pd.DataFrame(columns=['strike', 'option_type'] + GREEK_COLUMNS)
+
+    def column(name, default=0.0):
+        return np.concatenate([
+            df[name].to_numpy(dtype='float64') if name in df else np.full(len(df), default)
+            for df, _ in sides
+        ])
+
+    is_call = np.concatenate([np.full(len(df), flag) for df, flag in sides])
+    strike = column('strike')
+    volume = np.nan_to_num(column('volume'))
+    open_interest = np.nan_to_num(column('openInterest'))
+
+    if expiry is not None:
+        expiries = np.full(len(strike), np.datetime64(pd.Timestamp(expiry), 'ns'))
+    else:
+        expiries = parse_expiries(np.concatenate([df['contractSymbol'].to_numpy() for df, _ in sides]))
+    years = years_to_expiry(expiries, now)
+
+    delta, gamma, vega = black_scholes_greeks(spot, strike, years, column('impliedVolatility'), is_call)
+
+    # Dealer convention: customers buy calls and sell puts, so dealers are long call
+    # gamma and short put gamma. Exposure is dollars of delta per 1% move.
+    gamma_exposure = np.where(is_call, 1.0, -1.0) * gamma * open_interest * CONTRACT_MULTIPLIER * spot * spot * 0.01
+
+    return pd.DataFrame({
+        'strike': strike,
+        'option_type': pd.Categorical(np.where(is_call, 'CALL', 'PUT'), categories=['CALL', 'PUT']),
+        'delta': delta,
+        'gamma': gamma,
+        'vega': vega,
+        'delta_notional': delta * volume * CONTRACT_MULTIPLIER * spot,
+        'gamma_exposure': gamma_exposure
+    })
+
+class GammaExposure:
+    def __init__(self):
+        # Latest per-symbol results; rescanned symbols replace their entry
+        self.strike_gamma = {}
+        self.symbol_totals = pd.DataFrame(
+            columns=['spot', 'call_gamma', 'put_gamma', 'total_gamma', 'delta_notional', 'vega'], dtype='float64'
+        ).rename_axis('symbol')
+
+    def update(self, chains, prices, now=None):
+        """Compute exposures for one scan cycle's chains ({symbol: OptionChain}) at the given spot prices"""
+        totals = {}
+        strike_gamma = {}
+        for symbol, chain in chains.items():
+            spot = prices.get(symbol)
+            if not spot:
+                continue
+
+            greeks = chain_greeks(chain, spot, now=now)
+            if greeks.empty:
+                continue
+
+            strike_gamma[symbol] = greeks.groupby('strike')['gamma_exposure'].sum()
+            is_call = greeks['option_type'] == 'CALL'
+            totals[symbol] = {
+                'spot': float(spot),
+                'call_gamma': float(greeks.loc[is_call, 'gamma_exposure'].sum()),
+                'put_gamma': float(greeks.loc[~is_call, 'gamma_exposure'].sum()),
+                'total_gamma': float(greeks['gamma_exposure'].sum()),
+                'delta_notional': float(greeks['delta_notional'].sum()),
+                'vega': float(greeks['vega'].sum())
+            }
+
+        if not totals:
+            return self.symbol_totals
+        return self.merge(pd.DataFrame.from_dict(totals, orient='index'), strike_gamma)
+
+    def merge(self, cycle_totals, strike_gamma):
+        """Replace the entries of symbols in cycle_totals, e.g. exposures computed by a scan worker"""
+        self.strike_gamma.update(strike_gamma)
+        if not cycle_totals.empty:
+            untouched = self.symbol_totals.drop(index=cycle_totals.index, errors='ignore')
+            self.symbol_totals = pd.concat([untouched, cycle_totals]).rename_axis('symbol')
+        return self.symbol_totals
+
+    def by_strike(self, symbol):
+        """Net dealer gamma exposure per strike for one symbol"""
+        return self.strike_gamma.get(symbol, pd.Series(dtype='float64', name='gamma_exposure'))
+
+    def totals(self):
+        """Call, put and net gamma exposure per symbol, largest absolute net first"""
+        return self.symbol_totals.sort_values('total_gamma', key=abs, ascending=False)
+
+    def to_dict(self):
+        """JSON-serializable snapshot of per-symbol totals and per-strike profiles"""
+        return {
+            'by_symbol': self.totals().reset_index().to_dict(orient='records'),
+            'by_strike': {
+                symbol: [{'strike': float(k), 'gamma_exposure': float(v)} for k, v in series.items()]
+                for symbol, series in self.strike_gamma.items()
+            }
+        }
@@ -0,0 +1,209 @@
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import redirect_stdout
+import numpy as np
+from alerting import AlertManager
+from benchmarks import SyntheticSource
+from data_sources import ReplaySource, record_snapshot
+from email_config import EmailManager
+from storage import open_database
+from utils import StockDataFetcher
+
+DEFAULT_USER_LEVELS = [1, 2, 4, 8, 16]
+STAGES = ['login', 'scan', 'alerts', 'history', 'performance']
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue that accepts and counts every message"""
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+
+            if command.startswith('EHLO'):
+                self.wfile.write(b"250-localhost\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command.startswith('AUTH'):
+                self.reply("235 Authentication successful")
+            elif command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.messages = 0
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self.server_address[1]
+
+class SimulatedUser(threading.Thread):
+    """One dashboard session looping through the app.py workflow"""
+    def __init__(self, index, db, email_manager, source, stop_event, results):
+        super().__init__(daemon=True)
+        self.username = f"load{index}"
+        self.db = db
+        self.alert_manager = AlertManager(db, email_manager)
+        self.fetcher = StockDataFetcher(source=source)
+        self.stop_event = stop_event
+        self.results = results
+
+    def run(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            try:
+                with self.results.stage('login'):
+                    success, user_id, email = self.db.verify_user(self.username, 'loadtest')
+                with self.results.stage('scan'):
+                    activities = self.fetcher.scan_all_watchlist()
+                with self.results.stage('alerts'):
+                    self.alert_manager.process_activities(user_id, email, activities)
+                with self.results.stage('history'):
+                    self.db.get_user_alerts(user_id, limit=100)
+                with self.results.stage('performance'):
+                    self.db.get_performance_stats(user_id)
+                    self.db.get_user_alerts(user_id, limit=50)
+            except self.db.OperationalError as e:
+                self.results.error('lock' if 'locked' in str(e) or 'busy' in str(e) or 'deadlock' in str(e) else 'database')
+                continue
+            except Exception as e:
+                # Counted by exception type, since stdout is silenced during a level
+                self.results.error(type(e).__name__)
+                continue
+            self.results.record('iteration', time.perf_counter() - start)
+
+class LoadResults:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.latencies[name].append(seconds)
+
+    def error(self, kind):
+        with self.lock:
+            self.errors[kind] += 1
+
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+class _StageTimer:
+    def __init__(self, results, name):
+        self.results = results
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.results.record(self.name, time.perf_counter() - self.start)
+
+def percentile_ms(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else float('nan')
+
+def run_level(num_users, db_url, source, email_manager, duration, sink):
+    """Run num_users concurrent sessions for duration seconds"""
+    db = open_database(url=db_url)
+    for i in range(num_users):
+        db.create_user(f"load{i}", 'loadtest', f"load{i}@example.com")
+
+    # Fresh alert history per level so cooldown checks behave like a new deployment
+    db.reset_alerts()
+
+    results = LoadResults()
+    stop_event = threading.Event()
+    emails_before = sink.messages
+    users = [SimulatedUser(i, db, email_manager, source, stop_event, results) for i in range(num_users)]
+
+    # The scanner's per-symbol progress prints would drown the report
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        for user in users:
+            user.start()
+        time.sleep(duration)
+        stop_event.set()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - start
+
+    iterations = results.latencies['iteration']
+    return {
+        'users': num_users,
+        'iterations': len(iterations),
+        'throughput': len(iterations) / elapsed,
+        'p50_ms': percentile_ms(iterations, 50),
+        'p99_ms': percentile_ms(iterations, 99),
+        'stages': {name: (percentile_ms(results.latencies[name], 50), percentile_ms(results.latencies[name], 99))
+                   for name in STAGES},
+        'lock_errors': results.errors['lock'],
+        'other_errors': sum(count for kind, count in results.errors.items() if kind != 'lock'),
+        'error_types': {kind: count for kind, count in results.errors.items() if kind != 'lock'},
+        'emails': sink.messages - emails_before
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the alert pipeline with concurrent simulated users")
+    parser.add_argument('--users', type=int, nargs='+', default=DEFAULT_USER_LEVELS)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--snapshot-dir', help="replay snapshot directory (recorded from synthetic chains if missing)")
+    parser.add_argument('--contracts', type=int, default=1000, help="contracts per symbol for a synthetic snapshot")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated upstream latency per call (s)")
+    parser.add_argument('--db', help="SQLite path or postgresql:// URL (temporary SQLite file by default)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='smt_load_')
+    snapshot_dir = args.snapshot_dir or os.path.join(workdir, 'snapshot')
+    if not os.path.isdir(snapshot_dir):
+        watchlist = StockDataFetcher(source=SyntheticSource()).watchlist
+        record_snapshot(SyntheticSource(args.contracts), watchlist, snapshot_dir)
+    source = ReplaySource(snapshot_dir, latency=args.latency)
+
+    sink = SMTPSink()
+    port = sink.start()
+    email_manager = EmailManager(smtp_server='127.0.0.1', smtp_port=port, use_tls=False)
+    email_manager.sender_email = 'loadtest@example.com'
+    email_manager.sender_password = 'loadtest'
+
+    db_url = args.db or os.path.join(workdir, 'load.db')
+
+    print(f"{'users':>5} {'iters':>6} {'iter/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'locks':>6} {'errors':>6} {'emails':>6}  stage p50/p99 ms")
+    for num_users in args.users:
+        level = run_level(num_users, db_url, source, email_manager, args.duration, sink)
+        stages = '  '.join(f"{name} {p50:.0f}/{p99:.0f}" for name, (p50, p99) in level['stages'].items())
+        print(f"{level['users']:>5} {level['iterations']:>6} {level['throughput']:>8.2f} {level['p50_ms']:>9.1f} "
+              f"{level['p99_ms']:>9.1f} {level['lock_errors']:>6} {level['other_errors']:>6} {level['emails']:>6}  {stages}")
+        if level['error_types']:
+            print(f"{'':>5} errors: {', '.join(f'{kind} x{count}' for kind, count in sorted(level['error_types'].items()))}")
+
+    sink.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
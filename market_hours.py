@@ -0,0 +1,10 @@
+from datetime import time as clock
+from zoneinfo import ZoneInfo
+
+# Exchange time zone and session boundaries, shared by the scan scheduler and the greeks engine
+MARKET_TZ = ZoneInfo("America/New_York")
+
+PRE_MARKET_OPEN = clock(4, 0)
+REGULAR_OPEN = clock(9, 30)
+REGULAR_CLOSE = clock(16, 0)
+POST_MARKET_CLOSE = clock(20, 0)
@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import Future
+from scan_results import empty_scan_result
+
+class MarketSnapshot:
+    """Quotes, chains and derived results of one scan cycle, shared by everything computed from that cycle"""
+    def __init__(self, timestamp=None, cycle_id=None):
+        self.timestamp = timestamp or time.time()
+        self.cycle_id = int(self.timestamp * 1000) if cycle_id is None else cycle_id
+
+        # Per symbol: get_stock_data() output (quote, info, expiry, chain), when it was fetched
+        # (earlier for data carried over or reused as stale), and its scan result rows
+        self.data = {}
+        self.fetched_at = {}
+        self.results = {}
+        self.coverage = {'fresh': [], 'stale': {}, 'skipped': {}}
+
+        # Cycle-wide outputs, filled in before the snapshot is published
+        self.activities = empty_scan_result()
+        self.sentiment = None
+
+        self._fetches = {}
+        self._lock = threading.Lock()
+
+    def carry_over(self, previous, symbols):
+        """Keep an earlier snapshot's data and results for symbols this cycle doesn't refetch"""
+        for symbol in symbols:
+            if symbol in previous.data and symbol not in self.data:
+                self.data[symbol] = previous.data[symbol]
+                self.fetched_at[symbol] = previous.fetched_at[symbol]
+            if symbol in previous.results and symbol not in self.results:
+                self.results[symbol] = previous.results[symbol]
+        return self
+
+    def fetch(self, symbol, loader):
+        """loader(symbol) at most once per cycle; concurrent callers wait for the same call"""
+        with self._lock:
+            future = self._fetches.get(symbol)
+            owner = future is None
+            if owner:
+                future = self._fetches[symbol] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            data = loader(symbol)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        if data is not None:
+            self.add(symbol, data)
+        future.set_result(data)
+        return data
+
+    def add(self, symbol, data, fetched_at=None):
+        self.data[symbol] = data
+        self.fetched_at[symbol] = fetched_at or time.time()
+
+    def set_result(self, symbol, rows):
+        if rows is None or rows.empty:
+            self.results.pop(symbol, None)
+        else:
+            self.results[symbol] = rows
+
+    @property
+    def chains(self):
+        return {symbol: data['options_chain'] for symbol, data in self.data.items()}
+
+    @property
+    def prices(self):
+        return {symbol: data['current_price'] for symbol, data in self.data.items()}
+
+    def liquidity(self, symbol):
+        """Contracts traded on a symbol's chain, None if the cycle has no data for it"""
+        data = self.data.get(symbol)
+        if data is None:
+            return None
+        chain = data['options_chain']
+        return float(chain.calls['volume'].sum() + chain.puts['volume'].sum())
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Exporter configuration - override in .env file
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE", "")
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class MetricsRegistry:
+    def __init__(self, prefix='smt'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._server = None
+
+    def observe(self, stage, seconds):
+        """Record one stage latency in its histogram"""
+        index = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+
+    def inc(self, name, labels=None, value=1):
+        """Increment a counter"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_error(self, stage):
+        """Count a failed stage that handled its own exception"""
+        self.inc('stage_errors_total', {'stage': stage})
+
+    def record_cache(self, cache, hit):
+        """Count a cache lookup as a hit or miss"""
+        self.inc('cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a block as one run of a stage, counting it as an error if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.record_error(stage)
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = {stage: (list(h[0]), h[1]) for stage, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        name = f'{self.prefix}_stage_duration_seconds'
+        lines.append(f'# HELP {name} Latency of each pipeline stage.')
+        lines.append(f'# TYPE {name} histogram')
+        for stage, (buckets, total) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {cumulative}')
+
+        typed = set()
+        for (counter, labels), value in sorted(counters.items()):
+            full_name = f'{self.prefix}_{counter}'
+            if full_name not in typed:
+                lines.append(f'# TYPE {full_name} counter')
+                typed.add(full_name)
+            label_text = ','.join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f'{full_name}{{{label_text}}} {value}')
+
+        # Derived hit ratio per cache, so dashboards don't need PromQL for it
+        ratios = {}
+        for (counter, labels), value in counters.items():
+            if counter == 'cache_requests_total':
+                labels = dict(labels)
+                hits_total = ratios.setdefault(labels['cache'], [0, 0])
+                hits_total[0] += value if labels['result'] == 'hit' else 0
+                hits_total[1] += value
+        if ratios:
+            ratio_name = f'{self.prefix}_cache_hit_ratio'
+            lines.append(f'# TYPE {ratio_name} gauge')
+            for cache, (hits, total) in sorted(ratios.items()):
+                lines.append(f'{ratio_name}{{cache="{cache}"}} {hits / total:.4f}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path=None):
+        """Atomically write metrics to a file for a node_exporter textfile collector"""
+        path = path or METRICS_TEXTFILE
+        if not path:
+            return False
+
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        return True
+
+    def start_http_server(self, port=None, host='127.0.0.1'):
+        """Serve /metrics on a background thread, once per process"""
+        port = port or METRICS_PORT
+        if not port or self._server is not None:
+            return self._server
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            print(f"Error starting metrics exporter on port {port}: {str(e)}")
+            return None
+
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self._server
+
+# Shared registry for the whole process
+metrics = MetricsRegistry()
+timed = metrics.timed
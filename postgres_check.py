@@ -0,0 +1,123 @@
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# PostgreSQL check configuration - override in .env file
+PG_BIN = os.getenv("PG_BIN", "")    # Directory holding initdb and pg_ctl when they aren't on PATH
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHECK_DATABASE = 'smt_check'
+
+def pg_command(name, pg_bin=PG_BIN):
+    path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError(f"{name} not found; install PostgreSQL or set PG_BIN to its bin directory")
+    return path
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class LocalPostgres:
+    """Throwaway PostgreSQL cluster in a temporary directory, listening on loopback only"""
+    def __init__(self, pg_bin=PG_BIN, port=None):
+        self.pg_bin = pg_bin
+        self.port = port or free_port()
+        self.workdir = None
+
+    @property
+    def data_dir(self):
+        return os.path.join(self.workdir, 'data')
+
+    @property
+    def url(self):
+        return f"postgresql://postgres@127.0.0.1:{self.port}/{CHECK_DATABASE}"
+
+    def _run(self, name, *args):
+        subprocess.run([pg_command(name, self.pg_bin), *args], check=True, stdout=subprocess.DEVNULL)
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix='smt_pg_')
+        self._run('initdb', '-D', self.data_dir, '-U', 'postgres', '-A', 'trust', '--no-sync')
+        self._run('pg_ctl', '-D', self.data_dir, '-l', os.path.join(self.workdir, 'server.log'), '-w',
+                  '-o', f"-p {self.port} -k {self.workdir} -c listen_addresses=127.0.0.1 -c fsync=off", 'start')
+        self._run('createdb', '-h', '127.0.0.1', '-p', str(self.port), '-U', 'postgres', CHECK_DATABASE)
+        return self
+
+    def stop(self):
+        if self.workdir is None:
+            return
+        try:
+            self._run('pg_ctl', '-D', self.data_dir, '-m', 'fast', '-w', 'stop')
+        finally:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            self.workdir = None
+
+    def __enter__(self):
+        try:
+            return self.start()
+        except Exception:
+            self.stop()
+            raise
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def run_suites(url, workdir, quick=False, users=(1, 8), duration=5.0):
+    """Run the storage tests, the database/api benchmarks and the load test against a database URL, returns failed suites"""
+    suites = {
+        # test_api.py is a manual yfinance smoke script, not a pytest module
+        'tests': [sys.executable, '-m', 'pytest', '-q', '--ignore=test_api.py'],
+        'benchmarks': [sys.executable, 'benchmarks.py', '--only', 'database', '--only', 'api',
+                       '--database-url', url, '--workdir', workdir,
+                       '--results', os.path.join(workdir, 'bench_results.jsonl')] + (['--quick'] if quick else []),
+        'loadtest': [sys.executable, 'loadtest.py', '--db', url, '--duration', str(duration),
+                     '--users'] + [str(n) for n in users]
+    }
+    failed = []
+    for name, command in suites.items():
+        print(f"\n=== {name} against {url}", flush=True)
+        # The backend-parametrized tests run their PostgreSQL cases against TEST_DATABASE_URL
+        if subprocess.call(command, cwd=HERE, env=dict(os.environ, TEST_DATABASE_URL=url)) != 0:
+            failed.append(name)
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the storage tests, benchmarks and load test against a throwaway local PostgreSQL")
+    parser.add_argument('--pg-bin', default=PG_BIN, help="directory of initdb/pg_ctl (default: PATH)")
+    parser.add_argument('--url', help="use this running PostgreSQL instead of launching one")
+    parser.add_argument('--quick', action='store_true', help="smaller benchmark database sizes")
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--duration', type=float, default=5.0, help="load-test seconds per concurrency level")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='smt_pg_check_')
+    try:
+        if args.url:
+            failed = run_suites(args.url, workdir, args.quick, args.users, args.duration)
+        else:
+            if hasattr(os, 'geteuid') and os.geteuid() == 0:
+                print("PostgreSQL won't run as root; run this as an unprivileged user or pass --url")
+                return 1
+            try:
+                with LocalPostgres(args.pg_bin) as server:
+                    failed = run_suites(server.url, workdir, args.quick, args.users, args.duration)
+            except (FileNotFoundError, subprocess.CalledProcessError) as e:
+                print(f"Error starting local PostgreSQL: {str(e)}")
+                return 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'All suites passed' if not failed else 'Failed: ' + ', '.join(failed)}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+import io
+import json
+import os
+import threading
+import time
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from dotenv import load_dotenv
+from database import (ALERT_IMPORT_COLUMNS, COOLDOWN_SEED_VERSION, SCHEMA_VERSION, Database, _schema_lock,
+                      _schema_ready)
+from metrics import timed
+
+load_dotenv()
+
+# PostgreSQL pool configuration - override in .env file
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "20"))   # Per process; callers wait when all are busy
+
+SCHEMA_LOCK_KEY = 7316402   # Advisory lock serializing schema setup across processes
+
+# The SQLite schema at SCHEMA_VERSION in PostgreSQL types. Timestamps that SQLite stores as
+# 'YYYY-MM-DD HH:MM:SS' text stay text here, so cutoffs and partitions compare the same way.
+POSTGRES_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        email TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alerts (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id),
+        timestamp TEXT DEFAULT to_char(now() AT TIME ZONE 'utc', 'YYYY-MM-DD HH24:MI:SS'),
+        symbol TEXT NOT NULL,
+        alert_type TEXT NOT NULL,
+        message TEXT NOT NULL,
+        details TEXT,
+        email_sent BOOLEAN DEFAULT FALSE,
+        alert_price DOUBLE PRECISION,
+        price_1h DOUBLE PRECISION,
+        price_1d DOUBLE PRECISION,
+        price_1w DOUBLE PRECISION,
+        return_1h DOUBLE PRECISION,
+        return_1d DOUBLE PRECISION,
+        return_1w DOUBLE PRECISION,
+        is_successful INTEGER
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_alerts_user_time ON alerts (user_id, timestamp, id)',
+    'CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp)',
+    '''CREATE TABLE IF NOT EXISTS watchlist (
+        user_id INTEGER REFERENCES users(id),
+        symbol TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, symbol)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS flow_rollups (
+        bucket_minutes INTEGER NOT NULL,
+        bucket_start BIGINT NOT NULL,
+        symbol TEXT NOT NULL,
+        premium DOUBLE PRECISION DEFAULT 0,
+        volume BIGINT DEFAULT 0,
+        call_premium DOUBLE PRECISION DEFAULT 0,
+        put_premium DOUBLE PRECISION DEFAULT 0,
+        call_volume BIGINT DEFAULT 0,
+        put_volume BIGINT DEFAULT 0,
+        contracts INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (bucket_minutes, bucket_start, symbol)
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_flow_rollups_bucket ON flow_rollups (bucket_start)',
+    '''CREATE TABLE IF NOT EXISTS scan_cache (
+        key TEXT PRIMARY KEY,
+        payload TEXT NOT NULL,
+        updated_at DOUBLE PRECISION NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alert_archive_partitions (
+        partition TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        alerts INTEGER NOT NULL,
+        PRIMARY KEY (partition, user_id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alert_archive_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_alerts INTEGER NOT NULL DEFAULT 0,
+        successful_alerts INTEGER NOT NULL DEFAULT 0,
+        sum_return_1h DOUBLE PRECISION NOT NULL DEFAULT 0,
+        count_return_1h INTEGER NOT NULL DEFAULT 0,
+        sum_return_1d DOUBLE PRECISION NOT NULL DEFAULT 0,
+        count_return_1d INTEGER NOT NULL DEFAULT 0,
+        sum_return_1w DOUBLE PRECISION NOT NULL DEFAULT 0,
+        count_return_1w INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS scan_cycles (
+        cycle_id BIGINT PRIMARY KEY,
+        batches INTEGER NOT NULL,
+        created_at DOUBLE PRECISION NOT NULL,
+        published_at DOUBLE PRECISION,
+        published_by TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS scan_leases (
+        cycle_id BIGINT NOT NULL,
+        batch INTEGER NOT NULL,
+        symbols TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        owner TEXT,
+        lease_expires DOUBLE PRECISION,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        completed_at DOUBLE PRECISION,
+        results TEXT,
+        PRIMARY KEY (cycle_id, batch)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS alert_cooldowns (
+        user_id INTEGER NOT NULL,
+        contract_symbol TEXT NOT NULL,
+        alert_type TEXT NOT NULL,
+        alerted_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (user_id, contract_symbol, alert_type)
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_alert_cooldowns_time ON alert_cooldowns (alerted_at)',
+    'CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'
+]
+
+# One pool per database URL, shared by every PostgresDatabase in the process
+_pools = {}
+_pools_lock = threading.Lock()
+
+class ConnectionPool:
+    """Thread-safe psycopg2 pool that waits for a free connection instead of failing when exhausted"""
+    def __init__(self, dsn, min_connections=POSTGRES_POOL_MIN, max_connections=POSTGRES_POOL_MAX):
+        self._pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+        self._available = threading.BoundedSemaphore(max_connections)
+
+    def getconn(self):
+        self._available.acquire()
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._available.release()
+            raise
+
+    def putconn(self, conn):
+        self._pool.putconn(conn, close=conn.closed != 0)
+        self._available.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+def get_pool(dsn):
+    with _pools_lock:
+        if dsn not in _pools:
+            _pools[dsn] = ConnectionPool(dsn)
+        return _pools[dsn]
+
+def _translate(query):
+    # Database methods use sqlite3's qmark placeholders; psycopg2 expects %s (and %% for a literal %)
+    return query.replace('%', '%%').replace('?', '%s')
+
+class PooledCursor:
+    """psycopg2 cursor accepting the qmark SQL shared with the SQLite backend"""
+    def __init__(self, cursor):
+        self.raw = cursor
+
+    def execute(self, query, params=()):
+        self.raw.execute(_translate(query), params)
+
+    def executemany(self, query, params):
+        self.raw.executemany(_translate(query), params)
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+class PooledConnection:
+    """A pool checkout with the sqlite3 connection methods Database uses; close() returns it to the pool"""
+    def __init__(self, pool):
+        self._pool = pool
+        self.raw = None
+        self.raw = pool.getconn()
+
+    def cursor(self):
+        return PooledCursor(self.raw.cursor())
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if self.raw is None:
+            return
+        try:
+            # Ends whatever an error left open, so the next borrower starts clean
+            self.raw.rollback()
+        finally:
+            self._pool.putconn(self.raw)
+            self.raw = None
+
+    # Methods that raise before close() would otherwise leak the checkout
+    __del__ = close
+
+class PostgresDatabase(Database):
+    """PostgreSQL storage backend with pooled connections, for many concurrent writers"""
+    IntegrityError = psycopg2.IntegrityError
+    OperationalError = psycopg2.OperationalError
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.pool = get_pool(dsn)
+        with _schema_lock:
+            if dsn not in _schema_ready:
+                self.init_database()
+                _schema_ready.add(dsn)
+
+    def _connect(self):
+        return PooledConnection(self.pool)
+
+    def _begin_write(self, cursor):
+        # Transactions start implicitly; row locks and conditional updates keep the
+        # check-then-write sequences safe under READ COMMITTED
+        pass
+
+    def _read_frame(self, query, params=()):
+        import pandas as pd
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        df = pd.DataFrame(cursor.fetchall(), columns=[column[0] for column in cursor.description])
+        conn.close()
+        return df
+
+    def init_database(self):
+        """Create the schema if this database is behind SCHEMA_VERSION"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Concurrent first starts would otherwise race on CREATE TABLE
+        cursor.execute('SELECT pg_advisory_xact_lock(?)', (SCHEMA_LOCK_KEY,))
+        cursor.execute("SELECT to_regclass('schema_version')")
+        version = 0
+        if cursor.fetchone()[0] is not None:
+            cursor.execute('SELECT MAX(version) FROM schema_version')
+            version = cursor.fetchone()[0] or 0
+        if version < SCHEMA_VERSION:
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+            if version < COOLDOWN_SEED_VERSION:
+                self.seed_alert_cooldowns(cursor)
+            cursor.execute('DELETE FROM schema_version')
+            cursor.execute('INSERT INTO schema_version (version) VALUES (?)', (SCHEMA_VERSION,))
+
+        conn.commit()
+        conn.close()
+
+    @timed('db_write')
+    def save_alert(self, user_id, symbol, alert_type, message, details, alert_price, email_sent=False):
+        """Save a new alert"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT INTO alerts (user_id, symbol, alert_type, message, details, alert_price, email_sent)
+            VALUES (?, ?, ?, ?, ?, ?, ?) RETURNING id
+        ''', (user_id, symbol, alert_type, message, json.dumps(details), alert_price, bool(email_sent)))
+
+        alert_id = cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+
+        return alert_id
+
+    @timed('db_write')
+    def save_alerts(self, alerts):
+        """Save several alerts in one statement, returns their ids"""
+        if not alerts:
+            return []
+
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        rows = [(user_id, symbol, alert_type, message, json.dumps(details), alert_price, bool(email_sent))
+                for user_id, symbol, alert_type, message, details, alert_price, email_sent in alerts]
+        returned = execute_values(cursor.raw, '''
+            INSERT INTO alerts (user_id, symbol, alert_type, message, details, alert_price, email_sent)
+            VALUES %s RETURNING id
+        ''', rows, fetch=True)
+
+        conn.commit()
+        conn.close()
+
+        return [row[0] for row in returned]
+
+    @timed('db_write')
+    def bulk_insert_alerts(self, rows):
+        """Load historical alerts (tuples in ALERT_IMPORT_COLUMNS order) with COPY"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_field(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.raw.copy_expert(f"COPY alerts ({', '.join(ALERT_IMPORT_COLUMNS)}) FROM STDIN", buffer)
+
+        conn.commit()
+        conn.close()
+
+    @timed('db_write')
+    def upsert_flow_rollups(self, bucket_minutes, rows):
+        """Insert or replace flow rollup cells for one bucket size"""
+        if not rows:
+            return
+
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # Option volumes are cumulative for the session, so the latest scan
+        # in a bucket replaces the cell instead of adding to it
+        execute_values(cursor.raw, '''
+            INSERT INTO flow_rollups (bucket_minutes, bucket_start, symbol, premium, volume,
+                                      call_premium, put_premium, call_volume, put_volume, contracts)
+            VALUES %s
+            ON CONFLICT (bucket_minutes, bucket_start, symbol) DO UPDATE SET
+                premium = excluded.premium,
+                volume = excluded.volume,
+                call_premium = excluded.call_premium,
+                put_premium = excluded.put_premium,
+                call_volume = excluded.call_volume,
+                put_volume = excluded.put_volume,
+                contracts = excluded.contracts,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(bucket_minutes,) + tuple(row) for row in rows])
+
+        conn.commit()
+        conn.close()
+
+    @timed('db_write')
+    def claim_scan_batch(self, cycle_id, owner, lease_seconds):
+        """Lease the next pending or expired batch of a cycle, returns (batch, symbols) or None"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        now = time.time()
+        # SKIP LOCKED hands concurrent claimers different batches instead of queueing them on one row
+        cursor.execute('''
+            UPDATE scan_leases SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1
+            WHERE (cycle_id, batch) = (
+                SELECT cycle_id, batch FROM scan_leases
+                WHERE cycle_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY batch LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING batch, symbols
+        ''', (owner, now + lease_seconds, cycle_id, now))
+        row = cursor.fetchone()
+
+        conn.commit()
+        conn.close()
+
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _delete_alerts(self, cursor, alert_ids):
+        cursor.execute('DELETE FROM alerts WHERE id = ANY(?)', (list(alert_ids),))
+        return cursor.rowcount
+
+    def reclaim_space(self):
+        """Nothing to do: autovacuum returns dead tuples to the table's free space"""
+        pass
+
+def _copy_field(value):
+    # COPY text format: \N is NULL; backslash, tab and newlines are escaped
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
@@ -0,0 +1,249 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Profiling configuration - override in .env file
+PROFILE_MODE = os.getenv("PROFILE_MODE", "off")          # off, cprofile or sample
+PROFILE_TARGET = os.getenv("PROFILE_TARGET", "scan")     # scan or render
+PROFILE_CYCLES = int(os.getenv("PROFILE_CYCLES", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+PROFILE_ADMINS = [u.strip() for u in os.getenv("PROFILE_ADMINS", "").split(",") if u.strip()]
+PROFILE_TOP_N = 25
+
+_OFF = nullcontext()
+
+class StackSampler:
+    """Sampling profiler that snapshots a cycle's thread, and its worker threads' tasks, on a timer"""
+    def __init__(self, thread_id, interval):
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename}:{code.co_firstlineno}({code.co_name})")
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[';'.join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def run_task(self, func, *args, **kwargs):
+        """Run func on the current (worker) thread, sampling it for as long as it runs"""
+        thread_id = threading.get_ident()
+        self.thread_ids.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.thread_ids.discard(thread_id)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, top_n=PROFILE_TOP_N):
+        """Top functions by share of samples they were on the stack for"""
+        inclusive = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            functions = stack.split(';')
+            for function in set(functions):
+                inclusive[function] += count
+            own[functions[-1]] += count
+
+        return [{
+            'function': function,
+            'samples': count,
+            'self_samples': own[function],
+            'cumtime': round(count * self.interval, 4),
+            'cum_percent': round(count / self.samples * 100, 1)
+        } for function, count in inclusive.most_common(top_n)]
+
+    def write(self, path):
+        """Write collapsed stacks, the input format of flamegraph tools"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.items():
+                f.write(f"{stack} {count}\n")
+
+class CycleProfile:
+    """cProfile of one cycle: its own thread plus the tasks it hands to worker threads"""
+    def __init__(self):
+        self.main = cProfile.Profile()
+        self.tasks = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.main.enable()
+
+    def disable(self):
+        self.main.disable()
+
+    def run_task(self, func, *args, **kwargs):
+        """Run func on the current (worker) thread under its own profile, merged in stats()"""
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self._lock:
+                self.tasks.append(profile)
+
+    def stats(self):
+        stats = pstats.Stats(self.main, stream=io.StringIO())
+        with self._lock:
+            for profile in self.tasks:
+                stats.add(profile)
+        return stats
+
+class Profiler:
+    def __init__(self, mode=None, target=None, cycles=None, output_dir=None):
+        self.mode = mode or PROFILE_MODE
+        self.target = target or PROFILE_TARGET
+        self.output_dir = output_dir or PROFILE_DIR
+        self.remaining = (cycles or PROFILE_CYCLES) if self.mode != 'off' else 0
+        self.last_summary = []
+        self.last_artifact = None
+        self._lock = threading.Lock()
+        self._active = {}
+
+    def enable(self, cycles, mode='cprofile', target=None):
+        """Profile the next N cycles of the target (admin control)"""
+        with self._lock:
+            self.mode = mode
+            self.target = target or self.target
+            self.remaining = cycles
+
+    def disable(self):
+        """Stop profiling after the current cycle"""
+        with self._lock:
+            self.remaining = 0
+
+    def start(self, target):
+        """Begin profiling one cycle of a target on the current thread"""
+        # Fast path: a single int check when profiling is off
+        if not (self.remaining or self._active) or target != self.target:
+            return False
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            # A cycle that never reached stop() (e.g. a Streamlit rerun) is closed first
+            stale = self._active.pop(thread_id, None)
+            if not self.remaining or (self._active and self.mode == 'cprofile'):
+                session = None
+            else:
+                self.remaining -= 1
+                session = self._new_session(thread_id)
+                self._active[thread_id] = (target, session)
+
+        if stale:
+            self._finish(*stale)
+        return session is not None
+
+    def stop(self, target):
+        """End the current thread's profiling cycle and write its artifact"""
+        if not self._active:
+            return None
+
+        with self._lock:
+            entry = self._active.get(threading.get_ident())
+            if entry is None or entry[0] != target:
+                return None
+            del self._active[threading.get_ident()]
+
+        return self._finish(*entry)
+
+    def bind(self, func):
+        """func, profiled into the calling thread's cycle when a thread pool runs it"""
+        # cProfile and the sampler only see the thread that started the cycle
+        entry = self._active.get(threading.get_ident()) if self._active else None
+        if entry is None:
+            return func
+        return functools.partial(entry[1].run_task, func)
+
+    def profile(self, target):
+        """Context manager profiling one cycle, a no-op when profiling is off"""
+        with self._lock:
+            profiling = self.remaining and target == self.target
+        if not profiling:
+            return _OFF
+        return self._profile(target)
+
+    @contextmanager
+    def _profile(self, target):
+        started = self.start(target)
+        try:
+            yield
+        finally:
+            if started:
+                self.stop(target)
+
+    def _new_session(self, thread_id):
+        if self.mode == 'sample':
+            session = StackSampler(thread_id, PROFILE_SAMPLE_INTERVAL)
+            session.start()
+        else:
+            session = CycleProfile()
+            session.enable()
+        return session
+
+    def _finish(self, target, session):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+        if isinstance(session, StackSampler):
+            session.stop()
+            path = os.path.join(self.output_dir, f"{target}_{stamp}.collapsed")
+            session.write(path)
+            summary = session.summary()
+        else:
+            session.disable()
+            path = os.path.join(self.output_dir, f"{target}_{stamp}.prof")
+            stats = session.stats()
+            stats.dump_stats(path)
+            summary = summarize_profile(stats)
+
+        with open(path.rsplit('.', 1)[0] + '.txt', 'w') as f:
+            for row in summary:
+                f.write(f"{row['cumtime']:>10.4f}  {row['function']}\n")
+
+        self.last_summary = summary
+        self.last_artifact = path
+        return path
+
+def summarize_profile(profile, top_n=PROFILE_TOP_N):
+    """Top functions of a cProfile run (a Profile or merged Stats) by cumulative time"""
+    stats = profile if isinstance(profile, pstats.Stats) else pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{filename}:{line}({name})",
+            'ncalls': ncalls,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4)
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:top_n]
+
+# Shared profiler for the whole process
+profiler = Profiler()
@@ -0,0 +1,179 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from metrics import metrics
+
+load_dotenv()
+
+# Upstream rate limit configuration - override in .env file
+UPSTREAM_RATE = float(os.getenv("UPSTREAM_RATE", "4"))              # Requests per second to start from
+UPSTREAM_MAX_RATE = float(os.getenv("UPSTREAM_MAX_RATE", "10"))     # Ceiling the rate recovers towards
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "8"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "4"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "3"))          # Retries per symbol per scan cycle
+
+MIN_RATE = 0.2
+RATE_DECREASE = 0.5          # Multiplicative decrease on a throttling response
+RATE_INCREASE = 0.1          # Additive increase (requests/s) per successful request
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+THROTTLE_MARKERS = ('too many requests', 'rate limit', '429')
+# Network errors from requests/curl_cffi don't subclass the builtin ConnectionError
+TRANSIENT_ERROR_NAMES = ('ConnectionError', 'Timeout', 'ConnectTimeout', 'ReadTimeout')
+
+def is_throttle_error(error):
+    """Whether an upstream exception means we are being throttled"""
+    if type(error).__name__ == 'YFRateLimitError':
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in THROTTLE_MARKERS)
+
+def is_transient_error(error):
+    """Throttling and network errors worth retrying"""
+    return (is_throttle_error(error) or isinstance(error, (ConnectionError, TimeoutError))
+            or type(error).__name__ in TRANSIENT_ERROR_NAMES)
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `burst`"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+class AdaptiveRateLimiter:
+    """Token bucket with AIMD rate control and a concurrency cap for one upstream"""
+    def __init__(self, rate=UPSTREAM_RATE, max_rate=UPSTREAM_MAX_RATE, burst=UPSTREAM_BURST,
+                 max_concurrency=UPSTREAM_MAX_CONCURRENCY, name='yfinance'):
+        self.name = name
+        self.max_rate = max(rate, max_rate)
+        self.bucket = TokenBucket(rate, burst)
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.paused_until = 0.0
+        self.throttles = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.bucket.rate
+
+    @contextmanager
+    def request(self):
+        """Hold a concurrency slot and a token for the duration of one upstream call"""
+        with self.slots:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            waited = self.bucket.acquire()
+            if waited:
+                metrics.observe('upstream_wait', waited)
+            yield
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.bucket.set_rate(min(self.max_rate, self.rate + RATE_INCREASE))
+
+    def on_throttle(self, attempt):
+        """Halve the rate and pause every caller for an exponential, jittered backoff"""
+        with self._lock:
+            self.throttles += 1
+            self.bucket.set_rate(max(MIN_RATE, self.rate * RATE_DECREASE))
+            # Drain the burst so the resumed requests are paced at the new rate
+            self.bucket.tokens = 0
+            backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+        metrics.inc('upstream_throttled_total', {'upstream': self.name})
+        return backoff
+
+# Shared by every data source in the process
+upstream_limiter = AdaptiveRateLimiter()
+
+class RetryBudgetExceeded(Exception):
+    """A symbol used up its retries for this scan cycle"""
+
+class RateLimitedSource:
+    """Wraps a data source so every call goes through the limiter, with per-symbol retry budgets"""
+    def __init__(self, source, limiter=None, retries=UPSTREAM_RETRIES):
+        self.source = source
+        self.limiter = limiter or upstream_limiter
+        self.retries = retries
+        self.retries_used = {}
+        self._lock = threading.Lock()
+
+    def start_cycle(self):
+        """Reset the per-symbol retry budgets at the start of a scan cycle"""
+        with self._lock:
+            self.retries_used = {}
+        if hasattr(self.source, 'start_cycle'):
+            self.source.start_cycle()
+
+    def _take_retry(self, symbol):
+        with self._lock:
+            used = self.retries_used.get(symbol, 0)
+            if used >= self.retries:
+                return False
+            self.retries_used[symbol] = used + 1
+            return True
+
+    def _call(self, symbol, method, *args):
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.request():
+                    result = getattr(self.source, method)(symbol, *args)
+                self.limiter.on_success()
+                return result
+            except Exception as e:
+                if not is_transient_error(e):
+                    raise
+                throttled = is_throttle_error(e)
+                if throttled:
+                    self.limiter.on_throttle(attempt)
+                if not self._take_retry(symbol):
+                    raise RetryBudgetExceeded(f"{symbol}: retry budget exhausted ({str(e)})") from e
+                metrics.inc('upstream_retries_total', {'upstream': self.limiter.name})
+                if not throttled:
+                    # Only throttling pauses everyone; a network error backs off this caller
+                    time.sleep(min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0))
+                attempt += 1
+
+    def get_info(self, symbol):
+        return self._call(symbol, 'get_info')
+
+    def get_options(self, symbol):
+        return self._call(symbol, 'get_options')
+
+    def get_option_chain(self, symbol, expiry):
+        return self._call(symbol, 'get_option_chain', expiry)
+
+    def get_history(self, symbol, start, end):
+        return self._call(symbol, 'get_history', start, end)
@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime
+from flow_aggregation import FLOW_COLUMNS
+from storage import open_database
+
+# Rollup configuration - override in .env file
+ROLLUP_BUCKET_MINUTES = int(os.getenv("ROLLUP_BUCKET_MINUTES", "60"))
+ROLLUP_LOOKBACK_HOURS = int(os.getenv("ROLLUP_LOOKBACK_HOURS", "24"))
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "30"))
+
+HEATMAP_METRICS = {
+    'premium': 'Premium ($)',
+    'volume': 'Volume',
+    'call_share': 'Call Premium Share (%)'
+}
+
+class FlowRollup:
+    def __init__(self, db=None, bucket_minutes=None, lookback_hours=None):
+        self.db = db or open_database()
+        self.bucket_minutes = bucket_minutes or ROLLUP_BUCKET_MINUTES
+        self.lookback_hours = lookback_hours or ROLLUP_LOOKBACK_HOURS
+        self._last_prune = 0
+
+    def bucket_start(self, timestamp):
+        """Floor a unix timestamp to the start of its bucket"""
+        bucket_seconds = self.bucket_minutes * 60
+        return int(timestamp) // bucket_seconds * bucket_seconds
+
+    def record(self, flow, timestamp=None):
+        """Roll up per-symbol full-chain flow totals (FlowAggregator.symbol_flow) into (symbol, bucket) cells"""
+        if flow is None or flow.empty:
+            return 0
+
+        timestamp = timestamp or time.time()
+        bucket = self.bucket_start(timestamp)
+
+        rows = [
+            (bucket, str(symbol), float(call_premium + put_premium), int(call_volume + put_volume),
+             float(call_premium), float(put_premium), int(call_volume), int(put_volume), int(contracts))
+            for symbol, call_premium, put_premium, call_volume, put_volume, contracts
+            in flow[FLOW_COLUMNS].itertuples()
+        ]
+        self.db.upsert_flow_rollups(self.bucket_minutes, rows)
+
+        # Prune at most once per bucket so old cells don't slow down lookups
+        if bucket != self._last_prune:
+            self.db.prune_flow_rollups(bucket - ROLLUP_RETENTION_DAYS * 86400)
+            self._last_prune = bucket
+
+        return len(rows)
+
+    def get_heatmap(self, symbols=None, metric='premium', now=None):
+        """Get a symbol x bucket matrix of one rollup metric over the lookback window"""
+        now = now or time.time()
+        bucket_seconds = self.bucket_minutes * 60
+        last_bucket = self.bucket_start(now)
+        first_bucket = self.bucket_start(now - self.lookback_hours * 3600) + bucket_seconds
+        buckets = list(range(first_bucket, last_bucket + 1, bucket_seconds))
+
+        cells = self.db.get_flow_rollups(self.bucket_minutes, first_bucket)
+
+        if metric == 'call_share':
+            values = cells['call_premium'] / cells['premium'].where(cells['premium'] > 0) * 100
+        else:
+            values = cells[metric]
+
+        heatmap = (
+            cells.assign(value=values)
+            .pivot(index='symbol', columns='bucket_start', values='value')
+            .reindex(columns=buckets)
+        )
+
+        if symbols is not None:
+            heatmap = heatmap.reindex(index=symbols)
+
+        heatmap.columns = [datetime.fromtimestamp(b) for b in heatmap.columns]
+        if metric == 'call_share':
+            # A share of no premium is undefined, so those cells stay NaN and render blank
+            return heatmap
+        return heatmap.fillna(0)
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+OPTION_TYPES = pd.CategoricalDtype(['CALL', 'PUT'])
+
+# Column -> dtype of the scan result table, one row per unusual contract. Prices and strikes
+# stay float64 because they are printed in alerts; only ratios and greeks are downcast.
+SCAN_RESULT_SCHEMA = {
+    'symbol': 'category',
+    'contract_symbol': 'object',
+    'option_type': OPTION_TYPES,
+    'strike': 'float64',
+    'volume': 'int64',
+    'open_interest': 'int64',
+    'volume_ratio': 'float32',
+    'last_price': 'float64',
+    'premium': 'float64',
+    'implied_volatility': 'float32',
+    'current_price': 'float64',
+    'company_name': 'category',
+    'delta': 'float32',
+    'gamma': 'float32',
+    'delta_notional': 'float64'
+}
+
+def empty_scan_result():
+    """Scan result table with no rows"""
+    return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in SCAN_RESULT_SCHEMA.items()})
+
+def make_scan_result(df):
+    """Coerce a frame to the scan result columns and dtypes"""
+    if df.empty:
+        return empty_scan_result()
+
+    # Build all columns as arrays in one go; per-column inserts and astype dominate small tables
+    columns = {}
+    for column, dtype in SCAN_RESULT_SCHEMA.items():
+        if column in df:
+            values = df[column].to_numpy()
+        else:
+            values = np.full(len(df), None if dtype in ('category', 'object') else 0)
+
+        if dtype == 'category':
+            columns[column] = pd.Categorical(values)
+        elif isinstance(dtype, pd.CategoricalDtype):
+            columns[column] = pd.Categorical(values, dtype=dtype)
+        elif dtype == 'object':
+            columns[column] = values
+        else:
+            columns[column] = values.astype(dtype)
+    return pd.DataFrame(columns)
+
+def concat_results(frames):
+    """Combine per-symbol scan results into one table"""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return empty_scan_result()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    # Categories differ per symbol, so re-categorize once after the concat
+    return make_scan_result(pd.concat(frames, ignore_index=True))
+
+def top_k(result, k, by='premium'):
+    """The k largest rows by a column, without sorting the whole table"""
+    if len(result) <= k:
+        return result.sort_values(by, ascending=False, kind='stable')
+    return result.nlargest(k, by, keep='first')
+
+class RunningTopK:
+    """The k largest rows by a column, maintained as per-symbol results arrive or are replaced"""
+    def __init__(self, k, by='premium'):
+        self.k = k
+        self.by = by
+        self.symbol_top = {}
+        self.rows = empty_scan_result()
+
+    def update(self, symbol, result):
+        """Set a symbol's latest result (None when it has none) and return the current top k"""
+        previous = self.symbol_top.pop(symbol, None)
+        if result is not None and not result.empty:
+            self.symbol_top[symbol] = top_k(result, self.k, self.by)
+
+        if previous is not None and symbol in set(self.rows['symbol'].astype(str)):
+            # The symbol's old rows may be in the top k, so rebuild from every symbol's own top k
+            self.rows = self._top(list(self.symbol_top.values()))
+        elif symbol in self.symbol_top:
+            self.rows = self._top([self.rows, self.symbol_top[symbol]])
+        return self.rows
+
+    def _top(self, frames):
+        return top_k(concat_results(frames), self.k, self.by).reset_index(drop=True)
+
+def to_records(result):
+    """Rows as plain-Python dicts, for alert details, JSON and email templates"""
+    records = []
+    columns = list(result.columns)
+    for row in zip(*(result[column].to_numpy(dtype=object) for column in columns)):
+        record = {}
+        for column, value in zip(columns, row):
+            if isinstance(value, np.generic):
+                value = value.item()
+            if isinstance(value, float):
+                value = round(value, 6)
+            if value is pd.NA or (isinstance(value, float) and np.isnan(value)):
+                value = None
+            record[column] = value
+        records.append(record)
+    return records
+
+def to_columns(result):
+    """Compact columnar form for passing between processes: arrays, categoricals as codes + categories"""
+    columns = {}
+    for column in result.columns:
+        series = result[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[column] = (series.cat.codes.to_numpy(), list(series.cat.categories))
+        else:
+            columns[column] = series.to_numpy()
+    return columns
+
+def from_columns(columns):
+    """Rebuild a scan result table from to_columns() output"""
+    if not columns:
+        return empty_scan_result()
+    data = {}
+    for column, values in columns.items():
+        if isinstance(values, tuple):
+            codes, categories = values
+            dtype = SCAN_RESULT_SCHEMA.get(column)
+            categorical = pd.Categorical.from_codes(codes, categories=categories)
+            data[column] = categorical.set_categories(dtype.categories) if isinstance(dtype, pd.CategoricalDtype) else categorical
+        else:
+            data[column] = values
+    return pd.DataFrame(data)
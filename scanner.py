@@ -0,0 +1,220 @@
+import argparse
+import sys
+import threading
+import time
+from functools import partial
+from archive import AlertArchive
+from distributed_scan import DistributedScanWorker
+from flow_aggregation import FlowAggregator
+from greeks import GammaExposure
+from market_snapshot import MarketSnapshot
+from metrics import metrics
+from rollups import FlowRollup
+from scan_results import RunningTopK, concat_results, to_records
+from scheduler import ScanScheduler
+from sharded_scan import SCAN_WORKERS, ShardedScanner, live_source, load_universe, replay_source
+from storage import open_database
+from utils import SENTIMENT_SYMBOL, StockDataFetcher
+
+SCAN_INTERVAL_SECONDS = 60
+SENTIMENT_INTERVAL_SECONDS = 60  # SPY refresh for sentiment when it isn't on the watchlist
+LIVE_TOP_K = 50                  # Rows kept current while a scan streams in
+SCHEDULER_POLL_SECONDS = 5       # Longest sleep between scheduler checks, so watchlist changes are picked up
+
+# Keys of the scan outputs published to the shared cache
+CACHE_UNUSUAL = 'unusual_activity'
+CACHE_SENTIMENT = 'market_sentiment'
+CACHE_SUMMARY = 'scan_summary'
+CACHE_FLOW = 'flow_aggregates'
+CACHE_GAMMA = 'gamma_exposure'
+
+class ScanService:
+    def __init__(self, data_fetcher=None, db=None, flow_rollup=None, flow_aggregator=None, gamma_exposure=None,
+                 alert_archive=None, scheduler=None):
+        self.data_fetcher = data_fetcher or StockDataFetcher()
+        self.db = db or open_database()
+        self.flow_rollup = flow_rollup or FlowRollup(self.db)
+        self.flow_aggregator = flow_aggregator or FlowAggregator()
+        self.gamma_exposure = gamma_exposure or GammaExposure()
+        self.alert_archive = alert_archive or AlertArchive(self.db)
+        self.scheduler = scheduler or ScanScheduler(self.data_fetcher.watchlist)
+        self.lock = threading.Lock()
+
+        # Latest published cycle; every panel and API output is computed from it
+        self.snapshot = MarketSnapshot()
+
+    @property
+    def activities(self):
+        return self.snapshot.activities
+
+    def publish(self, snapshot, symbols_scanned=None, aggregated=False):
+        """Roll up and publish one scan cycle's snapshot for the dashboard and API"""
+        now = time.time()
+        sentiment = self.cycle_sentiment(snapshot)
+        if not aggregated:
+            # Sharded and distributed scans merge worker aggregates as batches arrive
+            self.flow_aggregator.update(snapshot.chains)
+            self.gamma_exposure.update(snapshot.chains, snapshot.prices, now)
+        # Whole-chain totals, so the heatmap isn't limited to the top unusual contracts
+        self.flow_rollup.record(self.flow_aggregator.symbol_flow, now)
+
+        activities = snapshot.activities
+        summary = {
+            'cycle_id': snapshot.cycle_id,
+            'timestamp': now,
+            'duration': round(now - snapshot.timestamp, 3),
+            'symbols_scanned': len(self.data_fetcher.watchlist) if symbols_scanned is None else symbols_scanned,
+            'unusual_count': len(activities),
+            'total_premium': float(activities['premium'].sum()),
+            'top_symbols': [str(s) for s in activities['symbol'].drop_duplicates().head(5)],
+            'coverage': snapshot.coverage
+        }
+
+        self.db.set_cache(CACHE_UNUSUAL, to_records(activities))
+        self.db.set_cache(CACHE_SENTIMENT, sentiment)
+        self.db.set_cache(CACHE_FLOW, self.flow_aggregator.to_dict())
+        self.db.set_cache(CACHE_GAMMA, self.gamma_exposure.to_dict())
+        self.db.set_cache(CACHE_SUMMARY, summary)
+        self.snapshot = snapshot
+        return summary
+
+    def run_cycle(self):
+        """Fetch, detect and publish one scan cycle"""
+        self.data_fetcher.scan_all_watchlist()
+        return self.publish(self.data_fetcher.snapshot)
+
+    def cycle_sentiment(self, snapshot):
+        """Market sentiment of a cycle, from the SPY chain it holds or fetches once"""
+        if snapshot.sentiment is None:
+            snapshot.sentiment = self.data_fetcher.get_market_sentiment(snapshot)
+        return snapshot.sentiment
+
+    def current_sentiment(self):
+        """Market sentiment of the latest published cycle"""
+        return self.cycle_sentiment(self.snapshot)
+
+    def scan_due(self):
+        """Scan the symbols the scheduler says are due and publish the merged table, None if none were due"""
+        scan = self.iter_scan_due()
+        while True:
+            try:
+                next(scan)
+            except StopIteration as done:
+                return done.value
+
+    def iter_scan_due(self, k=LIVE_TOP_K):
+        """Like scan_due, but yields the running top k rows first from held results, then after each symbol"""
+        started_at = time.time()
+        watchlist = self.data_fetcher.watchlist
+        self.scheduler.set_symbols(watchlist)
+        held = self.data_fetcher.snapshot
+
+        top = RunningTopK(k)
+        for symbol in watchlist:
+            if symbol in held.results:
+                top.update(symbol, held.results[symbol])
+        yield top.rows
+
+        symbols = self.scheduler.due(started_at)
+        if not symbols:
+            return None
+
+        # The new cycle keeps the data of symbols that aren't due; dropped watchlist symbols go
+        carry = set(watchlist) - set(symbols)
+        sentiment_at = held.fetched_at.get(SENTIMENT_SYMBOL)
+        if (SENTIMENT_SYMBOL not in watchlist and sentiment_at is not None
+                and not self.scheduler.needs_refresh(sentiment_at, SENTIMENT_INTERVAL_SECONDS)):
+            carry.add(SENTIMENT_SYMBOL)
+        snapshot = self.data_fetcher.begin_cycle(carry, started_at)
+
+        pending = set(symbols)
+        try:
+            for symbol, rows in self.data_fetcher.iter_scan(symbols):
+                self._record_symbol(snapshot, symbol, rows)
+                pending.discard(symbol)
+                yield top.update(symbol, snapshot.results.get(symbol))
+        finally:
+            # A consumer that stops early (e.g. a dashboard rerun) leaves the rest due again,
+            # with their previous data held until then
+            if pending:
+                snapshot.carry_over(held, pending)
+                self.scheduler.expedite(pending)
+
+        activities = concat_results([snapshot.results[s] for s in watchlist if s in snapshot.results])
+        snapshot.activities = activities.sort_values('premium', ascending=False, kind='stable', ignore_index=True)
+        return self.publish(snapshot, len(symbols))
+
+    def _record_symbol(self, snapshot, symbol, rows):
+        self.scheduler.record(symbol, len(rows), snapshot.liquidity(symbol),
+                              fetched=symbol in snapshot.coverage['fresh'])
+
+    def run_scheduled(self):
+        """Scan symbols as the scheduler makes them due until interrupted"""
+        while True:
+            summary = self.scan_due()
+            if summary:
+                self.alert_archive.maybe_archive()
+                metrics.write_textfile()
+                print(f"Cycle {summary['cycle_id']}: {summary['symbols_scanned']} symbols, "
+                      f"{summary['unusual_count']} unusual activities in {summary['duration']}s")
+            wait = self.scheduler.next_due_in()
+            time.sleep(SCHEDULER_POLL_SECONDS if wait is None else min(max(wait, 0.1), SCHEDULER_POLL_SECONDS))
+
+    def run_sharded_cycle(self, sharded_scanner, universe):
+        """Scan a large universe across worker processes and publish it as one cycle"""
+        snapshot, _ = sharded_scanner.scan(universe, self.flow_aggregator, self.gamma_exposure)
+        return self.publish(snapshot, len(universe), aggregated=True)
+
+    def run_forever(self, interval=SCAN_INTERVAL_SECONDS, cycle=None):
+        """Scan on a fixed interval until interrupted"""
+        cycle = cycle or self.run_cycle
+        while True:
+            started = time.time()
+            summary = cycle()
+            self.alert_archive.maybe_archive()
+            metrics.write_textfile()
+            print(f"Cycle {summary['cycle_id']}: {summary['unusual_count']} unusual activities in {summary['duration']}s")
+            time.sleep(max(0, interval - (time.time() - started)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the options scanner and publish results to the shared cache")
+    parser.add_argument('--interval', type=float, help="scan the whole watchlist on a fixed interval instead of scheduling")
+    parser.add_argument('--once', action='store_true', help="run a single cycle and exit")
+    parser.add_argument('--universe', help="file of symbols (one per line) to scan across worker processes")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    parser.add_argument('--replay', help="scan a record_snapshot directory instead of Yahoo Finance")
+    parser.add_argument('--distributed', action='store_true',
+                        help="share each cycle with scanners on other nodes through lease records in the database")
+    args = parser.parse_args(argv)
+
+    service = ScanService(StockDataFetcher(source=replay_source(args.replay) if args.replay else None))
+    metrics.start_http_server()
+    if args.distributed:
+        universe = load_universe(args.universe) if args.universe else service.data_fetcher.watchlist
+        worker = DistributedScanWorker(service, universe)
+        if args.once:
+            worker.run_cycle()
+        else:
+            worker.run_forever()
+    elif args.universe:
+        universe = load_universe(args.universe)
+        source_factory = partial(replay_source, args.replay) if args.replay else partial(live_source, args.workers)
+        sharded_scanner = ShardedScanner(source_factory, args.workers)
+        cycle = partial(service.run_sharded_cycle, sharded_scanner, universe)
+        try:
+            if args.once:
+                cycle()
+            else:
+                service.run_forever(args.interval or SCAN_INTERVAL_SECONDS, cycle)
+        finally:
+            sharded_scanner.close()
+    elif args.once:
+        service.run_cycle()
+    elif args.interval:
+        service.run_forever(args.interval)
+    else:
+        service.run_scheduled()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
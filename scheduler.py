@@ -0,0 +1,251 @@
+import csv
+import heapq
+import itertools
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+from dotenv import load_dotenv
+from market_hours import MARKET_TZ, POST_MARKET_CLOSE, PRE_MARKET_OPEN, REGULAR_CLOSE, REGULAR_OPEN
+
+load_dotenv()
+
+HOLIDAYS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_holidays.csv')
+
+SESSION_PRE = 'pre'
+SESSION_REGULAR = 'regular'
+SESSION_POST = 'post'
+SESSION_CLOSED = 'closed'
+
+# Scheduler configuration - override in .env file
+SCAN_MIN_INTERVAL = float(os.getenv("SCAN_MIN_INTERVAL", "5"))          # Hottest symbols, regular session
+SCAN_MAX_INTERVAL = float(os.getenv("SCAN_MAX_INTERVAL", "300"))        # Quietest symbols, regular session
+SCAN_EXTENDED_INTERVAL = float(os.getenv("SCAN_EXTENDED_INTERVAL", "900"))  # Pre- and post-market
+SCAN_REQUEST_BUDGET = float(os.getenv("SCAN_REQUEST_BUDGET", "240"))    # Upstream requests per minute for scans
+
+REQUESTS_PER_SCAN = 3            # info, expiries and the nearest chain
+ACTIVITY_HALF_LIFE = 1800        # Seconds for a symbol's unusual-activity score to halve
+ACTIVITY_SATURATION = 10.0       # Decayed unusual contracts at which a symbol counts as fully hot
+ACTIVITY_WEIGHT = 0.7            # Share of heat from activity, the rest from liquidity
+
+def load_holidays(path=HOLIDAYS_PATH):
+    """Load exchange holidays and early closes ({date: close time or None})"""
+    holidays = {}
+    try:
+        with open(path) as f:
+            for row in csv.DictReader(f):
+                close = row.get('close') or ''
+                holidays[date.fromisoformat(row['date'])] = clock.fromisoformat(close) if close else None
+    except FileNotFoundError:
+        print(f"Market holidays not found at {path}, treating every weekday as a trading day")
+    return holidays
+
+class MarketCalendar:
+    """US equity/options sessions from a local holiday table"""
+    def __init__(self, holidays=None):
+        self.holidays = holidays if holidays is not None else load_holidays()
+
+    def regular_hours(self, day):
+        """(open, close) datetimes of a day's regular session, None if the market is shut"""
+        if day.weekday() >= 5 or (day in self.holidays and self.holidays[day] is None):
+            return None
+        close = self.holidays.get(day) or REGULAR_CLOSE
+        return (datetime.combine(day, REGULAR_OPEN, MARKET_TZ), datetime.combine(day, close, MARKET_TZ))
+
+    def session(self, now=None):
+        """Session in progress at a unix timestamp"""
+        moment = datetime.fromtimestamp(now or time.time(), MARKET_TZ)
+        hours = self.regular_hours(moment.date())
+        if hours is None:
+            return SESSION_CLOSED
+        if hours[0] <= moment < hours[1]:
+            return SESSION_REGULAR
+        if datetime.combine(moment.date(), PRE_MARKET_OPEN, MARKET_TZ) <= moment < hours[0]:
+            return SESSION_PRE
+        if hours[1] <= moment < datetime.combine(moment.date(), POST_MARKET_CLOSE, MARKET_TZ):
+            return SESSION_POST
+        return SESSION_CLOSED
+
+    def last_close(self, now=None):
+        """Unix timestamp of the most recent regular-session close at or before now"""
+        moment = datetime.fromtimestamp(now or time.time(), MARKET_TZ)
+        day = moment.date()
+        for _ in range(15):
+            hours = self.regular_hours(day)
+            if hours is not None and hours[1] <= moment:
+                return hours[1].timestamp()
+            day -= timedelta(days=1)
+        return 0.0
+
+    def next_open(self, now=None):
+        """Unix timestamp of the next pre-market open after now, when quotes start moving again"""
+        moment = datetime.fromtimestamp(now or time.time(), MARKET_TZ)
+        day = moment.date()
+        for _ in range(15):
+            if self.regular_hours(day) is not None:
+                start = datetime.combine(day, PRE_MARKET_OPEN, MARKET_TZ)
+                if start > moment:
+                    return start.timestamp()
+            day += timedelta(days=1)
+        return (moment + timedelta(days=1)).timestamp()
+
+class ScanScheduler:
+    """Priority queue of symbols keyed by when each is next due for a scan"""
+    def __init__(self, symbols, calendar=None, request_budget=SCAN_REQUEST_BUDGET,
+                 min_interval=SCAN_MIN_INTERVAL, max_interval=SCAN_MAX_INTERVAL):
+        self.calendar = calendar or MarketCalendar()
+        self.request_budget = request_budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.state = {}
+        self.load_factor = 1.0
+        self._queue = []
+        self._seq = itertools.count()
+        # Liquidity ranking, re-sorted only after scores change
+        self._rank = {}
+        self._rank_dirty = True
+        # Symbols recorded since the last plan -> record time, rescheduled together by _plan()
+        self._recorded = {}
+        self._tokens = request_budget
+        self._tokens_at = time.time()
+        self._lock = threading.Lock()
+        self.set_symbols(symbols)
+
+    def set_symbols(self, symbols):
+        """Track the given universe; new symbols are due immediately, removed ones are dropped"""
+        with self._lock:
+            wanted = set(symbols)
+            for symbol in wanted - self.state.keys():
+                self.state[symbol] = {'activity': 0.0, 'activity_at': 0.0, 'liquidity': 0.0, 'fetched_at': 0.0}
+                self._schedule(symbol, 0.0)
+            for symbol in self.state.keys() - wanted:
+                del self.state[symbol]
+            self._rank_dirty = True
+
+    def _schedule(self, symbol, due):
+        # Superseded queue entries are skipped when popped, so rescheduling never scans twice
+        self.state[symbol]['due'] = due
+        heapq.heappush(self._queue, (due, next(self._seq), symbol))
+
+    def _pending(self, entry):
+        state = self.state.get(entry[2])
+        return state is not None and state['due'] == entry[0]
+
+    def expedite(self, symbols=None):
+        """Make symbols (default all) due now, e.g. on a manual refresh"""
+        with self._lock:
+            for symbol in self.state if symbols is None else symbols:
+                if symbol in self.state:
+                    self._recorded.pop(symbol, None)
+                    self._schedule(symbol, 0.0)
+
+    def _activity(self, state, now):
+        return state['activity'] * 0.5 ** ((now - state['activity_at']) / ACTIVITY_HALF_LIFE)
+
+    def _regular_interval(self, symbol, now, liquidity_rank):
+        state = self.state[symbol]
+        heat = (ACTIVITY_WEIGHT * min(1.0, self._activity(state, now) / ACTIVITY_SATURATION)
+                + (1 - ACTIVITY_WEIGHT) * liquidity_rank.get(symbol, 0.0))
+        # Geometric between the bounds: heat 1 -> min_interval, heat 0 -> max_interval
+        return self.max_interval * (self.min_interval / self.max_interval) ** heat
+
+    def _liquidity_rank(self):
+        if self._rank_dirty:
+            ordered = sorted(self.state, key=lambda s: self.state[s]['liquidity'])
+            self._rank = {symbol: i / max(1, len(ordered) - 1) for i, symbol in enumerate(ordered)}
+            self._rank_dirty = False
+        return self._rank
+
+    def interval(self, symbol, now=None):
+        """Seconds until a symbol should be scanned again"""
+        now = now or time.time()
+        session = self.calendar.session(now)
+        if session == SESSION_CLOSED:
+            return max(1.0, self.calendar.next_open(now) - now)
+        if session != SESSION_REGULAR:
+            return SCAN_EXTENDED_INTERVAL
+        return self._regular_interval(symbol, now, self._liquidity_rank()) * self.load_factor
+
+    def _update_load(self, now):
+        # Stretch every interval equally when the schedule would exceed the request budget
+        if self.calendar.session(now) != SESSION_REGULAR or not self.state:
+            self.load_factor = 1.0
+            return
+        rank = self._liquidity_rank()
+        demand = sum(REQUESTS_PER_SCAN * 60 / self._regular_interval(s, now, rank) for s in self.state)
+        self.load_factor = max(1.0, demand / self.request_budget)
+
+    def _plan(self):
+        # One ranking and load update for everything recorded since the last plan, rather than per record
+        if not self._recorded:
+            return
+        recorded, self._recorded = self._recorded, {}
+        self._update_load(max(recorded.values()))
+        for symbol, recorded_at in recorded.items():
+            if symbol in self.state:
+                self._schedule(symbol, recorded_at + self.interval(symbol, recorded_at))
+
+    def due(self, now=None, limit=None):
+        """Pop the symbols due for a scan, most overdue first, within the request budget"""
+        now = now or time.time()
+        with self._lock:
+            self._plan()
+            self._tokens = min(self.request_budget, self._tokens + max(0.0, now - self._tokens_at) * self.request_budget / 60)
+            self._tokens_at = now
+            closed = self.calendar.session(now) == SESSION_CLOSED
+            last_close = self.calendar.last_close(now) if closed else 0.0
+
+            symbols = []
+            while self._queue and self._queue[0][0] <= now and self._tokens >= REQUESTS_PER_SCAN:
+                if limit is not None and len(symbols) >= limit:
+                    break
+                entry = heapq.heappop(self._queue)
+                if not self._pending(entry):
+                    continue
+                symbol = entry[2]
+                if closed and self.state[symbol]['fetched_at'] >= last_close:
+                    # Already holding the last-close snapshot, nothing changes until the next session
+                    self._schedule(symbol, self.calendar.next_open(now))
+                    continue
+                self.state[symbol]['due'] = None
+                self._tokens -= REQUESTS_PER_SCAN
+                symbols.append(symbol)
+            return symbols
+
+    def record(self, symbol, unusual_count=0, liquidity=None, fetched=True, now=None):
+        """Fold a symbol's scan outcome into its scores; its next scan is scheduled when the next batch is planned"""
+        now = now or time.time()
+        with self._lock:
+            state = self.state.get(symbol)
+            if state is None:
+                return
+            state['activity'] = self._activity(state, now) + unusual_count
+            state['activity_at'] = now
+            if liquidity is not None and float(liquidity) != state['liquidity']:
+                state['liquidity'] = float(liquidity)
+                self._rank_dirty = True
+            if fetched:
+                state['fetched_at'] = now
+            self._recorded[symbol] = now
+
+    def next_due_in(self, now=None):
+        """Seconds until the next symbol is due, None when nothing is scheduled"""
+        now = now or time.time()
+        with self._lock:
+            self._plan()
+            while self._queue and not self._pending(self._queue[0]):
+                heapq.heappop(self._queue)
+            if not self._queue:
+                return None
+            return max(0.0, self._queue[0][0] - now)
+
+    def needs_refresh(self, fetched_at, interval, now=None):
+        """Whether data fetched at fetched_at is due for a refresh under the current session"""
+        now = now or time.time()
+        session = self.calendar.session(now)
+        if session == SESSION_CLOSED:
+            return fetched_at < self.calendar.last_close(now)
+        if session != SESSION_REGULAR:
+            interval = max(interval, SCAN_EXTENDED_INTERVAL)
+        return now - fetched_at >= interval
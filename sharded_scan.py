@@ -0,0 +1,146 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from dotenv import load_dotenv
+from data_sources import ReplaySource, YFinanceSource
+from flow_aggregation import FlowAggregator
+from greeks import GammaExposure
+from market_snapshot import MarketSnapshot
+from metrics import metrics, timed
+from rate_limit import (AdaptiveRateLimiter, RateLimitedSource, UPSTREAM_BURST, UPSTREAM_MAX_CONCURRENCY,
+                        UPSTREAM_MAX_RATE, UPSTREAM_RATE)
+from scan_results import concat_results, from_columns, to_columns
+from utils import SENTIMENT_SYMBOL, StockDataFetcher
+
+load_dotenv()
+
+# Sharded scan configuration - override in .env file
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "0")) or os.cpu_count()
+SCAN_SHARD_SIZE = int(os.getenv("SCAN_SHARD_SIZE", "25"))        # Symbols per task; bounds chains held by a worker
+WORKER_MAX_SHARDS = int(os.getenv("WORKER_MAX_SHARDS", "200"))   # Shards before a worker process is replaced
+SHARDS_IN_FLIGHT_PER_WORKER = 2                                  # Submitted-but-unread shards, bounds parent memory
+
+def load_universe(path):
+    """Symbols to scan, one per line (blank lines and # comments ignored)"""
+    with open(path) as f:
+        symbols = [line.split('#')[0].strip().upper() for line in f]
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
+
+def live_source(workers=1):
+    """Rate-limited Yahoo Finance source holding a 1/workers share of the upstream limits"""
+    limiter = AdaptiveRateLimiter(
+        rate=UPSTREAM_RATE / workers,
+        max_rate=UPSTREAM_MAX_RATE / workers,
+        burst=max(1, UPSTREAM_BURST // workers),
+        max_concurrency=max(1, UPSTREAM_MAX_CONCURRENCY // workers)
+    )
+    return RateLimitedSource(YFinanceSource(), limiter)
+
+def replay_source(snapshot_dir, latency=0.0):
+    """Snapshot replay without the parse cache, so a worker's memory doesn't grow with the universe"""
+    return ReplaySource(snapshot_dir, latency, cache=False)
+
+_worker_state = {}
+
+def _init_worker(source_factory):
+    _worker_state['fetcher'] = StockDataFetcher(source=source_factory())
+
+def scan_batch(fetcher, symbols):
+    """Fetch, detect and aggregate a batch of symbols, returning only compact per-symbol results"""
+    snapshot = fetcher.begin_cycle()
+    result = fetcher.scan_symbols(symbols)
+    chains = snapshot.chains
+    flow = FlowAggregator({}).update(chains)
+    gamma = GammaExposure()
+    gamma.update(chains, snapshot.prices)
+    return {
+        'symbols': symbols,
+        'columns': to_columns(result),
+        'coverage': snapshot.coverage,
+        'prices': snapshot.prices,
+        'liquidity': {symbol: snapshot.liquidity(symbol) for symbol in snapshot.data},
+        # Only the shard holding SPY computes sentiment, from the chain it already fetched
+        'sentiment': fetcher.get_market_sentiment(snapshot) if SENTIMENT_SYMBOL in symbols else None,
+        'flow': flow,
+        'gamma_totals': gamma.symbol_totals,
+        'strike_gamma': gamma.strike_gamma
+    }
+
+def scan_shard(symbols):
+    """Scan one shard inside a pool worker"""
+    fetcher = _worker_state['fetcher']
+    try:
+        return scan_batch(fetcher, symbols)
+    finally:
+        # Drop the shard's chains; a symbol can land on any worker next cycle, so stale
+        # fallback data isn't kept either
+        fetcher.reset()
+
+class ShardedScanner:
+    """Scans a large symbol universe across a process pool, fetching and detecting in the workers"""
+    def __init__(self, source_factory=None, workers=SCAN_WORKERS, shard_size=SCAN_SHARD_SIZE,
+                 max_shards_per_worker=WORKER_MAX_SHARDS):
+        self.workers = workers
+        self.source_factory = source_factory or partial(live_source, workers)
+        self.shard_size = shard_size
+        self.max_shards_per_worker = max_shards_per_worker
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # Recycling workers (spawned, as max_tasks_per_child requires) returns fragmented heap to the OS
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.source_factory,),
+                                             max_tasks_per_child=self.max_shards_per_worker)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def shards(self, symbols):
+        return [symbols[i:i + self.shard_size] for i in range(0, len(symbols), self.shard_size)]
+
+    def iter_shards(self, symbols):
+        """Yield each shard's results as workers finish, keeping a bounded number in flight"""
+        pool = self._executor()
+        pending = iter(self.shards(list(symbols)))
+        in_flight = set()
+        while True:
+            while len(in_flight) < self.workers * SHARDS_IN_FLIGHT_PER_WORKER:
+                shard = next(pending, None)
+                if shard is None:
+                    break
+                in_flight.add(pool.submit(scan_shard, shard))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                shard = future.result()
+                metrics.inc('scan_shards_total')
+                yield shard
+
+    def scan(self, symbols, flow_aggregator=None, gamma_exposure=None, snapshot=None):
+        """Scan every symbol into a cycle snapshot, merging aggregates as shards arrive; returns (snapshot, liquidity).
+        Chains stay in the workers; the snapshot holds results, coverage and sentiment."""
+        snapshot = snapshot or MarketSnapshot()
+        frames = []
+        liquidity = {}
+        with timed('sharded_scan'):
+            for shard in self.iter_shards(symbols):
+                frames.append(from_columns(shard['columns']))
+                snapshot.coverage['fresh'].extend(shard['coverage']['fresh'])
+                snapshot.coverage['stale'].update(shard['coverage']['stale'])
+                snapshot.coverage['skipped'].update(shard['coverage']['skipped'])
+                liquidity.update(shard['liquidity'])
+                if shard['sentiment'] is not None:
+                    snapshot.sentiment = shard['sentiment']
+                if flow_aggregator is not None:
+                    flow_aggregator.merge(shard['flow'])
+                if gamma_exposure is not None:
+                    gamma_exposure.merge(shard['gamma_totals'], shard['strike_gamma'])
+
+            results = concat_results(frames)
+            snapshot.activities = results.sort_values('premium', ascending=False, kind='stable', ignore_index=True)
+        return snapshot, liquidity
@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+from dotenv import load_dotenv
+from api_auth import API_TOKEN, can_read_user, check_exposure, token_scope
+from metrics import metrics
+from scanner import CACHE_SUMMARY
+from storage import open_database
+
+load_dotenv()
+
+# Streaming configuration - override in .env file
+STREAM_HOST = os.getenv("STREAM_HOST", "127.0.0.1")
+STREAM_PORT = int(os.getenv("STREAM_PORT", "8601"))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "1.0"))
+STREAM_GAP_SECONDS = float(os.getenv("STREAM_GAP_SECONDS", "30"))   # How long an alert id skipped by the poller is re-checked
+
+SUBSCRIBER_QUEUE_SIZE = 256     # Events buffered per client before it counts as slow
+SLOW_CONSUMER_TIMEOUT = 10.0    # Seconds a socket write may block before the client is dropped
+HEARTBEAT_SECONDS = 15.0
+REPLAY_LIMIT = 1000             # Alerts replayed on resume before switching to live events
+MAX_PENDING_IDS = 500           # Skipped alert ids re-checked at once
+
+class Subscriber:
+    def __init__(self, user_id, symbols, summaries):
+        self.user_id = user_id
+        self.symbols = symbols
+        self.summaries = summaries
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+        self.replayed = set()
+
+    def wants(self, alert):
+        return not self.symbols or alert['symbol'] in self.symbols
+
+    def offer(self, event, event_id=None):
+        """Queue an event without blocking the broadcaster, marking the client lagged if full"""
+        if self.lagged:
+            return
+        # Alerts can reach a resuming client from both the replay and the live poller
+        if event_id is not None and event_id in self.replayed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client resumes from its Last-Event-ID after reconnecting
+            self.lagged = True
+            self.queue = asyncio.Queue(maxsize=1)
+            self.queue.put_nowait(format_event('lagged', {'reason': 'client too slow'}))
+
+def format_event(event, data, event_id=None):
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+class AlertStream:
+    def __init__(self, db=None, token=API_TOKEN, poll_seconds=STREAM_POLL_SECONDS):
+        self.db = db or open_database()
+        self.token = token
+        self.poll_seconds = poll_seconds
+        self.subscribers = {}    # user_id -> set of Subscriber
+        self.last_alert_id = 0
+        self.pending_ids = {}    # alert id skipped by last_alert_id -> when it was skipped
+        self.last_summary_version = None
+
+    @property
+    def subscriber_count(self):
+        return sum(len(group) for group in self.subscribers.values())
+
+    async def poll(self):
+        """Single poller fanning new alerts and scan summaries out to subscribers"""
+        self.last_alert_id = await asyncio.to_thread(self.db.get_max_alert_id)
+        self.last_summary_version = await asyncio.to_thread(self.db.get_cache_version, CACHE_SUMMARY)
+
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.poll_once()
+            except Exception as e:
+                print(f"Error polling for stream events: {str(e)}")
+                metrics.record_error('stream_poll')
+
+    async def poll_once(self):
+        # On PostgreSQL ids are taken at insert, so a lower id can commit after a higher one
+        # the cursor already passed. Skipped ids are re-checked until they show up or expire
+        # (rolled back, or burned by a conflicting insert).
+        now = time.time()
+        for alert_id, skipped_at in list(self.pending_ids.items()):
+            if now - skipped_at > STREAM_GAP_SECONDS:
+                del self.pending_ids[alert_id]
+
+        alerts = await asyncio.to_thread(self.db.get_alerts_since, self.last_alert_id,
+                                         also_ids=sorted(self.pending_ids))
+        for alert in alerts:
+            if alert['id'] > self.last_alert_id:
+                skipped = range(max(self.last_alert_id + 1, alert['id'] - MAX_PENDING_IDS), alert['id'])
+                self.pending_ids.update(dict.fromkeys(skipped, now))
+                self.last_alert_id = alert['id']
+                if len(self.pending_ids) > MAX_PENDING_IDS:
+                    for alert_id in sorted(self.pending_ids)[:-MAX_PENDING_IDS]:
+                        del self.pending_ids[alert_id]
+            elif self.pending_ids.pop(alert['id'], None) is None:
+                continue
+            event = None
+            for subscriber in self.subscribers.get(alert['user_id'], ()):
+                if subscriber.wants(alert):
+                    event = event or format_event('alert', alert, alert['id'])
+                    subscriber.offer(event, alert['id'])
+
+        version = await asyncio.to_thread(self.db.get_cache_version, CACHE_SUMMARY)
+        if version is not None and version != self.last_summary_version:
+            self.last_summary_version = version
+            payload, _ = await asyncio.to_thread(self.db.get_cache, CACHE_SUMMARY)
+            event = format_event('scan_summary', json.loads(payload))
+            for group in self.subscribers.values():
+                for subscriber in group:
+                    if subscriber.summaries:
+                        subscriber.offer(event)
+
+        metrics.inc('stream_events_total', {'type': 'alert'}, len(alerts))
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP connection as an SSE stream"""
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            writer.close()
+            return
+
+        lines = request.decode(errors='replace').split('\r\n')
+        method, target = (lines[0].split(' ') + ['', ''])[:2]
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method != 'GET' or url.path != '/stream':
+            await self.respond(writer, '404 Not Found', {'error': 'not found'})
+            return
+        token = headers.get('authorization', '').removeprefix('Bearer ') or params.get('token', '')
+        scope = token_scope(token, self.token)
+        if scope is None:
+            await self.respond(writer, '401 Unauthorized', {'error': 'unauthorized'})
+            return
+
+        try:
+            user_id = int(params['user_id'])
+            last_event_id = int(headers.get('last-event-id') or params.get('last_event_id') or 0)
+        except (KeyError, ValueError):
+            await self.respond(writer, '400 Bad Request', {'error': 'user_id is required'})
+            return
+        if not can_read_user(scope, user_id):
+            await self.respond(writer, '403 Forbidden', {'error': 'forbidden'})
+            return
+
+        symbols = {s.strip().upper() for s in params.get('symbols', '').split(',') if s.strip()}
+        subscriber = Subscriber(user_id, symbols, params.get('summaries', '1') != '0')
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+            b"retry: 3000\n\n"
+        )
+
+        # Register before replaying so nothing published in between is missed
+        self.subscribers.setdefault(user_id, set()).add(subscriber)
+        metrics.inc('stream_connections_total')
+        try:
+            if last_event_id:
+                await self.replay(subscriber, last_event_id)
+            await self.pump(subscriber, writer)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            group = self.subscribers.get(user_id)
+            if group is not None:
+                group.discard(subscriber)
+                if not group:
+                    del self.subscribers[user_id]
+            writer.close()
+
+    async def replay(self, subscriber, last_event_id):
+        """Resend alerts the client missed while disconnected"""
+        missed = await asyncio.to_thread(self.db.get_alerts_since, last_event_id, subscriber.user_id, REPLAY_LIMIT)
+
+        # Replayed alerts go ahead of live events queued during the query; offer()
+        # drops live alerts the replay already covered
+        live = []
+        while not subscriber.queue.empty():
+            live.append(subscriber.queue.get_nowait())
+        subscriber.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE + len(missed))
+
+        for alert in missed:
+            if subscriber.wants(alert):
+                subscriber.offer(format_event('alert', alert, alert['id']), alert['id'])
+        subscriber.replayed = {alert['id'] for alert in missed}
+        for event in live:
+            event_id = int(event[4:event.index(b'\n')]) if event.startswith(b'id: ') else None
+            subscriber.offer(event, event_id)
+
+    async def pump(self, subscriber, writer):
+        """Write queued events to the socket, with heartbeats while idle"""
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                event = b": ping\n\n"
+
+            writer.write(event)
+            await asyncio.wait_for(writer.drain(), timeout=SLOW_CONSUMER_TIMEOUT)
+            if subscriber.lagged and subscriber.queue.empty():
+                metrics.inc('stream_slow_consumers_total')
+                return
+
+    async def respond(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=STREAM_HOST, port=STREAM_PORT, ready=None):
+        check_exposure(host, self.token)
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        poller = asyncio.create_task(self.poll())
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            poller.cancel()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream new alerts and scan summaries as Server-Sent Events")
+    parser.add_argument('--host', default=STREAM_HOST)
+    parser.add_argument('--port', type=int, default=STREAM_PORT)
+    args = parser.parse_args(argv)
+
+    stream = AlertStream()
+    try:
+        check_exposure(args.host, stream.token)
+    except ValueError as e:
+        print(f"Error starting stream: {str(e)}")
+        return 1
+
+    print(f"Streaming on http://{args.host}:{args.port}/stream?user_id=<id>")
+    try:
+        asyncio.run(stream.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
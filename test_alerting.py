@@ -0,0 +1,50 @@
+import time
+import pandas as pd
+from alerting import AlertManager
+from scan_results import make_scan_result, to_records
+
+def make_activity(strike, last_price, current_price):
+    return make_scan_result(pd.DataFrame({
+        'symbol': ['AAPL'],
+        'contract_symbol': ['AAPL261120C00143900'],
+        'option_type': ['CALL'],
+        'strike': [strike],
+        'volume': [12000],
+        'open_interest': [800],
+        'volume_ratio': [15.0],
+        'last_price': [last_price],
+        'premium': [12000 * last_price * 100],
+        'current_price': [current_price]
+    }))
+
+def test_records_keep_prices_exact():
+    record = to_records(make_activity(143.9, 2.15, 141.37))[0]
+    assert record['strike'] == 143.9
+    assert record['last_price'] == 2.15
+    assert record['current_price'] == 141.37
+
+def test_alert_message_prints_strike_as_scanned(db):
+    manager = AlertManager(db, email_manager=None)
+    db.create_user('trader', 'secret123', 'trader@example.com')
+    user_id = db.verify_user('trader', 'secret123')[1]
+
+    alerted = manager.process_activities(user_id, None, make_activity(143.9, 2.15, 141.37))
+
+    assert len(alerted) == 1
+    message = db.get_user_alerts(user_id)['message'].iloc[0]
+    assert message == "AAPL: 12,000 CALLs @ $143.9 - $2.6M premium"
+
+def test_managers_sharing_a_database_alert_a_contract_once(db, monkeypatch):
+    # Both claims carry the same timestamp, as on a coarse clock
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now)
+    first = AlertManager(db, email_manager=None)
+    second = AlertManager(db, email_manager=None)
+    db.create_user('trader', 'secret123', 'trader@example.com')
+    user_id = db.verify_user('trader', 'secret123')[1]
+
+    alerted = (first.process_activities(user_id, None, make_activity(143.9, 2.15, 141.37)) +
+               second.process_activities(user_id, None, make_activity(143.9, 2.15, 141.37)))
+
+    assert len(alerted) == 1
+    assert len(db.get_user_alerts(user_id)) == 1
@@ -0,0 +1,81 @@
+import http.client
+import json
+import threading
+import pytest
+from api_auth import user_token
+from api_server import create_server
+from scanner import CACHE_UNUSUAL
+
+TOKEN = 'service-secret'
+
+@pytest.fixture
+def api(db):
+    server = create_server(db, host='127.0.0.1', port=0, token=TOKEN)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path, token=TOKEN, etag=None):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    if etag:
+        headers['If-None-Match'] = etag
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response.status, response.getheader('ETag'), json.loads(body) if body else None
+
+def make_user(db, username):
+    db.create_user(username, 'secret123', f'{username}@example.com')
+    return db.verify_user(username, 'secret123')[1]
+
+def test_tokens_are_scoped_to_their_user(api, db):
+    alice, bob = make_user(db, 'alice'), make_user(db, 'bob')
+
+    assert get(api, f'/api/users/{alice}/alerts', token=None)[0] == 401
+    assert get(api, f'/api/users/{alice}/alerts', token='not-a-token')[0] == 401
+    # Signed with a different secret
+    assert get(api, f'/api/users/{alice}/alerts', token=user_token(alice, 'other-secret'))[0] == 401
+    assert get(api, f'/api/users/{alice}/alerts', token=user_token(alice, TOKEN))[0] == 200
+    assert get(api, f'/api/users/{bob}/alerts', token=user_token(alice, TOKEN))[0] == 403
+    assert get(api, f'/api/users/{bob}/performance', token=user_token(alice, TOKEN))[0] == 403
+    assert get(api, f'/api/users/{bob}/alerts')[0] == 200
+
+def test_alert_history_etag_tracks_new_alerts_and_returns(api, db):
+    user_id = make_user(db, 'alice')
+    alert_id = db.save_alert(user_id, 'AAPL', 'unusual_volume', 'first', {}, 100.0)
+    path = f'/api/users/{user_id}/alerts'
+
+    status, etag, body = get(api, path)
+    assert status == 200 and body['total'] == 1
+    assert get(api, path, etag=etag)[:2] == (304, etag)
+
+    db.update_alert_performance(alert_id, 'price_1h', 103.0, 'return_1h', 0.03)
+    status, filled_etag, body = get(api, path, etag=etag)
+    assert status == 200 and body['data'][0]['return_1h'] == 0.03
+
+    db.save_alert(user_id, 'MSFT', 'unusual_volume', 'second', {}, 300.0)
+    status, _, body = get(api, path, etag=filled_etag)
+    assert status == 200 and body['total'] == 2
+
+def test_unusual_limit_is_validated(api, db):
+    db.set_cache(CACHE_UNUSUAL, [{'symbol': s, 'option_type': 'CALL', 'premium': 1.0} for s in ('AAPL', 'MSFT', 'NVDA')])
+
+    assert get(api, '/api/unusual')[2]['count'] == 3
+    assert get(api, '/api/unusual?limit=2')[2]['count'] == 2
+    assert get(api, '/api/unusual?limit=0')[2]['count'] == 0
+    for limit in ('-1', 'abc', '1001'):
+        status, _, body = get(api, f'/api/unusual?limit={limit}')
+        assert status == 400 and 'limit' in body['error']
+
+def test_unusual_etag_follows_the_published_cycle(api, db):
+    db.set_cache(CACHE_UNUSUAL, [{'symbol': 'AAPL', 'option_type': 'CALL', 'premium': 1.0}])
+    status, etag, _ = get(api, '/api/unusual')
+    assert status == 200
+    assert get(api, '/api/unusual', etag=etag)[0] == 304
+
+    db.set_cache(CACHE_UNUSUAL, [{'symbol': 'MSFT', 'option_type': 'PUT', 'premium': 2.0}])
+    status, _, body = get(api, '/api/unusual', etag=etag)
+    assert status == 200 and body['data'][0]['symbol'] == 'MSFT'
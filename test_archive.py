@@ -0,0 +1,69 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+import archive as archive_module
+from archive import AlertArchive
+
+def make_user(db, username='trader'):
+    db.create_user(username, 'secret123', f'{username}@example.com')
+    return db.verify_user(username, 'secret123')[1]
+
+def add_alerts(db, user_id, ages_in_days):
+    """One alert per age, oldest first, with a 1-week return on every other one"""
+    now = datetime.utcnow()
+    db.bulk_insert_alerts([
+        (user_id, (now - timedelta(days=age)).strftime('%Y-%m-%d %H:%M:%S'), 'AAPL', 'unusual_volume',
+         f'alert {i}', json.dumps({'strike': 150.0}), False, 100.0 + i, None, None,
+         0.03 if i % 2 else None, int(i % 2) if i % 2 else None)
+        for i, age in enumerate(sorted(ages_in_days, reverse=True))
+    ])
+
+def history_ids(archive, user_id, per_page=7):
+    """Every alert id of a user, newest first, paging like the API"""
+    ids = []
+    for offset in range(0, archive.count_user_alerts(user_id), per_page):
+        ids.extend(archive.get_user_alerts(user_id, limit=per_page, offset=offset)['id'].tolist())
+    return ids
+
+@pytest.fixture
+def archive(db, tmp_path):
+    return AlertArchive(db, archive_dir=str(tmp_path / 'archive'), retention_days=30)
+
+def test_archived_history_reads_like_the_live_table(db, archive):
+    user_id = make_user(db)
+    # Two months of old alerts and a few inside the retention window
+    add_alerts(db, user_id, list(range(40, 100, 3)) + [1, 2, 3])
+    before_ids = history_ids(archive, user_id)
+    before_stats = archive.get_performance_stats(user_id)
+
+    assert archive.archive() == len(before_ids) - 3
+
+    assert db.count_user_alerts(user_id) == 3
+    assert history_ids(archive, user_id) == before_ids
+    assert archive.get_performance_stats(user_id) == pytest.approx(before_stats)
+
+def test_crash_before_the_delete_commits_shows_each_alert_once(db, archive, monkeypatch):
+    user_id = make_user(db)
+    # One month's partition, archived five alerts per batch
+    add_alerts(db, user_id, [40 + i / 1440 for i in range(20)])
+    monkeypatch.setattr(archive_module, 'ARCHIVE_BATCH_SIZE', 5)
+    before_ids = history_ids(archive, user_id)
+
+    archive_alerts = db.archive_alerts
+    batches = []
+    def crash_on_second_batch(*args):
+        batches.append(args)
+        if len(batches) == 2:
+            raise RuntimeError("killed before commit")
+        return archive_alerts(*args)
+    monkeypatch.setattr(db, 'archive_alerts', crash_on_second_batch)
+    with pytest.raises(RuntimeError):
+        archive.archive()
+
+    # The second segment is on disk but its rows are still live
+    assert db.count_user_alerts(user_id) == 15
+    assert history_ids(archive, user_id) == before_ids
+
+    monkeypatch.setattr(db, 'archive_alerts', archive_alerts)
+    assert archive.archive() == 15
+    assert history_ids(archive, user_id) == before_ids
@@ -0,0 +1,81 @@
+import multiprocessing
+import time
+from benchmarks import SyntheticSource
+from distributed_scan import DistributedScanWorker
+from scanner import ScanService
+from sharded_scan import scan_batch
+from storage import open_database
+from utils import StockDataFetcher
+
+UNIVERSE = ['AAA', 'BBB', 'CCC', 'DDD']
+# A lease as long as the cycle: the dead worker's batch only frees up after the cycle's slot ends
+LEASE_SECONDS = 1.0
+CYCLE_SECONDS = 1.0
+
+class HangingSource(SyntheticSource):
+    """Signals once a batch is being scanned, then never returns"""
+    def __init__(self, scanning):
+        super().__init__(200)
+        self.scanning = scanning
+
+    def get_option_chain(self, symbol, expiry):
+        self.scanning.set()
+        time.sleep(600)
+
+class OutageSource(SyntheticSource):
+    """Serves chains until the upstream goes down"""
+    def __init__(self):
+        super().__init__(200)
+        self.down = False
+
+    def get_info(self, symbol):
+        if self.down:
+            raise ConnectionError("upstream down")
+        return super().get_info(symbol)
+
+def make_worker(database_url, source, node_id):
+    service = ScanService(StockDataFetcher(source=source), open_database(url=database_url))
+    return DistributedScanWorker(service, UNIVERSE, batch_size=2, lease_seconds=LEASE_SECONDS,
+                                 cycle_seconds=CYCLE_SECONDS, node_id=node_id)
+
+def run_doomed_worker(database_url, cycle_id, scanning):
+    make_worker(database_url, HangingSource(scanning), 'doomed').run_cycle(cycle_id)
+
+def test_cycle_is_published_after_a_worker_dies_mid_batch(database_url):
+    survivor = make_worker(database_url, SyntheticSource(200), 'survivor')
+    cycle_id = survivor.cycle_id()
+
+    context = multiprocessing.get_context('spawn')
+    scanning = context.Event()
+    doomed = context.Process(target=run_doomed_worker, args=(database_url, cycle_id, scanning))
+    doomed.start()
+    try:
+        assert scanning.wait(60), "doomed worker never started scanning"
+        doomed.kill()
+    finally:
+        doomed.join()
+
+    summary = survivor.run_cycle(cycle_id)
+
+    assert summary is not None
+    assert summary['symbols_scanned'] == len(UNIVERSE)
+    assert sorted(summary['coverage']['fresh']) == UNIVERSE
+    conn = survivor.db._connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT batch, status, owner, attempts FROM scan_leases WHERE cycle_id = ? ORDER BY batch',
+                   (cycle_id,))
+    rows = [tuple(row) for row in cursor.fetchall()]
+    conn.close()
+    # The doomed worker's batch was reclaimed and finished by the survivor
+    assert rows == [(0, 'done', 'survivor', 2), (1, 'done', 'survivor', 1)]
+
+def test_batches_on_a_service_fetcher_keep_its_stale_fallback():
+    source = OutageSource()
+    fetcher = StockDataFetcher(source=source)
+    assert scan_batch(fetcher, ['AAA'])['coverage']['fresh'] == ['AAA']
+
+    source.down = True
+    coverage = scan_batch(fetcher, ['AAA'])['coverage']
+
+    assert 'AAA' in coverage['stale']
+    assert coverage['skipped'] == {}
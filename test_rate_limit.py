@@ -0,0 +1,101 @@
+import pytest
+import rate_limit
+from rate_limit import (BACKOFF_BASE_SECONDS, MIN_RATE, RATE_INCREASE, AdaptiveRateLimiter, RateLimitedSource,
+                        RetryBudgetExceeded, TokenBucket, is_throttle_error, is_transient_error)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FlakySource:
+    """Raises the queued errors in order, then returns the symbol"""
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def get_info(self, symbol):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'symbol': symbol}
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+def test_bucket_spends_the_burst_then_paces_at_the_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert clock.now == pytest.approx(1001.0)
+
+def test_rate_increases_additively_and_halves_on_throttle(clock):
+    limiter = AdaptiveRateLimiter(rate=4, max_rate=5, burst=8, max_concurrency=2)
+
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(4 + 5 * RATE_INCREASE)
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.rate == 5
+
+    backoff = limiter.on_throttle(attempt=2)
+    assert limiter.rate == 2.5
+    assert limiter.bucket.tokens == 0
+    assert BACKOFF_BASE_SECONDS * 4 * 0.5 <= backoff <= BACKOFF_BASE_SECONDS * 4
+    assert limiter.paused_until == pytest.approx(clock.now + backoff)
+
+    for _ in range(10):
+        limiter.on_throttle(attempt=0)
+    assert limiter.rate == MIN_RATE
+    assert limiter.throttles == 11
+
+def test_throttled_calls_pause_then_retry_at_the_lower_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=4, max_rate=10, burst=8, max_concurrency=2)
+    source = RateLimitedSource(FlakySource(Exception('429 Too Many Requests')), limiter, retries=3)
+
+    assert source.get_info('AAPL') == {'symbol': 'AAPL'}
+    assert limiter.rate == pytest.approx(2 + RATE_INCREASE)
+    # The retry waited out the backoff pause
+    assert clock.now >= limiter.paused_until
+    assert source.retries_used == {'AAPL': 1}
+
+def test_retry_budget_is_per_symbol_per_cycle(clock):
+    limiter = AdaptiveRateLimiter(rate=4, max_rate=10, burst=8, max_concurrency=2)
+    flaky = FlakySource(*[ConnectionError('reset')] * 3)
+    source = RateLimitedSource(flaky, limiter, retries=2)
+
+    with pytest.raises(RetryBudgetExceeded):
+        source.get_info('AAPL')
+    assert flaky.calls == 3
+    # Network errors back off the caller without slowing everyone down
+    assert limiter.throttles == 0
+
+    source.start_cycle()
+    assert source.get_info('AAPL') == {'symbol': 'AAPL'}
+
+def test_other_errors_are_not_retried(clock):
+    flaky = FlakySource(KeyError('regularMarketPrice'))
+    source = RateLimitedSource(flaky, AdaptiveRateLimiter(), retries=3)
+
+    with pytest.raises(KeyError):
+        source.get_info('AAPL')
+    assert flaky.calls == 1
+
+def test_error_classification():
+    assert is_throttle_error(Exception('Too Many Requests. Rate limited. Try after a while.'))
+    assert is_throttle_error(type('YFRateLimitError', (Exception,), {})())
+    assert not is_throttle_error(ValueError('no options'))
+    assert is_transient_error(TimeoutError())
+    assert is_transient_error(type('ReadTimeout', (Exception,), {})())
+    assert not is_transient_error(KeyError('strike'))
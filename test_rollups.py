@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+import pandas as pd
+import pytest
+from benchmarks import SyntheticSource
+from flow_aggregation import FlowAggregator
+from rollups import FlowRollup
+from scanner import ScanService
+from utils import StockDataFetcher
+
+NOW = 1_790_000_000
+
+def make_chain(calls, puts):
+    """(volume, last price) rows per side"""
+    return SimpleNamespace(calls=pd.DataFrame(calls, columns=['volume', 'lastPrice']),
+                           puts=pd.DataFrame(puts, columns=['volume', 'lastPrice']))
+
+def record(db, chains, now=NOW):
+    aggregator = FlowAggregator(sector_map={})
+    aggregator.update(chains)
+    rollup = FlowRollup(db, bucket_minutes=60, lookback_hours=3)
+    rollup.record(aggregator.symbol_flow, now)
+    return rollup
+
+def test_cells_total_calls_and_puts(db):
+    rollup = record(db, {'AAPL': make_chain([(100, 2.0), (50, 1.0)], [(10, 3.0)]),
+                         'MSFT': make_chain([], [(20, 0.5)])})
+
+    premium = rollup.get_heatmap(['AAPL', 'MSFT'], 'premium', now=NOW)
+    volume = rollup.get_heatmap(['AAPL', 'MSFT'], 'volume', now=NOW)
+    call_share = rollup.get_heatmap(['AAPL', 'MSFT'], 'call_share', now=NOW)
+
+    assert len(premium.columns) == 3
+    assert premium.iloc[:, -1].tolist() == [28000.0, 1000.0]
+    assert volume.iloc[:, -1].tolist() == [160, 20]
+    assert call_share.iloc[:, -1].tolist() == [pytest.approx(25000 / 28000 * 100), 0.0]
+    # Buckets without a scan are zero flow, but have no call share
+    assert (premium.iloc[:, :-1] == 0).all().all()
+    assert call_share.iloc[:, :-1].isna().all().all()
+
+def test_rescan_in_the_same_bucket_replaces_the_cell(db):
+    record(db, {'AAPL': make_chain([(100, 2.0)], [])})
+    # Session volume only grows, so adding the rescan would double count
+    rollup = record(db, {'AAPL': make_chain([(150, 2.0)], [])}, NOW + 60)
+
+    assert rollup.get_heatmap(['AAPL'], 'volume', now=NOW).iloc[0, -1] == 150
+
+def test_published_rollups_cover_whole_chains(db):
+    service = ScanService(StockDataFetcher(source=SyntheticSource(200)), db)
+    summary = service.run_cycle()
+
+    cells = service.flow_rollup.get_heatmap(None, 'premium', now=summary['timestamp']).iloc[:, -1]
+    flow = service.flow_aggregator.by_symbol()['total_premium']
+    unusual = service.activities.groupby('symbol', observed=True)['premium'].sum()
+
+    assert sorted(cells.index) == sorted(service.data_fetcher.watchlist)
+    assert cells.to_dict() == pytest.approx(flow.to_dict())
+    # The top unusual contracts are only part of a symbol's flow
+    assert (cells[unusual.index] > unusual).all()
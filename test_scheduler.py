@@ -0,0 +1,90 @@
+from datetime import date, datetime
+from datetime import time as clock
+import pytest
+from market_hours import MARKET_TZ
+from scheduler import SESSION_CLOSED, SESSION_POST, SESSION_PRE, SESSION_REGULAR, MarketCalendar, ScanScheduler
+
+THANKSGIVING = date(2026, 11, 26)
+EARLY_CLOSE = date(2026, 11, 27)
+
+def at(day, hour, minute=0):
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=MARKET_TZ).timestamp()
+
+@pytest.fixture
+def calendar():
+    return MarketCalendar(holidays={THANKSGIVING: None, EARLY_CLOSE: clock(13, 0)})
+
+def test_sessions_follow_the_exchange_clock(calendar):
+    day = date(2026, 11, 24)
+    assert calendar.session(at(day, 3, 59)) == SESSION_CLOSED
+    assert calendar.session(at(day, 4)) == SESSION_PRE
+    assert calendar.session(at(day, 9, 30)) == SESSION_REGULAR
+    assert calendar.session(at(day, 16)) == SESSION_POST
+    assert calendar.session(at(day, 20)) == SESSION_CLOSED
+    assert calendar.session(at(date(2026, 11, 28), 12)) == SESSION_CLOSED
+
+def test_holidays_and_early_closes(calendar):
+    assert calendar.regular_hours(THANKSGIVING) is None
+    assert calendar.session(at(THANKSGIVING, 12)) == SESSION_CLOSED
+    assert calendar.last_close(at(THANKSGIVING, 12)) == at(date(2026, 11, 25), 16)
+    assert calendar.next_open(at(THANKSGIVING, 12)) == at(EARLY_CLOSE, 4)
+
+    assert calendar.session(at(EARLY_CLOSE, 12, 59)) == SESSION_REGULAR
+    assert calendar.session(at(EARLY_CLOSE, 13)) == SESSION_POST
+    # Over the weekend the last close is the early one, and the next open is Monday's pre-market
+    saturday = at(date(2026, 11, 28), 12)
+    assert calendar.last_close(saturday) == at(EARLY_CLOSE, 13)
+    assert calendar.next_open(saturday) == at(date(2026, 11, 30), 4)
+
+def test_new_symbols_are_due_immediately_then_rescheduled_by_heat(calendar):
+    now = at(date(2026, 11, 24), 10)
+    scheduler = ScanScheduler(['AAA', 'BBB'], calendar, request_budget=240, min_interval=5, max_interval=300)
+
+    assert sorted(scheduler.due(now)) == ['AAA', 'BBB']
+    assert scheduler.due(now) == []
+
+    scheduler.record('AAA', unusual_count=10, liquidity=100, now=now)
+    scheduler.record('BBB', unusual_count=0, liquidity=1, now=now)
+
+    # Hot and liquid AAA comes back at the minimum interval, quiet BBB at the maximum
+    assert scheduler.next_due_in(now) == pytest.approx(5)
+    assert scheduler.due(now + 5) == ['AAA']
+    assert scheduler.next_due_in(now + 5) == pytest.approx(295)
+    assert scheduler.due(now + 300) == ['BBB']
+
+def test_due_stays_within_the_request_budget(calendar):
+    now = at(date(2026, 11, 24), 10)
+    # Six requests a minute is two scans up front, then one every thirty seconds
+    scheduler = ScanScheduler(['AAA', 'BBB', 'CCC'], calendar, request_budget=6)
+
+    first = scheduler.due(now)
+    assert len(first) == 2
+    assert scheduler.due(now) == []
+    assert scheduler.due(now + 30) == sorted({'AAA', 'BBB', 'CCC'} - set(first))
+
+def test_expedite_and_removed_symbols(calendar):
+    now = at(date(2026, 11, 24), 10)
+    scheduler = ScanScheduler(['AAA', 'BBB'], calendar)
+    scheduler.due(now)
+    scheduler.record('AAA', now=now)
+    scheduler.record('BBB', now=now)
+
+    scheduler.expedite(['BBB'])
+    assert scheduler.due(now + 1) == ['BBB']
+
+    scheduler.expedite()
+    scheduler.set_symbols(['BBB'])
+    assert scheduler.due(now + 2) == ['BBB']
+    assert 'AAA' not in scheduler.state
+
+def test_closed_market_scans_once_then_waits_for_the_open(calendar):
+    saturday = at(date(2026, 11, 28), 12)
+    scheduler = ScanScheduler(['AAA'], calendar)
+
+    assert scheduler.due(saturday) == ['AAA']
+    scheduler.record('AAA', now=saturday)
+
+    assert scheduler.due(saturday + 3600) == []
+    assert scheduler.next_due_in(saturday) == pytest.approx(at(date(2026, 11, 30), 4) - saturday)
+    assert not scheduler.needs_refresh(saturday, 60, now=saturday + 3600)
+    assert scheduler.needs_refresh(at(EARLY_CLOSE, 12), 60, now=saturday)
@@ -0,0 +1,87 @@
+import asyncio
+import stream_server
+from stream_server import AlertStream, Subscriber, format_event
+
+class LateCommitDatabase:
+    """Hides alerts as if their inserts hadn't committed yet"""
+    def __init__(self, db):
+        self.db = db
+        self.uncommitted = set()
+
+    def get_alerts_since(self, *args, **kwargs):
+        return [alert for alert in self.db.get_alerts_since(*args, **kwargs) if alert['id'] not in self.uncommitted]
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+def make_user(db, username='trader'):
+    db.create_user(username, 'secret123', f'{username}@example.com')
+    return db.verify_user(username, 'secret123')[1]
+
+def save_alerts(db, user_id, count):
+    return [db.save_alert(user_id, 'AAPL', 'unusual_volume', f'alert {i}', {}, 100.0) for i in range(count)]
+
+def drain(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        events.append(subscriber.queue.get_nowait())
+    return [int(event[4:event.index(b'\n')]) for event in events if event.startswith(b'id: ')]
+
+def subscribe(stream, user_id):
+    subscriber = Subscriber(user_id, set(), summaries=False)
+    stream.subscribers.setdefault(user_id, set()).add(subscriber)
+    return subscriber
+
+def test_poller_delivers_alerts_committed_out_of_id_order(db):
+    user_id = make_user(db)
+    late_db = LateCommitDatabase(db)
+    stream = AlertStream(late_db, token='')
+    subscriber = subscribe(stream, user_id)
+    ids = save_alerts(db, user_id, 3)
+
+    late_db.uncommitted.add(ids[1])
+    asyncio.run(stream.poll_once())
+    assert drain(subscriber) == [ids[0], ids[2]]
+
+    late_db.uncommitted.clear()
+    asyncio.run(stream.poll_once())
+    asyncio.run(stream.poll_once())
+    assert drain(subscriber) == [ids[1]]
+    assert stream.pending_ids == {}
+
+def test_resume_replays_missed_alerts_once(db):
+    user_id = make_user(db)
+    ids = save_alerts(db, user_id, 3)
+    stream = AlertStream(db, token='')
+    stream.last_alert_id = ids[0]
+    subscriber = subscribe(stream, user_id)
+    # A live event that reached the queue while the replay query ran
+    subscriber.offer(format_event('alert', {'id': ids[2]}, ids[2]), ids[2])
+
+    asyncio.run(stream.replay(subscriber, ids[0]))
+    asyncio.run(stream.poll_once())
+
+    assert drain(subscriber) == ids[1:]
+
+def test_lagged_client_resumes_from_its_last_id(db, monkeypatch):
+    monkeypatch.setattr(stream_server, 'SUBSCRIBER_QUEUE_SIZE', 2)
+    user_id = make_user(db)
+    stream = AlertStream(db, token='')
+    slow = subscribe(stream, user_id)
+    received = save_alerts(db, user_id, 1)
+    asyncio.run(stream.poll_once())
+    assert drain(slow) == received
+
+    missed = save_alerts(db, user_id, 4)
+    asyncio.run(stream.poll_once())
+
+    assert slow.lagged
+    assert slow.queue.get_nowait().startswith(b'event: lagged')
+    assert slow.queue.empty()
+
+    # The client reconnects with the id of the last alert it got
+    stream.subscribers[user_id].discard(slow)
+    resumed = subscribe(stream, user_id)
+    asyncio.run(stream.replay(resumed, received[-1]))
+    assert drain(resumed) == missed
+    assert not resumed.lagged
@@ -1,21 +1,86 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from metrics import metrics, timed
+from profiling import profiler
+from data_sources import YFinanceSource
+from rate_limit import RateLimitedSource, UPSTREAM_MAX_CONCURRENCY
+from greeks import black_scholes_greeks, years_to_expiry, CONTRACT_MULTIPLIER
+from market_snapshot import MarketSnapshot
+from scan_results import concat_results, empty_scan_result, make_scan_result
+
+# Detection thresholds
+VOLUME_RATIO_THRESHOLD = 0.5    # Minimum volume / open interest ratio
+VOLUME_THRESHOLD = 1000         # ...or minimum contracts traded
+PREMIUM_THRESHOLD = 50000       # Minimum premium spent ($)
+
+# Reuse a symbol's last good data for this long when a fetch fails
+STALE_DATA_MAX_AGE = int(os.getenv("STALE_DATA_MAX_AGE", "900"))
+
+# Symbols scanned at once; fetches wait on the upstream limiter, detection overlaps them
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", str(UPSTREAM_MAX_CONCURRENCY)))
+
+# Market sentiment comes from this symbol's front-month put/call volume
+SENTIMENT_SYMBOL = 'SPY'
+
+def volume_oi_ratio(volume, open_interest):
+    """Volume to open interest ratio, raw volume when there is no open interest"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(open_interest > 0, volume / open_interest, volume)
+
+def unusual_volume_mask(volume, vol_oi_ratio, premium_spent, volume_ratio_threshold=VOLUME_RATIO_THRESHOLD,
+                        volume_threshold=VOLUME_THRESHOLD, premium_threshold=PREMIUM_THRESHOLD):
+    """Unusual if volume is high relative to open interest, with significant premium"""
+    return (
+        ~np.isnan(volume) & (volume != 0)
+        & ((vol_oi_ratio > volume_ratio_threshold) | (volume > volume_threshold))
+        & (premium_spent > premium_threshold)
+    )
 
 class StockDataFetcher:
-    def __init__(self):
+    def __init__(self, source=None):
+        # Market data provider, rate-limited Yahoo Finance unless a replay/synthetic source is given
+        self.source = source or RateLimitedSource(YFinanceSource())
+        
         # Popular stocks to monitor
         self.watchlist = ['AAPL', 'TSLA', 'MSFT', 'NVDA', 'GOOGL', 'META', 'AMZN', 'SPY', 'QQQ', 'AMD']
         
+        # Everything fetched and detected in the current scan cycle
+        self.snapshot = MarketSnapshot()
+        
+        # Last good data per symbol, for when a fetch fails
+        self._last_good = {}
+        self.fetch_errors = {}
+    
+    @property
+    def coverage(self):
+        """Which symbols the current cycle got fresh, stale or not at all"""
+        return self.snapshot.coverage
+    
+    def begin_cycle(self, carry=(), timestamp=None):
+        """Start a new cycle snapshot, keeping the previous cycle's data and results for the symbols in carry"""
+        previous = self.snapshot
+        self.snapshot = MarketSnapshot(timestamp).carry_over(previous, carry)
+        if hasattr(self.source, 'start_cycle'):
+            self.source.start_cycle()
+        return self.snapshot
+    
+    def reset(self):
+        """Drop the current cycle's data and the last good data kept for stale fallback"""
+        self.snapshot = MarketSnapshot()
+        self._last_good.clear()
+        self.fetch_errors.clear()
+    
     def get_stock_data(self, symbol):
         """Get current stock data and options chain"""
         try:
-            ticker = yf.Ticker(symbol)
-            
             # Get current price
-            info = ticker.info
+            with timed('fetch_info'):
+                info = self.source.get_info(symbol)
             current_price = info.get('currentPrice', 0)
             
             # If currentPrice not available, try regularMarketPrice
@@ -23,12 +88,14 @@ class StockDataFetcher:
                 current_price = info.get('regularMarketPrice', 0)
             
             # Get options chain
-            options_dates = ticker.options
+            with timed('fetch_options'):
+                options_dates = self.source.get_options(symbol)
             
             if len(options_dates) > 0:
                 # Get the nearest expiration date
                 nearest_expiry = options_dates[0]
-                options_chain = ticker.option_chain(nearest_expiry)
+                with timed('fetch_chain'):
+                    options_chain = self.source.get_option_chain(symbol, nearest_expiry)
                 
                 return {
                     'symbol': symbol,
@@ -39,109 +106,153 @@ class StockDataFetcher:
                     'info': info
                 }
             else:
+                self.fetch_errors[symbol] = 'no options listed'
                 return None
                 
         except Exception as e:
             print(f"Error fetching data for {symbol}: {str(e)}")
+            self.fetch_errors[symbol] = str(e)
             return None
     
+    def _get_scan_data(self, symbol):
+        """Fresh data for a symbol, else its last good data while recent enough, recording which"""
+        data = self.snapshot.fetch(symbol, self.get_stock_data)
+        if data and 'options_chain' in data:
+            self._last_good[symbol] = (self.snapshot.fetched_at[symbol], data)
+            self.coverage['fresh'].append(symbol)
+            metrics.inc('scan_symbols_total', {'status': 'fresh'})
+            return data
+        
+        fetched_at, last_data = self._last_good.get(symbol, (0, None))
+        age = time.time() - fetched_at
+        if last_data is not None and age <= STALE_DATA_MAX_AGE:
+            self.snapshot.add(symbol, last_data, fetched_at)
+            self.coverage['stale'][symbol] = round(age)
+            metrics.inc('scan_symbols_total', {'status': 'stale'})
+            return last_data
+        
+        self.coverage['skipped'][symbol] = self.fetch_errors.pop(symbol, 'no data')
+        metrics.inc('scan_symbols_total', {'status': 'skipped'})
+        return None
+    
     def detect_unusual_options_activity(self, symbol):
-        """Detect unusual options activity for a symbol"""
+        """Detect unusual options activity for a symbol; an empty scan result when there is none or no data"""
         try:
-            data = self.get_stock_data(symbol)
-            if not data or 'options_chain' not in data:
-                return None
+            data = self._get_scan_data(symbol)
+            if not data:
+                return empty_scan_result()
             
             calls = data['options_chain'].calls
             puts = data['options_chain'].puts
             
-            # Calculate unusual activity for calls
-            unusual_calls = self._find_unusual_volume(calls, 'CALL')
-            unusual_puts = self._find_unusual_volume(puts, 'PUT')
-            
-            # Combine and sort by volume ratio
-            all_unusual = unusual_calls + unusual_puts
-            all_unusual.sort(key=lambda x: x['volume_ratio'], reverse=True)
+            with timed('detect'):
+                # Calculate unusual activity for calls and puts
+                unusual_calls = self._find_unusual_volume(calls, 'CALL')
+                unusual_puts = self._find_unusual_volume(puts, 'PUT')
+                
+                # Top 5 unusual activities by volume ratio
+                all_unusual = pd.concat([unusual_calls, unusual_puts], ignore_index=True)
+                top_unusual = all_unusual.nlargest(5, 'volume_ratio', keep='first')
             
-            # Add current price to each alert
-            for alert in all_unusual:
-                alert['current_price'] = data['current_price']
-                alert['company_name'] = data['company_name']
+                # Greeks of the flagged contracts, as detector inputs
+                delta, gamma, _ = black_scholes_greeks(
+                    data['current_price'],
+                    top_unusual['strike'].to_numpy(),
+                    years_to_expiry(np.full(len(top_unusual), np.datetime64(data['expiry_date'], 'ns'))),
+                    top_unusual['implied_volatility'].to_numpy(),
+                    (top_unusual['option_type'] == 'CALL').to_numpy()
+                )
             
-            return all_unusual[:5]  # Return top 5 unusual activities
+            # Add the underlying's symbol and price to each alert
+            top_unusual = top_unusual.assign(
+                symbol=symbol,
+                current_price=data['current_price'],
+                company_name=data['company_name'],
+                delta=delta,
+                gamma=gamma,
+                delta_notional=delta * top_unusual['volume'].to_numpy() * CONTRACT_MULTIPLIER * data['current_price']
+            )
+            return make_scan_result(top_unusual)
             
         except Exception as e:
             print(f"Error detecting unusual activity for {symbol}: {str(e)}")
-            return []
+            return empty_scan_result()
     
     def _find_unusual_volume(self, options_df, option_type):
         """Find options with unusual volume"""
-        unusual = []
+        volume = options_df['volume'].to_numpy(dtype='float64')
+        open_interest = np.nan_to_num(self._column(options_df, 'openInterest'))
+        last_price = self._column(options_df, 'lastPrice')
         
-        for _, row in options_df.iterrows():
-            volume = row.get('volume', 0)
-            open_interest = row.get('openInterest', 0)
-            
-            # Skip if no volume
-            if pd.isna(volume) or volume == 0:
-                continue
-            
-            # Calculate volume to open interest ratio
-            if open_interest > 0:
-                vol_oi_ratio = volume / open_interest
-            else:
-                vol_oi_ratio = volume
-            
-            # Consider unusual if volume is high relative to open interest
-            if vol_oi_ratio > 0.5 or volume > 1000:
-                strike = row['strike']
-                last_price = row.get('lastPrice', 0)
-                
-                # Estimate premium spent
-                premium_spent = volume * last_price * 100  # Each contract is 100 shares
-                
-                # Only include if significant premium
-                if premium_spent > 50000:  # $50k minimum
-                    unusual.append({
-                        'symbol': row.get('contractSymbol', ''),
-                        'strike': strike,
-                        'option_type': option_type,
-                        'volume': int(volume),
-                        'open_interest': int(open_interest) if open_interest else 0,
-                        'volume_ratio': round(vol_oi_ratio, 2),
-                        'last_price': last_price,
-                        'premium': premium_spent,
-                        'implied_volatility': row.get('impliedVolatility', 0)
-                    })
+        vol_oi_ratio = volume_oi_ratio(volume, open_interest)
+        
+        # Estimate premium spent, each contract is 100 shares
+        premium_spent = volume * last_price * 100
         
-        return unusual
+        mask = unusual_volume_mask(volume, vol_oi_ratio, premium_spent)
+        
+        return pd.DataFrame({
+            'contract_symbol': options_df['contractSymbol'].to_numpy()[mask] if 'contractSymbol' in options_df else '',
+            'strike': options_df['strike'].to_numpy()[mask],
+            'option_type': option_type,
+            'volume': volume[mask].astype('int64'),
+            'open_interest': open_interest[mask].astype('int64'),
+            'volume_ratio': np.round(vol_oi_ratio[mask], 2),
+            'last_price': last_price[mask],
+            'premium': premium_spent[mask],
+            'implied_volatility': self._column(options_df, 'impliedVolatility')[mask]
+        })
+    
+    def _column(self, options_df, column):
+        """Float column of an options chain, zeros if the source didn't provide it"""
+        if column not in options_df:
+            return np.zeros(len(options_df))
+        return options_df[column].to_numpy(dtype='float64')
     
     def scan_all_watchlist(self):
-        """Scan all watchlist stocks for unusual activity"""
-        all_alerts = []
-        
-        for symbol in self.watchlist:
-            print(f"Scanning {symbol}...")
-            unusual = self.detect_unusual_options_activity(symbol)
+        """Scan all watchlist stocks for unusual activity in a new cycle"""
+        self.begin_cycle()
+        self.snapshot.activities = self.scan_symbols(self.watchlist)
+        return self.snapshot.activities
+    
+    def scan_symbols(self, symbols):
+        """Scan the given symbols into the current cycle's snapshot"""
+        with timed('scan_cycle'):
+            results = dict(self.iter_scan(symbols))
             
-            if unusual:
-                for activity in unusual:
-                    activity['symbol'] = symbol
-                    all_alerts.append(activity)
-        
-        # Sort by premium spent
-        all_alerts.sort(key=lambda x: x['premium'], reverse=True)
+            # One table for the whole batch in watchlist order, largest premium first
+            all_alerts = concat_results([results.get(symbol) for symbol in symbols])
+            all_alerts = all_alerts.sort_values('premium', ascending=False, kind='stable', ignore_index=True)
         
         return all_alerts
     
-    def get_market_sentiment(self):
-        """Calculate overall market sentiment based on put/call ratios"""
+    def iter_scan(self, symbols, concurrency=SCAN_CONCURRENCY):
+        """Yield (symbol, scan result) as each symbol finishes, fastest first"""
+        pool = ThreadPoolExecutor(max(1, concurrency))
+        # Profiles the pool's tasks into a cycle being profiled on this thread
+        detect = profiler.bind(self.detect_unusual_options_activity)
+        try:
+            futures = {}
+            for symbol in symbols:
+                print(f"Scanning {symbol}...")
+                futures[pool.submit(detect, symbol)] = symbol
+            for future in as_completed(futures):
+                symbol = futures[future]
+                self.snapshot.set_result(symbol, future.result())
+                yield symbol, future.result()
+        finally:
+            # A consumer that stops early doesn't wait for the symbols still queued
+            pool.shutdown(cancel_futures=True)
+    
+    def get_market_sentiment(self, snapshot=None):
+        """Calculate overall market sentiment based on put/call ratios, from a cycle snapshot's SPY chain"""
+        snapshot = snapshot or self.snapshot
         try:
-            spy = yf.Ticker('SPY')
-            options_dates = spy.options
+            # A cycle that scanned SPY already holds its chain; otherwise it's fetched into the snapshot once
+            data = snapshot.data.get(SENTIMENT_SYMBOL) or snapshot.fetch(SENTIMENT_SYMBOL, self.get_stock_data)
             
-            if len(options_dates) > 0:
-                options_chain = spy.option_chain(options_dates[0])
+            if data:
+                options_chain = data['options_chain']
                 
                 total_call_volume = options_chain.calls['volume'].sum()
                 total_put_volume = options_chain.puts['volume'].sum()
@@ -198,11 +309,11 @@ class StockDataFetcher:
     def get_historical_performance(self, symbol, days=30):
         """Get historical price data for performance tracking"""
         try:
-            ticker = yf.Ticker(symbol)
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
             
-            hist = ticker.history(start=start_date, end=end_date)
+            with timed('fetch_history'):
+                hist = self.source.get_history(symbol, start_date, end_date)
             
             if not hist.empty:
                 return hist